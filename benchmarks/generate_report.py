@@ -0,0 +1,208 @@
+"""
+Seeded generator for synthetic EMR report exports.  The generated columns are
+the source columns "config.json" expects, with a share of dirty values that
+the config's actions are expected to clean up.
+"""
+
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+LAST_NAMES = ['SMITH', 'JOHNSON', 'WILLIAMS', 'BROWN', 'JONES', 'GARCIA',
+              'MILLER', 'DAVIS', 'RODRIGUEZ', 'MARTINEZ', 'HERNANDEZ', 'LOPEZ',
+              'GONZALEZ', 'WILSON', 'ANDERSON', 'THOMAS', 'TAYLOR', 'MOORE',
+              "O'BRIEN", 'NGUYEN', 'HOPPER', 'LOVELACE', 'VAN DER BERG']
+FIRST_NAMES = ['JAMES', 'MARY', 'ROBERT', 'PATRICIA', 'JOHN', 'JENNIFER',
+               'MICHAEL', 'LINDA', 'DAVID', 'ELIZABETH', 'WILLIAM', 'BARBARA',
+               'RICHARD', 'SUSAN', 'JOSEPH', 'JESSICA', 'GRACE', 'ADA', 'ALAN']
+STREET_NAMES = ['MAIN', 'OAK', 'PINE', 'MAPLE', 'CEDAR', 'ELM', 'WASHINGTON',
+                'LAKE', 'HILL', 'PARK', '5TH', '1ST', '42ND', 'BEACON']
+STREET_SUFFIXES = ['ST', 'STREET', 'AVE', 'AVENUE', 'RD', 'ROAD', 'BLVD',
+                   'DR', 'LN', 'CT', 'WAY', 'PL']
+DIRECTIONALS = ['N', 'S', 'E', 'W', 'NE', 'NW', 'SE', 'SW']
+UNITS = ['APT 1', 'APT 2B', 'UNIT 12', 'STE 300', '# 4', 'FL 2']
+CITIES = [('BOSTON', 'MA', '02134'), ('CAMBRIDGE', 'MA', '02139'),
+          ('WORCESTER', 'MA', '01608'), ('PROVIDENCE', 'RI', '02903'),
+          ('HARTFORD', 'CT', '06103'), ('NASHUA', 'NH', '03060'),
+          ('PORTLAND', 'ME', '04101'), ('BURLINGTON', 'VT', '05401'),
+          ('ALBANY', 'NY', '12207'), ('NEW YORK', 'NY', '10001')]
+SITES = ['Main Campus', 'North Clinic', 'South Clinic', 'Eye Center',
+         'Ambulatory Surgery Center']
+LANGUAGES = ['English', 'Spanish', 'english', 'Portuguese-Brazilian',
+             'Vietnamese', 'Chinese-Traditional', 'Haitian-Creole',
+             'English, American', 'Klingon']
+GENDERS = ['M', 'F', 'Male', 'Female', 'U', 'Unknown']
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y']
+
+def npi_check_digit(npi_base: str) -> str:
+    """Get the Luhn check digit of a nine digit NPI base with the 80840 prefix."""
+    digits = [int(d) for d in f'80840{npi_base}']
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        if position % 2 == 0:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return str((10 - total % 10) % 10)
+
+def choice(rng: np.random.Generator, values: Sequence, rows: int) -> np.ndarray:
+    """Pick a value for every row."""
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), rows)]
+
+def format_dates(rng: np.random.Generator, dates: pd.Series) -> pd.Series:
+    """Format dates as text in one of the date formats the EMR exports."""
+    us_format = choice(rng, DATE_FORMATS, len(dates)) == DATE_FORMATS[1]
+    return pd.Series(np.where(us_format,
+                              dates.dt.strftime(DATE_FORMATS[1]),
+                              dates.dt.strftime(DATE_FORMATS[0])),
+                     dtype=object)
+
+def dirty(rng: np.random.Generator, values: pd.Series, rate: float) -> pd.Series:
+    """Pad a share of the values with white-space or change their case."""
+    values = values.copy()
+    padded = rng.random(len(values)) < rate / 2
+    values[padded] = '  ' + values[padded] + ' '
+    lowered = rng.random(len(values)) < rate / 2
+    values[lowered] = values[lowered].str.lower()
+    return values
+
+def generate_report(rows: int, seed: int = 0, dirty_rate: float = 0.1,
+                    duplicate_rate: float = 0.05,
+                    invalid_rate: float = 0.0) -> pd.DataFrame:
+    """
+    Generate a synthetic EMR report.
+    "dirty_rate" is the share of values that need cleaning up, "duplicate_rate"
+    the share of rows that are another visit of an earlier patient and
+    "invalid_rate" the share of rows with a value the validators reject.
+    """
+    rng = np.random.default_rng(seed)
+    patient_numbers = np.arange(rows)
+    repeat_visit = rng.random(rows) < duplicate_rate
+    patient_numbers[repeat_visit] = rng.integers(0, rows, int(repeat_visit.sum()))
+    city_state_zip = choice(rng, CITIES, rows)
+    house_numbers = pd.Series(rng.integers(1, 9999, rows).astype(str))
+    address_1 = (house_numbers + ' ' + choice(rng, STREET_NAMES, rows) + ' '
+                 + choice(rng, STREET_SUFFIXES, rows))
+    directional = rng.random(rows) < 0.15
+    address_1[directional] = (house_numbers[directional] + ' '
+                              + choice(rng, DIRECTIONALS, int(directional.sum()))
+                              + ' ' + choice(rng, STREET_NAMES,
+                                             int(directional.sum()))
+                              + ' ST')
+    po_box = rng.random(rows) < 0.05
+    address_1[po_box] = 'PO BOX ' + house_numbers[po_box]
+    address_2 = pd.Series(np.full(rows, np.nan, dtype=object))
+    has_unit = rng.random(rows) < 0.2
+    address_2[has_unit] = choice(rng, UNITS, int(has_unit.sum()))
+    address_2[rng.random(rows) < dirty_rate / 4] = '-'
+    zip_codes = pd.Series([c[2] for c in city_state_zip])
+    zip_plus_four = rng.random(rows) < dirty_rate
+    zip_codes[zip_plus_four] = (zip_codes[zip_plus_four] + '-'
+                                + pd.Series(rng.integers(1000, 9999, rows)
+                                            .astype(str))[zip_plus_four])
+    leading_zero_lost = (rng.random(rows) < dirty_rate) & ~zip_plus_four
+    zip_codes[leading_zero_lost] = zip_codes[leading_zero_lost].str.lstrip('0')
+    area_codes = pd.Series(rng.integers(201, 989, rows).astype(str))
+    exchanges = pd.Series(rng.integers(200, 999, rows).astype(str))
+    lines = pd.Series(rng.integers(0, 9999, rows).astype(str)).str.zfill(4)
+    phone_formats = rng.integers(0, 4, rows)
+    phones = '(' + area_codes + ') ' + exchanges + '-' + lines
+    phones[phone_formats == 1] = (area_codes + '.' + exchanges + '.' + lines)[
+        phone_formats == 1]
+    phones[phone_formats == 2] = ('1-' + area_codes + '-' + exchanges + '-'
+                                  + lines)[phone_formats == 2]
+    phones[rng.random(rows) < dirty_rate / 2] = ''
+    birth_dates = pd.Series(pd.Timestamp('1930-01-01') + pd.to_timedelta(
+        rng.integers(0, 365 * 90, rows), unit='D'))
+    visit_dates = pd.Series(pd.Timestamp('2024-01-01') + pd.to_timedelta(
+        rng.integers(0, 31, rows), unit='D'))
+    npi_pool = [f'{base}{npi_check_digit(base)}' for base in
+                (str(n) for n in rng.integers(100000000, 199999999, 40))]
+    provider_numbers = rng.integers(0, len(npi_pool), rows)
+    provider_names = [f'{LAST_NAMES[n % len(LAST_NAMES)]}, '
+                      f'{FIRST_NAMES[n % len(FIRST_NAMES)]}'
+                      for n in range(len(npi_pool))]
+    last_names = pd.Series(np.asarray(LAST_NAMES, dtype=object)[
+        patient_numbers % len(LAST_NAMES)])
+    first_names = pd.Series(np.asarray(FIRST_NAMES, dtype=object)[
+        patient_numbers * 7 % len(FIRST_NAMES)])
+    emails = (first_names.str.lower() + '.' + last_names.str.lower()
+              .str.replace(r'\W', '', regex=True)
+              + pd.Series(patient_numbers.astype(str)) + '@example.com')
+    emails[rng.random(rows) < 0.3] = ''
+    df = pd.DataFrame({
+        'Patient Last Name': dirty(rng, last_names, dirty_rate),
+        'Patient First Name': dirty(rng, first_names, dirty_rate),
+        'Patient Address Line 1': dirty(rng, address_1, dirty_rate),
+        'Patient Address Line 2': address_2,
+        'Patient City': dirty(rng, pd.Series([c[0] for c in city_state_zip]),
+                              dirty_rate),
+        'Patient State': dirty(rng, pd.Series([c[1] for c in city_state_zip]),
+                               dirty_rate),
+        'Patient Zip Code': zip_codes,
+        'Patient Phone Number': phones,
+        'Patient Gender': choice(rng, GENDERS, rows),
+        'Patient DOB': format_dates(rng, birth_dates),
+        'MRN': pd.Series(patient_numbers + 1000000).astype(str).radd('MRN'),
+        'Patient Unique ID': pd.Series(patient_numbers + 5000000).astype(str),
+        'Site Location': choice(rng, SITES, rows),
+        'NPI': np.asarray(npi_pool, dtype=object)[provider_numbers],
+        'Provider': np.asarray(provider_names, dtype=object)[provider_numbers],
+        'Last Visit Date': format_dates(rng, visit_dates),
+        'Patient Language': choice(rng, LANGUAGES, rows),
+        'Patient Email Address': emails,
+        'Patient Opt-In Email Notifications?': choice(rng, ['Yes', 'No', ''],
+                                                      rows),
+    })
+    invalid = np.flatnonzero(rng.random(rows) < invalid_rate)
+    invalid_columns = choice(rng, ['Patient State', 'Patient Zip Code',
+                                   'Patient Gender', 'Patient DOB'],
+                             len(invalid))
+    invalid_values = {'Patient State': 'MASS', 'Patient Zip Code': '',
+                      'Patient Gender': 'X', 'Patient DOB': '13/13/2023'}
+    for row, column in zip(invalid, invalid_columns):
+        df.iat[row, df.columns.get_loc(column)] = invalid_values[column]
+    return df
+
+def save_report(df: pd.DataFrame, path: Path) -> None:
+    """Save a report as an .xlsx, .csv or .tsv file depending on the suffix."""
+    match path.suffix:
+        case '.xlsx':
+            df.to_excel(path, index=False)
+        case '.csv':
+            df.to_csv(path, index=False)
+        case '.tsv':
+            df.to_csv(path, index=False, sep='\t')
+        case _:
+            raise ValueError(f'Unsupported report file extension: "{path.suffix}"')
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = ArgumentParser(description='Generate synthetic EMR reports.')
+    parser.add_argument('--rows', type=int, nargs='+',
+                        default=[10000, 100000, 1000000],
+                        help='Number of rows of each report to generate.')
+    parser.add_argument('--format', dest='formats', nargs='+',
+                        default=['.xlsx', '.csv'],
+                        choices=['.xlsx', '.csv', '.tsv'],
+                        help='File formats to save each report as.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dirty-rate', type=float, default=0.1)
+    parser.add_argument('--duplicate-rate', type=float, default=0.05)
+    parser.add_argument('--invalid-rate', type=float, default=0.0)
+    parser.add_argument('--output-directory', type=Path, default=Path('input'))
+    args = parser.parse_args(argv)
+    args.output_directory.mkdir(exist_ok=True)
+    for rows in args.rows:
+        df = generate_report(rows, args.seed, args.dirty_rate,
+                             args.duplicate_rate, args.invalid_rate)
+        for suffix in args.formats:
+            path = args.output_directory / Path(f'synthetic_emr_{rows}{suffix}')
+            save_report(df, path)
+            print(f'Saved "{path}"')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Measure the throughput of a running submission service by uploading the same
+synthetic EMR report many times and waiting for every job to finish.
+Start the service first with `python -m pgsurvey serve`.
+"""
+
+from argparse import ArgumentParser
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Sequence
+from urllib.parse import urlsplit
+
+from pgsurvey import percentile
+
+from .generate_report import generate_report
+
+async def request(host: str, port: int, method: str, path: str,
+                  body: bytes = b'') -> tuple[int, Any]:
+    """Send an HTTP request and get the status and JSON body of the response."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: {host}\r\n'
+                 f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'
+                 .encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    return status, json.loads(payload)
+
+async def run_job(host: str, port: int, path: str, body: bytes,
+                  poll_seconds: float) -> tuple[float, dict[str, Any]]:
+    """Submit a report and poll its job until it finishes."""
+    start = time.perf_counter()
+    status, job = await request(host, port, 'POST', path, body)
+    if status != 202:
+        raise RuntimeError(f'Submission refused with {status}: {job}')
+    while job['status'] not in ('done', 'failed'):
+        await asyncio.sleep(poll_seconds)
+        _, job = await request(host, port, 'GET', f'/jobs/{job["id"]}')
+    return time.perf_counter() - start, job
+
+async def load_test(url: str, config: str, rows: int, jobs: int,
+                    concurrency: int, dry_run: bool = False,
+                    poll_seconds: float = 0.05) -> dict[str, Any]:
+    """
+    Submit "jobs" copies of a report, at most "concurrency" at a time, and
+    get the throughput and the latency percentiles of the jobs.
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname or '127.0.0.1', parts.port or 80
+    path = f'/jobs?config={config}' + ('&dry_run=1' if dry_run else '')
+    body = generate_report(rows).to_csv(index=False).encode()
+    semaphore = asyncio.Semaphore(concurrency)
+    async def limited_job() -> tuple[float, dict[str, Any]]:
+        async with semaphore:
+            return await run_job(host, port, path, body, poll_seconds)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(limited_job() for _ in range(jobs)))
+    seconds = time.perf_counter() - start
+    latencies = [latency for latency, _ in results]
+    return {'jobs': jobs,
+            'failed': sum(job['status'] == 'failed' for _, job in results),
+            'seconds': seconds,
+            'jobs_per_second': jobs / seconds,
+            'rows_per_second': jobs * rows / seconds,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95)}
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = ArgumentParser(description='Load test a running Press Ganey '
+                                        'submission service.')
+    parser.add_argument('--url', default='http://127.0.0.1:8080',
+                        help='Address of the submission service.')
+    parser.add_argument('--config', default='config',
+                        help='Name of the config the service transforms with.')
+    parser.add_argument('--rows', type=int, default=1000,
+                        help='Rows in each submitted report.')
+    parser.add_argument('--jobs', type=int, default=50,
+                        help='Number of reports to submit.')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Number of jobs submitted and not finished at once.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only count rejected values, saving no files.')
+    args = parser.parse_args(argv)
+    result = asyncio.run(load_test(args.url, args.config, args.rows, args.jobs,
+                                   args.concurrency, args.dry_run))
+    print(f'{result["jobs"]} jobs of {args.rows} rows in '
+          f'{result["seconds"]:.2f}s, {result["failed"]} failed')
+    print(f'{result["jobs_per_second"]:.2f} jobs/s, '
+          f'{result["rows_per_second"]:.0f} rows/s')
+    print(f'Latency p50 {result["p50"]:.3f}s, p95 {result["p95"]:.3f}s')
+    return 1 if result['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Time and memory-profile the .xlsx and .csv readers, each config action and
+both writers on synthetic EMR reports, then compare the results against a
+stored baseline.
+"""
+
+from argparse import ArgumentParser
+import functools
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, NamedTuple, Sequence
+
+import pandas as pd
+from pgsurvey import (
+    Report,
+    get_dataframe,
+    get_input_column_names,
+    read_config,
+    read_row_dedup_config,
+)
+
+from .generate_report import generate_report, save_report
+
+BASELINE_PATH = Path(__file__).parent / Path('baseline.json')
+
+class StageResult(NamedTuple):
+    """Wall time and peak traced memory of a benchmarked stage."""
+    seconds: float
+    peak_bytes: int
+
+def measure(func: Callable, *args: Any, trace_memory: bool) -> tuple[float, Any]:
+    """
+    Run a function, measuring either its wall time or its peak traced memory.
+    Tracing memory slows Python code down a lot, so both are not measured
+    in the same run.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    if trace_memory:
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak_bytes, result
+    return seconds, result
+
+def run_stages(input_xlsx: Path, config_path: Path, output_directory: Path,
+               trace_memory: bool,
+               input_csv: Path | None = None) -> dict[str, float]:
+    """
+    Run the readers, each config action and both writers.  The streaming
+    .xlsx reader is compared with pd.read_excel, which builds an openpyxl
+    cell for every cell.  The .csv reader is only run if "input_csv" is
+    given.  "read_xlsx_columns" and "read_csv" read just the config's columns.
+    """
+    measurements = {}
+    measurements['read_xlsx_openpyxl'], _ = measure(
+        functools.partial(pd.read_excel, dtype=str), input_xlsx,
+        trace_memory=trace_memory)
+    measurements['read_xlsx'], df = measure(get_dataframe, input_xlsx,
+                                            trace_memory=trace_memory)
+    config_serialized = json.loads(config_path.read_text())
+    _, columns, actions = read_config(config_serialized)
+    usecols = get_input_column_names(columns, actions)
+    measurements['read_xlsx_columns'], _ = measure(get_dataframe, input_xlsx,
+                                                   usecols,
+                                                   trace_memory=trace_memory)
+    if input_csv is not None:
+        measurements['read_csv'], _ = measure(get_dataframe, input_csv, usecols,
+                                              trace_memory=trace_memory)
+    report = Report(df, columns, actions,
+                    row_dedup=read_row_dedup_config(config_serialized))
+    for action in actions:
+        report.actions = [action]
+        measurements[action], _ = measure(report.run_actions,
+                                          trace_memory=trace_memory)
+    measurements['write_csv'], _ = measure(report.save_output_csv,
+                                           output_directory / Path('output.csv'),
+                                           trace_memory=trace_memory)
+    measurements['write_xlsx'], _ = measure(report.save_output_xlsx,
+                                            output_directory / Path('output.xlsx'),
+                                            trace_memory=trace_memory)
+    return measurements
+
+def benchmark_report(rows: int, config_path: Path, seed: int = 0,
+                     work_directory: Path | None = None) -> dict[str, StageResult]:
+    """Benchmark every stage of a run on a synthetic report of "rows" rows."""
+    with tempfile.TemporaryDirectory(dir=work_directory) as temp_dir:
+        temp_path = Path(temp_dir)
+        input_xlsx = temp_path / Path('input.xlsx')
+        input_csv = temp_path / Path('input.csv')
+        df = generate_report(rows, seed)
+        save_report(df, input_xlsx)
+        save_report(df, input_csv)
+        seconds = run_stages(input_xlsx, config_path, temp_path,
+                             trace_memory=False, input_csv=input_csv)
+        peak_bytes = run_stages(input_xlsx, config_path, temp_path,
+                                trace_memory=True, input_csv=input_csv)
+    return {stage: StageResult(seconds[stage], int(peak_bytes[stage]))
+            for stage in seconds}
+
+def benchmark_workers(rows: int, config_path: Path, worker_counts: list[int],
+                      seed: int = 0) -> dict[int, float]:
+    """Time all config actions on a synthetic report with each worker count."""
+    df = generate_report(rows, seed)
+    config_serialized = json.loads(config_path.read_text())
+    _, columns, actions = read_config(config_serialized)
+    row_dedup = read_row_dedup_config(config_serialized)
+    seconds = {}
+    for workers in worker_counts:
+        report = Report(df.copy(), columns, actions, row_dedup=row_dedup)
+        seconds[workers], _ = measure(report.run_actions, workers,
+                                      trace_memory=False)
+    return seconds
+
+def print_worker_results(rows: int, seconds: dict[int, float]) -> None:
+    """Print the transform time and speedup of each worker count."""
+    print(f'\n{rows} rows')
+    print(f'{"Workers":<10}{"Seconds":>10}{"Speedup":>10}')
+    first = next(iter(seconds.values()))
+    for workers, result in seconds.items():
+        print(f'{workers:<10}{result:>10.3f}{first / result:>9.2f}x')
+
+def compare_to_baseline(results: dict[str, StageResult],
+                        baseline: dict[str, dict[str, float]],
+                        tolerance: float,
+                        min_difference: float = 0.05) -> list[str]:
+    """
+    List the stages slower than the baseline by more than the tolerance.
+    Differences under "min_difference" seconds are treated as noise.
+    """
+    regressions = []
+    for stage, result in results.items():
+        if stage not in baseline:
+            continue
+        baseline_seconds = baseline[stage]['seconds']
+        if (result.seconds > baseline_seconds * tolerance
+                and result.seconds - baseline_seconds > min_difference):
+            regressions.append(f'{stage}: {result.seconds:.3f}s vs baseline '
+                               f'{baseline_seconds:.3f}s')
+    return regressions
+
+def print_results(rows: int, results: dict[str, StageResult]) -> None:
+    """Print the results as a table."""
+    print(f'\n{rows} rows')
+    print(f'{"Stage":<45}{"Seconds":>10}{"Peak MiB":>10}')
+    for stage, result in results.items():
+        print(f'{stage:<45}{result.seconds:>10.3f}'
+              f'{result.peak_bytes / 1048576:>10.1f}')
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = ArgumentParser(description='Benchmark the Press Ganey Survey '
+                            'Submitter on synthetic EMR reports.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000],
+                        help='Report sizes to benchmark (default is 10000).')
+    parser.add_argument('-c', '--config', type=Path, default=Path('config.json'),
+                        dest='config_path')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH,
+                        dest='baseline_path')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help=('Fail if a stage is slower than its baseline '
+                              'times this factor (default is 1.5).'))
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Store the results as the new baseline.')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help=('Only time the transform with each of these '
+                              'worker counts, such as 1 2 4 8.'))
+    args = parser.parse_args(argv)
+    if args.workers is not None:
+        for rows in args.rows:
+            print_worker_results(rows, benchmark_workers(rows, args.config_path,
+                                                         args.workers, args.seed))
+        return 0
+    baseline = {}
+    if args.baseline_path.exists():
+        baseline = json.loads(args.baseline_path.read_text())
+    regressions = []
+    for rows in args.rows:
+        results = benchmark_report(rows, args.config_path, args.seed)
+        print_results(rows, results)
+        regressions += [f'{rows} rows {regression}' for regression in
+                        compare_to_baseline(results, baseline.get(str(rows), {}),
+                                            args.tolerance)]
+        baseline[str(rows)] = {stage: result._asdict()
+                               for stage, result in results.items()}
+    if args.update_baseline:
+        args.baseline_path.write_text(json.dumps(baseline, indent=4) + '\n')
+        print(f'\nBaseline saved to "{args.baseline_path}"')
+        return 0
+    if regressions:
+        print('\nSlower than baseline:')
+        for regression in regressions:
+            print(f'  {regression}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
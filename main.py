@@ -1,72 +1,320 @@
 """
-Script to transform a report from an EMR to a .csv file that can be uploaded to 
+Script to transform a report from an EMR to a .csv file that can be uploaded to
 PressGaney for survey distribution.
 """
 
+import cProfile
 import json
+import logging
 from pathlib import Path
 import sys
 
 from pgsurvey import (
+    NpiRegistry,
     Report,
     ReportPath,
+    RunMetrics,
+    RunOptions,
+    SurveyedPatientIndex,
+    UploadManifest,
     create_transmission_from_factory,
-    accept_arguments,
     create_logger,
-    get_dataframe_from_user_input,
-    get_dataframe,
+    get_dataframes,
+    get_input_file_and_dataframe_from_user_input,
+    get_input_files,
+    get_profile_path,
+    hash_file,
     input_to_transmit_to_press_ganey,
+    merge_dataframes,
     override_sys_excepthook_to_log_uncaught_exceptions,
+    parse_report_config,
+    parse_run_options,
     read_config,
-    TransmitOption
+    read_patient_dedup_config,
+    record_surveyed_patients,
+    send_files_not_yet_delivered,
+    Transmission,
+    TransmitOption,
+    ZipIndex,
 )
 
 
-def main():
-    logger = create_logger()
-    override_sys_excepthook_to_log_uncaught_exceptions(logger)
-    logger.info('************************ START ************************')
-    logger.info('Parse options passed')
-    config_path, input_file, transmit_option = accept_arguments(sys.argv[1:])
+def transmit_output_files(logger: logging.Logger,
+                          options: RunOptions,
+                          transmit_option: TransmitOption,
+                          output_csvs: list[Path],
+                          manifest: UploadManifest,
+                          client_id: str,
+                          transmission: Transmission | None = None) -> int:
+    """
+    Transmit output files not already delivered to Press Ganey.
+    Return the number of bytes transmitted.
+    """
+    logger.info(f'Transmitting {len(output_csvs)} file(s) to Press Ganey '
+                f'via {transmit_option.value}')
+    if transmission is None:
+        transmission = create_transmission_from_factory(transmit_option)
+    skipped = send_files_not_yet_delivered(transmission, output_csvs, manifest,
+                                           client_id, options.upload_workers)
+    for output_csv in skipped:
+        logger.info(f'Skipped "{output_csv.name}", a file with the same '
+                    'contents was already delivered to Press Ganey')
+        print(f'Skipped "{output_csv}", it was already uploaded to Press Ganey')
+    return sum(output_csv.stat().st_size for output_csv in output_csvs
+               if output_csv not in skipped)
+
+def print_dry_run_summary(report: Report, rows: int = 3) -> None:
+    """Print the output columns with their rejected value counts."""
+    print(f'Dry run of {len(report.df)} output row(s), nothing was saved '
+          'or transmitted')
+    for reason, count in report.filtered.items():
+        print(f'Filtered {count} row(s): {reason}')
+    print(report.get_column_summary(rows).to_string(max_colwidth=60))
+    rejects = sum(report.rejects.values())
+    if rejects:
+        print(f'{rejects} value(s) were rejected by column functions; a full '
+              'run stops at the first rejected value')
+
+def run(logger: logging.Logger, options: RunOptions,
+        metrics: RunMetrics,
+        transmission: Transmission | None = None) -> None:
+    """
+    Transform the report and transmit it to Press Ganey, with "transmission"
+    if it was already created.
+    """
+    config_path = options.config_path
+    transmit_option = options.transmit_option
     print('Press Ganey - Survey Submission')
     project_directory = Path().resolve()
     logger.info('Creating report path')
-    report_path = ReportPath(project_directory)
-    if input_file is not None:
-        logger.info('Get dataframe from CLI "-f", "--file" input')
-        df = get_dataframe(report_path.input_directory / Path(input_file))
-    else:
-        logger.info('User input to get input file path and dataframe')
-        df = get_dataframe_from_user_input(report_path.input_directory)
+    report_path = ReportPath(project_directory,
+                             create_output_directory=not options.dry_run)
+    manifest_path = project_directory / Path('manifest.sqlite3')
+    if options.transmit_only is not None:
+        logger.info(f'Load config json from "{config_path.name}"')
+        config_serialized = json.loads(config_path.read_text())
+        client_id, _, _ = read_config(config_serialized)
+        patient_dedup = read_patient_dedup_config(config_serialized)
+        output_csv = options.transmit_only
+        if not output_csv.exists():
+            output_csv = report_path.output_directory / output_csv
+        logger.info(f'Transmit only "{output_csv.absolute()}"')
+        logger.info('Open upload manifest')
+        manifest = UploadManifest(manifest_path)
+        sha256 = hash_file(output_csv)
+        already_delivered = manifest.is_delivered(sha256)
+        with metrics.stage('upload'):
+            bytes_transmitted = transmit_output_files(logger, options,
+                                                      transmit_option,
+                                                      [output_csv], manifest,
+                                                      client_id, transmission)
+        metrics.set(bytes_transmitted=bytes_transmitted)
+        if patient_dedup is not None and not already_delivered:
+            record_surveyed_patients(project_directory /
+                                     Path(patient_dedup.index_path),
+                                     manifest.pop_patient_key_hashes(sha256))
+        manifest.close()
+        return None
     logger.info(f'Load config json from "{config_path.name}"')
     config_serialized = json.loads(config_path.read_text())
     logger.info(f'Read config file "{config_path.name}"')
-    client_id, columns, actions = read_config(config_serialized)
+    config = parse_report_config(config_serialized)
+    client_id = config.client_id
+    patient_dedup = config.patient_dedup
+    usecols = config.get_input_column_names()
+    nrows = options.sample if options.sample_seed is None else None
+    with metrics.stage('read'):
+        if options.input_files:
+            logger.info('Get dataframe from CLI "-f", "--file" input')
+            input_paths = get_input_files(report_path.input_directory,
+                                          options.input_files)
+            dfs = get_dataframes(input_paths, usecols, nrows,
+                                 sheets=options.sheets)
+            df = merge_dataframes(dfs, input_paths,
+                                  options.drop_duplicate_rows_across_files)
+            if len(input_paths) > 1:
+                rows_read = sum(len(part) for part in dfs)
+                logger.info(f'Merged {len(input_paths)} input files: '
+                            f'{", ".join(p.name for p in input_paths)}, '
+                            f'{rows_read} row(s) read, {rows_read - len(df)} '
+                            'row(s) repeated from an earlier file dropped')
+                if nrows is not None:
+                    df = df.head(nrows)
+            metrics.set(input_files=len(input_paths),
+                        input_file_size=sum(input_path.stat().st_size
+                                            for input_path in input_paths))
+        else:
+            logger.info('User input to get input file path and dataframe')
+            input_path, df = get_input_file_and_dataframe_from_user_input(
+                report_path.input_directory, usecols, nrows, options.sheets)
+            metrics.set(input_files=1,
+                        input_file_size=input_path.stat().st_size)
+    if options.sample is not None and options.sample_seed is not None:
+        logger.info(f'Sample {options.sample} random row(s) with seed '
+                    f'{options.sample_seed}')
+        df = df.sample(n=min(options.sample, len(df)),
+                       random_state=options.sample_seed)
+    metrics.set(rows_in=len(df))
+    patient_index = None
+    if patient_dedup is not None:
+        patient_index_path = project_directory / Path(patient_dedup.index_path)
+        if options.dry_run and not patient_index_path.exists():
+            # No patient was surveyed yet, and a dry run does not create the index
+            logger.info(f'Patient index "{patient_dedup.index_path}" does not '
+                        'exist, dry run with an empty index in memory')
+            patient_index = SurveyedPatientIndex(Path(':memory:'))
+        else:
+            logger.info(f'Open patient index "{patient_dedup.index_path}"')
+            patient_index = SurveyedPatientIndex(patient_index_path)
+    zip_index = None
+    if config.zip_reference is not None:
+        logger.info(f'Load ZIP code reference "{config.zip_reference.path}"')
+        zip_index = ZipIndex.load(project_directory /
+                                  Path(config.zip_reference.path))
+    npi_registry = None
+    if config.npi_enrichment is not None:
+        logger.info(f'Load NPI registry "{config.npi_enrichment.path}"')
+        npi_registry = NpiRegistry.load(project_directory /
+                                        Path(config.npi_enrichment.path))
     logger.info('Initialize Report object')
-    report = Report(df, columns, actions)
-    logger.info('Run actions on dataframe')
-    report.run_actions()
+    report = Report(df, config.columns, config.actions,
+                    patient_dedup=patient_dedup,
+                    patient_index=patient_index,
+                    row_dedup=config.row_dedup,
+                    collect_rejects=options.dry_run,
+                    filters=config.filters,
+                    zip_reference=config.zip_reference,
+                    zip_index=zip_index,
+                    npi_enrichment=config.npi_enrichment,
+                    npi_registry=npi_registry)
+    logger.info(f'Run actions on dataframe with {options.workers} worker(s)')
+    with metrics.stage('transform'):
+        report.run_actions(options.workers)
+    metrics.set(rows_out=len(report.df), rows_dropped=len(df) - len(report.df),
+                rejects=sum(report.rejects.values()), filtered=report.filtered)
+    if options.dry_run:
+        logger.info('Dry run, not saving or transmitting output files')
+        metrics.set(dry_run=True, column_rejects=report.rejects)
+        print_dry_run_summary(report)
+        if patient_index is not None:
+            patient_index.close()
+        return None
+    logger.info('Open upload manifest')
+    manifest = UploadManifest(manifest_path)
+    logger.info('Split output into shards')
+    shards = report.get_shards(options.shard_max_rows, options.shard_max_bytes)
     logger.info('Get output .csv file path')
-    output_csv = report_path.get_output_path(client_id, '.csv')
-    logger.info(f'Save output .csv file "{output_csv.absolute()}"')
-    report.save_output_csv(output_csv)
-    print('Output .csv file saved at the following location: '
-          f'"{output_csv.absolute()}"')
+    if len(shards) == 1:
+        output_csvs = [report_path.get_output_path(client_id, '.csv')]
+    else:
+        output_csvs = [report_path.get_output_path(client_id, '.csv', shard=n)
+                       for n in range(1, len(shards) + 1)]
+    streamed = False
+    sha256s: list[str] = []
+    if (options.stream_upload and transmit_option is TransmitOption.SFTP
+            and len(shards) == 1):
+        output_csv = output_csvs[0]
+        sha256 = report.hash_output_csv()
+        if patient_index is not None:
+            sha256s = [sha256]
+            manifest.record_patient_key_hashes(sha256,
+                                               report.get_patient_key_hashes())
+        if manifest.is_delivered(sha256):
+            logger.info(f'Save output .csv file "{output_csv.absolute()}", a '
+                        'file with the same contents was already delivered to '
+                        'Press Ganey')
+            with metrics.stage('write_csv'):
+                report.save_output_csv(output_csv)
+            print(f'Skipped "{output_csv}", it was already uploaded to '
+                  'Press Ganey')
+        else:
+            logger.info(f'Save output .csv file "{output_csv.absolute()}" '
+                        'while streaming it to Press Ganey via '
+                        f'{transmit_option.value}')
+            if transmission is None:
+                transmission = create_transmission_from_factory(transmit_option)
+            with metrics.stage('write_csv_and_upload'):
+                transmission.send_report(report, output_csv)
+            manifest.record(output_csv, client_id, UploadManifest.DELIVERED,
+                            sha256)
+            metrics.set(bytes_transmitted=output_csv.stat().st_size)
+        streamed = True
+    else:
+        with metrics.stage('write_csv'):
+            for shard, output_csv in zip(shards, output_csvs):
+                logger.info(f'Save output .csv file "{output_csv.absolute()}"')
+                shard.save_output_csv(output_csv)
+        if patient_index is not None:
+            logger.info('Keep the patient key hashes of each output .csv file '
+                        'in the upload manifest until it is delivered')
+            sha256s = [hash_file(output_csv) for output_csv in output_csvs]
+            for shard, sha256 in zip(shards, sha256s):
+                manifest.record_patient_key_hashes(
+                    sha256, shard.get_patient_key_hashes())
+    for output_csv in output_csvs:
+        print('Output .csv file saved at the following location: '
+              f'"{output_csv.absolute()}"')
     logger.info('Get output .xlsx file path')
     output_xlsx = report_path.get_output_path(client_id, '.xlsx')
     logger.info(f'Save output .xlsx file "{output_xlsx.absolute()}"')
-    report.save_output_xlsx(output_xlsx)
+    with metrics.stage('write_xlsx'):
+        report.save_output_xlsx(output_xlsx)
     if transmit_option is TransmitOption.USER_INPUT:
         logger.info('Checking if transmitting file to Press Ganey')
         transmit_option = input_to_transmit_to_press_ganey()
-    if transmit_option is TransmitOption.NONE:
+    if streamed:
+        logger.info('Output .csv file already handled by the streamed upload')
+    elif transmit_option is TransmitOption.NONE:
         logger.info('Not transmitting to Press Ganey')
     else:
-        logger.info('Transmitting file to Press Ganey via '
-                    f'{transmit_option.value}')
-        transmission = create_transmission_from_factory(transmit_option)
-        transmission.send(output_csv)
+        with metrics.stage('upload'):
+            bytes_transmitted = transmit_output_files(logger, options,
+                                                      transmit_option,
+                                                      output_csvs, manifest,
+                                                      client_id, transmission)
+        metrics.set(bytes_transmitted=bytes_transmitted)
+    if patient_index is not None:
+        if transmit_option is not TransmitOption.NONE:
+            patient_key_hashes = [key_hash for sha256 in sha256s
+                                  for key_hash in
+                                  manifest.pop_patient_key_hashes(sha256)]
+            logger.info(f'Record {len(patient_key_hashes)} surveyed patient(s) '
+                        'in the patient index')
+            patient_index.record(patient_key_hashes)
+        patient_index.close()
+    manifest.close()
+
+def main():
+    logger = create_logger()
+    override_sys_excepthook_to_log_uncaught_exceptions(logger)
+    logger.info('************************ START ************************')
+    logger.info('Parse options passed')
+    options = parse_run_options(sys.argv[1:])
+    metrics = RunMetrics()
+    transmission = None
+    try:
+        if options.transmit_option is TransmitOption.SFTP and not options.dry_run:
+            logger.info('Connect to Press Ganey via SFTP in the background')
+            transmission = create_transmission_from_factory(options.transmit_option)
+            transmission.connect_in_background()
+        if options.profile:
+            profile_path = get_profile_path()
+            logger.info('Profiling run, statistics will be saved to '
+                        f'"{profile_path}"')
+            profiler = cProfile.Profile()
+            profiler.runcall(run, logger, options, metrics, transmission)
+            profiler.dump_stats(profile_path)
+        else:
+            run(logger, options, metrics, transmission)
+    except BaseException:
+        metrics.status = 'failed'
+        raise
+    finally:
+        if transmission is not None:
+            transmission.close()
+        logger.info(f'Save run metrics to "{metrics.metrics_path}"')
+        metrics.write()
     logger.info('************************ END ************************')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -5,4 +5,14 @@ from .user_settings import *
 from .validation_sanitization import *
 from .log_handling import *
 from .arg_parser import *
-from .transmit_option import *
\ No newline at end of file
+from .transmit_option import *
+from .manifest import *
+from .patient_index import *
+from .instrumentation import *
+from .run_metrics import *
+from .reference_index import *
+from .zip_reference import *
+from .npi_registry import *
+from .pipeline import *
+from .service import *
+from .xlsx_reader import *
\ No newline at end of file
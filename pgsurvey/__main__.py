@@ -0,0 +1,79 @@
+"""
+Commands for the pgsurvey package.  Run `python -m pgsurvey --help`.
+"""
+
+from argparse import ArgumentParser
+import os
+from pathlib import Path
+import sys
+from typing import Sequence
+
+from .log_handling import create_logger
+from .run_metrics import RUN_METRICS_PATH, print_run_metrics_summary
+from .service import run_service
+from .transmit_option import TransmitOption
+from .transmit_report import create_transmission_from_factory
+
+def main(sys_argv: Sequence[str]) -> None:
+    parser = ArgumentParser(prog='pgsurvey',
+                            description='Press Ganey Survey Submitter commands.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    stats = subparsers.add_parser('stats',
+                                  help=('Summarize the duration of each stage '
+                                        'over the last runs.'))
+    stats.add_argument('-n', '--last',
+                       type=int,
+                       default=100,
+                       dest='last',
+                       help='Number of most recent runs to summarize.')
+    stats.add_argument('--metrics',
+                       default=str(RUN_METRICS_PATH),
+                       dest='metrics_path',
+                       help='Path to the JSON-lines run metrics file.')
+    serve = subparsers.add_parser('serve',
+                                  help=('Transform reports uploaded over HTTP '
+                                        'on a pool of worker processes.'))
+    serve.add_argument('--host',
+                       default='127.0.0.1',
+                       dest='host',
+                       help='Address to listen on.')
+    serve.add_argument('--port',
+                       type=int,
+                       default=8080,
+                       dest='port',
+                       help='Port to listen on.')
+    serve.add_argument('--workers',
+                       type=int,
+                       default=os.cpu_count() or 1,
+                       dest='workers',
+                       help=('Number of worker processes, which is also the '
+                             'number of jobs transformed at once.'))
+    serve.add_argument('--configs',
+                       default='.',
+                       dest='config_directory',
+                       help=('Folder of config .JSON files, selected by file '
+                             'name with the "config" query parameter.'))
+    serve.add_argument('--max-queued',
+                       type=int,
+                       default=100,
+                       dest='max_queued',
+                       help='Number of pending jobs before new ones are refused.')
+    serve.add_argument('-s', '--sftp-transmit',
+                       action='store_true',
+                       dest='sftp_transmit',
+                       help='Transmit each output .csv file to Press Ganey via SFTP.')
+    args = parser.parse_args(sys_argv)
+    match args.command:
+        case 'stats':
+            print_run_metrics_summary(Path(args.metrics_path), args.last)
+        case 'serve':
+            create_logger()
+            transmission = None
+            if args.sftp_transmit:
+                transmission = create_transmission_from_factory(TransmitOption.SFTP)
+            run_service(args.host, args.port, args.workers,
+                        Path(args.config_directory), transmission,
+                        args.max_queued)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,14 +1,41 @@
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 from pathlib import Path
-from typing import Sequence
+from typing import NamedTuple, Sequence
 
 from .transmit_report import get_transmit_option_from_cli_args
 from .transmit_option import TransmitOption
 
-def accept_arguments(sys_argv: Sequence[str]) -> tuple[Path,
-                                                       Path | None,
-                                                       TransmitOption]:
-    """Parse options to the script."""  
+class RunOptions(NamedTuple):
+    """Options passed to the script."""
+    config_path: Path
+    input_file: Path | None
+    transmit_option: TransmitOption
+    stream_upload: bool = False
+    shard_max_rows: int | None = None
+    shard_max_bytes: int | None = None
+    upload_workers: int = 4
+    workers: int = 1
+    transmit_only: Path | None = None
+    profile: bool = False
+    dry_run: bool = False
+    sample: int | None = None
+    sample_seed: int | None = None
+    input_files: tuple[Path, ...] = ()
+    drop_duplicate_rows_across_files: bool = False
+    sheets: tuple[str, ...] | None = None
+
+def positive_int(value: str) -> int:
+    """Parse an option's value as an integer of at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise ArgumentTypeError(f'invalid int value: "{value}"')
+    if number < 1:
+        raise ArgumentTypeError(f'must be at least 1, not {number}')
+    return number
+
+def create_argument_parser() -> ArgumentParser:
+    """Create the parser for the options to the script."""
     parser = ArgumentParser(description='Press Ganey Survey Submitter.  '
                             'Handle parsing of spreadsheet reports to a format '
                             'acceptable to Press Ganey then upload the spreadsheet '
@@ -18,9 +45,29 @@ def accept_arguments(sys_argv: Sequence[str]) -> tuple[Path,
                         dest='config_path',
                         help='Path to the config JSON file.')
     parser.add_argument('-f', '--file',
+                        nargs='+',
+                        default=None,
+                        dest='input_files',
+                        metavar='INPUT_FILE',
+                        help=('Path to the input .xlsx, .csv or .tsv report.  '
+                              'Several paths or glob patterns, such as '
+                              '"export_*.csv", merge their reports into one '
+                              'output.'))
+    parser.add_argument('--drop-duplicate-rows-across-files',
+                        action='store_true',
+                        default=False,
+                        dest='drop_duplicate_rows_across_files',
+                        help=('With several input files, drop rows identical '
+                              'to a row of an earlier file.'))
+    parser.add_argument('--sheets',
+                        nargs='*',
                         default=None,
-                        dest='input_file',
-                        help='Path to the input .xlsx spreadsheet.')
+                        dest='sheets',
+                        metavar='SHEET',
+                        help=('Read every worksheet of an .xlsx report, or only '
+                              'the worksheets named, in parallel processes and '
+                              'add each row\'s worksheet name in a "Sheet Name" '
+                              'column.'))
     group = parser.add_mutually_exclusive_group()
     group.add_argument('-n', '--no-transmit',
                         action='store_true',
@@ -34,11 +81,114 @@ def accept_arguments(sys_argv: Sequence[str]) -> tuple[Path,
                         dest='sftp_transmit',
                         help=('Transmit the output spreadsheet to '
                               'Press Ganey via SFTP.'))
+    group.add_argument('--transmit-only',
+                        default=None,
+                        dest='transmit_only',
+                        metavar='OUTPUT_FILE',
+                        help=('Skip reading and transforming a report and only '
+                              'transmit an existing output .csv file to '
+                              'Press Ganey via SFTP.  Cannot be used with '
+                              '"--dry-run" or "--sample".'))
+    parser.add_argument('--stream-upload',
+                        action='store_true',
+                        default=False,
+                        dest='stream_upload',
+                        help=('Write the output .csv file and upload it to '
+                              'Press Ganey in a single pass.  Only applies '
+                              'with "-s", "--sftp-transmit".  Output already '
+                              'delivered to Press Ganey is only saved, not '
+                              'uploaded again.'))
+    parser.add_argument('--shard-max-rows',
+                        type=int,
+                        default=None,
+                        dest='shard_max_rows',
+                        help=('Split the output .csv file into numbered shards '
+                              'of at most this many rows.'))
+    parser.add_argument('--shard-max-bytes',
+                        type=int,
+                        default=None,
+                        dest='shard_max_bytes',
+                        help=('Split the output .csv file into numbered shards '
+                              'of at most about this many bytes.'))
+    parser.add_argument('--upload-workers',
+                        type=positive_int,
+                        default=4,
+                        dest='upload_workers',
+                        help=('Maximum number of connections uploading shards '
+                              'to Press Ganey at the same time, each reused '
+                              'for several shards (default is 4).  Shards that '
+                              'failed are retried after 1s, then 2s.'))
+    parser.add_argument('--workers',
+                        type=int,
+                        default=1,
+                        dest='workers',
+                        help=('Number of processes that transform shards of '
+                              'the report rows at the same time (default is 1).  '
+                              'Reports of fewer than 100,000 rows are always '
+                              'transformed in a single process.'))
+    parser.add_argument('--profile',
+                        action='store_true',
+                        default=False,
+                        dest='profile',
+                        help=('Save a cProfile statistics file of the run to '
+                              'the "logs" folder.'))
+    parser.add_argument('--dry-run',
+                        action='store_true',
+                        default=False,
+                        dest='dry_run',
+                        help=('Run all actions and print a preview of the '
+                              'output with the rejected values of each column, '
+                              'without saving or transmitting anything.'))
+    parser.add_argument('--sample',
+                        type=int,
+                        default=None,
+                        dest='sample',
+                        metavar='N',
+                        help=('Dry run on the first N rows of the report.'))
+    parser.add_argument('--sample-seed',
+                        type=int,
+                        default=None,
+                        dest='sample_seed',
+                        metavar='SEED',
+                        help=('With "--sample", dry run on N random rows of '
+                              'the report chosen with this seed instead.'))
+    return parser
+
+def parse_run_options(sys_argv: Sequence[str]) -> RunOptions:
+    """Parse all options to the script."""
+    parser = create_argument_parser()
     args = parser.parse_args(sys_argv)
-    if args.input_file is not None:
-        input_file = Path(args.input_file)
-    else:
-        input_file = None
+    if args.transmit_only is not None and (args.dry_run or args.sample is not None):
+        parser.error('"--transmit-only" cannot be used with "--dry-run" or '
+                     '"--sample", it only transmits an existing file')
+    input_files = tuple(Path(input_file) for input_file in args.input_files or [])
+    input_file = input_files[0] if input_files else None
+    transmit_only = None
+    if args.transmit_only is not None:
+        transmit_only = Path(args.transmit_only)
+        args.sftp_transmit = True
     transmit_option = get_transmit_option_from_cli_args(args.no_transmit,
                                                         args.sftp_transmit)
-    return Path(args.config_path), input_file, transmit_option
\ No newline at end of file
+    return RunOptions(config_path=Path(args.config_path),
+                      input_file=input_file,
+                      transmit_option=transmit_option,
+                      stream_upload=args.stream_upload,
+                      shard_max_rows=args.shard_max_rows,
+                      shard_max_bytes=args.shard_max_bytes,
+                      upload_workers=args.upload_workers,
+                      workers=args.workers,
+                      transmit_only=transmit_only,
+                      profile=args.profile,
+                      dry_run=args.dry_run or args.sample is not None,
+                      sample=args.sample,
+                      sample_seed=args.sample_seed,
+                      input_files=input_files,
+                      drop_duplicate_rows_across_files=args.drop_duplicate_rows_across_files,
+                      sheets=None if args.sheets is None else tuple(args.sheets))
+
+def accept_arguments(sys_argv: Sequence[str]) -> tuple[Path,
+                                                       Path | None,
+                                                       TransmitOption]:
+    """Parse options to the script."""
+    options = parse_run_options(sys_argv)
+    return options.config_path, options.input_file, options.transmit_option
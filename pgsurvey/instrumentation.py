@@ -0,0 +1,54 @@
+import sys
+from typing import NamedTuple
+
+class ActionMetric(NamedTuple):
+    """Wall time, row counts and peak memory growth of a report action."""
+    name: str
+    seconds: float
+    rows_in: int
+    rows_out: int
+    peak_memory_delta: int | None = None
+
+    def __str__(self) -> str:
+        text = (f'"{self.name}" took {self.seconds:.3f}s, '
+                f'rows {self.rows_in} -> {self.rows_out}')
+        if self.peak_memory_delta is not None:
+            text += f', peak memory +{self.peak_memory_delta / 1048576:.1f} MiB'
+        return text
+
+def get_peak_memory_bytes() -> int | None:
+    """
+    Get the peak resident memory of the process so far, or None if it cannot
+    be read on this platform.  Cheap enough to call around every action.
+    """
+    if sys.platform == 'win32': # pragma: no cover
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD),
+                        ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t),
+                        ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t),
+                        ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess() # type: ignore
+        if ctypes.windll.psapi.GetProcessMemoryInfo( # type: ignore
+                process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+        return None
+    try:
+        import resource
+    except ImportError: # pragma: no cover
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': # pragma: no cover
+        return peak
+    return peak * 1024
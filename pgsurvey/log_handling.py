@@ -1,32 +1,158 @@
+import atexit
+from concurrent.futures import Future, ThreadPoolExecutor
+import gzip
+import os
 from pathlib import Path
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import queue
+import shutil
 import time
 import sys
 
+LOGGER_NAME = 'Press Ganey Survey Submitter'
+
+_queue_listeners: dict[str, QueueListener] = {}
+
 def create_logs_dir_if_not_exists(logs_directory: Path) -> None:
     """Create a logs directory."""
     logs_directory.mkdir(exist_ok=True)
 
-def create_logger(name: str = 'Press Ganey Survey Submitter',
-                  log_path: Path = Path('logs/press_ganey_survey.log')) -> logging.Logger:
-    """Create a logger with rotating files."""
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotating file handler that gzip compresses rotated files on a background
+    thread, then removes backups older than "max_age_days" and the oldest
+    backups once all of them take up more than "max_total_bytes".
+    """
+    def __init__(self, filename: Path, maxBytes: int, backupCount: int,
+                 max_total_bytes: int | None = None,
+                 max_age_days: float | None = None) -> None:
+        super().__init__(filename=filename, mode='a', maxBytes=maxBytes,
+                         backupCount=backupCount)
+        self.max_total_bytes = max_total_bytes
+        self.max_age_days = max_age_days
+        self.namer = lambda name: f'{name}.gz'
+        self.rotator = self.compress_in_background
+        self.executor = ThreadPoolExecutor(max_workers=1,
+                                           thread_name_prefix='log-compression')
+        self.pending_compression: Future | None = None
+
+    def doRollover(self) -> None:
+        """Wait for the previous compression so backups are renumbered safely."""
+        self.wait_for_compression()
+        super().doRollover()
+
+    def compress_in_background(self, source: str, dest: str) -> None:
+        """Move the full log file aside and compress it on the worker thread."""
+        uncompressed = f'{source}.rotated'
+        os.replace(source, uncompressed)
+        self.pending_compression = self.executor.submit(self.compress,
+                                                        uncompressed, dest)
+
+    def compress(self, source: str, dest: str) -> None:
+        """Gzip compress a rotated log file then apply the retention limits."""
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+        self.remove_old_backups()
+
+    def get_backups(self) -> list[Path]:
+        """Get the compressed backups, newest first."""
+        base = Path(self.baseFilename)
+        backups = base.parent.glob(f'{base.name}.*.gz')
+        return sorted(backups, key=lambda p: p.stat().st_mtime, reverse=True)
+
+    def remove_old_backups(self) -> None:
+        """Remove backups past the maximum age or total size."""
+        backups = self.get_backups()
+        if self.max_age_days is not None:
+            oldest_allowed = time.time() - self.max_age_days * 86400
+            for backup in backups[:]:
+                if backup.stat().st_mtime < oldest_allowed:
+                    backup.unlink()
+                    backups.remove(backup)
+        if self.max_total_bytes is not None:
+            total_bytes = 0
+            for backup in backups:
+                total_bytes += backup.stat().st_size
+                if total_bytes > self.max_total_bytes:
+                    backup.unlink()
+
+    def wait_for_compression(self) -> None:
+        """Wait for the file being compressed, if any."""
+        if self.pending_compression is not None:
+            self.pending_compression.result()
+            self.pending_compression = None
+
+    def close(self) -> None:
+        self.wait_for_compression()
+        self.executor.shutdown()
+        super().close()
+
+def create_logger(name: str = LOGGER_NAME,
+                  log_path: Path = Path('logs/press_ganey_survey.log'),
+                  max_total_bytes: int | None = 104857600,
+                  max_age_days: float | None = 365) -> logging.Logger:
+    """
+    Create a logger with rotating files, compressed once rotated.  Backups are
+    kept until all of them exceed "max_total_bytes" or they are older than
+    "max_age_days".
+    Records are put on a queue and written to the files by a background thread.
+    Calling this again for the same logger name returns the logger unchanged,
+    or replaces its queue handler if the logger was flushed since.
+    """
+    logger = logging.getLogger(name)
+    queue_handlers = [h for h in logger.handlers if isinstance(h, QueueHandler)]
+    if queue_handlers and name in _queue_listeners:
+        return logger
+    flush_logger(name)
+    # A flushed logger's queue is no longer read
+    for handler in queue_handlers:
+        logger.removeHandler(handler)
     TEN_MEBIBYTES = 10485760
     create_logs_dir_if_not_exists(logs_directory=log_path.parent)
     level = logging.INFO
     log_format = '%(asctime)s UTC|%(levelname)s|%(message)s'
     formatter = logging.Formatter(log_format)
     formatter.converter = time.gmtime # Set to UTC
-    file_handler = RotatingFileHandler(filename=log_path,
-                                       mode='a',
-                                       maxBytes=TEN_MEBIBYTES,
-                                       backupCount=100) 
+    file_handler = CompressingRotatingFileHandler(filename=log_path,
+                                                  maxBytes=TEN_MEBIBYTES,
+                                                  backupCount=100,
+                                                  max_total_bytes=max_total_bytes,
+                                                  max_age_days=max_age_days)
     file_handler.setFormatter(formatter)
-    logger = logging.getLogger(name)
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    _queue_listeners[name] = listener
     logger.setLevel(level)
-    logger.addHandler(file_handler)
+    logger.addHandler(QueueHandler(log_queue))
     return logger
 
+def flush_logger(name: str = LOGGER_NAME) -> None:
+    """
+    Write any queued records of a logger, stop its background writer thread
+    and close its files.
+    """
+    listener = _queue_listeners.pop(name, None)
+    if listener is None:
+        return None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+@atexit.register
+def flush_all_loggers() -> None:
+    """Flush every logger created by "create_logger", such as on exit."""
+    for name in list(_queue_listeners):
+        flush_logger(name)
+
+def get_profile_path(logs_directory: Path = Path('logs')) -> Path:
+    """Get a path in the logs directory for a cProfile statistics file."""
+    create_logs_dir_if_not_exists(logs_directory)
+    timestamp = time.strftime('%Y%m%d_%H%M%S', time.gmtime())
+    return logs_directory / Path(f'profile_{timestamp}.pstats')
+
 def override_sys_excepthook_to_log_uncaught_exceptions(
         logger: logging.Logger) -> None: # pragma: no cover
     """
@@ -41,4 +167,5 @@ def override_sys_excepthook_to_log_uncaught_exceptions(
         logger.critical("Uncaught exception", exc_info=(exc_type,
                                                         exc_value,
                                                         exc_traceback))
+        flush_logger(logger.name)
     sys.excepthook = handle_uncaught_exceptions
\ No newline at end of file
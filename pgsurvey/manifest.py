@@ -0,0 +1,116 @@
+import datetime
+import hashlib
+from pathlib import Path
+import sqlite3
+from typing import Iterable, NamedTuple
+
+class ManifestEntry(NamedTuple):
+    """Represents an output file recorded in the upload manifest."""
+    sha256: str
+    file_name: str
+    size: int
+    client_id: str
+    status: str
+    updated_at: str
+
+def hash_file(file: Path, chunk_size: int = 1048576) -> str:
+    """Get the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with file.open('rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class UploadManifest:
+    """
+    Local SQLite record of each output file's content hash, size, client ID
+    and upload status.  Used to avoid transmitting the same file twice.
+    """
+    PENDING = 'pending'
+    DELIVERED = 'delivered'
+    FAILED = 'failed'
+
+    def __init__(self, manifest_path: Path) -> None:
+        self.manifest_path = manifest_path
+        self.connection = sqlite3.connect(manifest_path)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS uploads ('
+                'sha256 TEXT PRIMARY KEY, '
+                'file_name TEXT NOT NULL, '
+                'size INTEGER NOT NULL, '
+                'client_id TEXT NOT NULL, '
+                'status TEXT NOT NULL, '
+                'updated_at TEXT NOT NULL)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS patient_keys ('
+                'sha256 TEXT NOT NULL, key_hash TEXT NOT NULL)')
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS patient_keys_sha256 '
+                'ON patient_keys (sha256)')
+
+    def close(self) -> None:
+        """Close the connection to the manifest."""
+        self.connection.close()
+
+    def get_entry(self, sha256: str) -> ManifestEntry | None:
+        """Get the manifest entry for a content hash, if it exists."""
+        row = self.connection.execute(
+            'SELECT sha256, file_name, size, client_id, status, updated_at '
+            'FROM uploads WHERE sha256 = ?', (sha256,)).fetchone()
+        if row is None:
+            return None
+        return ManifestEntry(*row)
+
+    def is_delivered(self, sha256: str) -> bool:
+        """Check if a file with the content hash was already delivered."""
+        entry = self.get_entry(sha256)
+        return entry is not None and entry.status == self.DELIVERED
+
+    def record(self, file: Path, client_id: str, status: str,
+               sha256: str | None = None) -> ManifestEntry:
+        """
+        Record the status of an output file.
+        A delivered file is never set back to another status.
+        """
+        if sha256 is None:
+            sha256 = hash_file(file)
+        updated_at = datetime.datetime.now(datetime.UTC).isoformat()
+        with self.connection:
+            self.connection.execute(
+                'INSERT INTO uploads '
+                '(sha256, file_name, size, client_id, status, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(sha256) DO UPDATE SET '
+                'file_name = excluded.file_name, '
+                'status = excluded.status, '
+                'updated_at = excluded.updated_at '
+                'WHERE uploads.status != ?',
+                (sha256, file.name, file.stat().st_size, client_id, status,
+                 updated_at, self.DELIVERED))
+        entry = self.get_entry(sha256)
+        assert entry is not None
+        return entry
+
+    def record_patient_key_hashes(self, sha256: str,
+                                  key_hashes: Iterable[str]) -> None:
+        """
+        Keep the patient key hashes of an output file until it is delivered,
+        so patients are recorded as surveyed even if it is sent later.
+        """
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM patient_keys WHERE sha256 = ?', (sha256,))
+            self.connection.executemany(
+                'INSERT INTO patient_keys (sha256, key_hash) VALUES (?, ?)',
+                ((sha256, key_hash) for key_hash in key_hashes))
+
+    def pop_patient_key_hashes(self, sha256: str) -> list[str]:
+        """Get and forget the patient key hashes kept for an output file."""
+        with self.connection:
+            rows = self.connection.execute(
+                'SELECT key_hash FROM patient_keys WHERE sha256 = ?',
+                (sha256,)).fetchall()
+            self.connection.execute(
+                'DELETE FROM patient_keys WHERE sha256 = ?', (sha256,))
+        return [row[0] for row in rows]
@@ -0,0 +1,46 @@
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from .reference_index import SortedIndex, load_cached_arrays
+
+class NpiEnrichment(NamedTuple):
+    """Settings for filling in provider details from a local NPI registry extract."""
+    path: str
+    npi_column: str = 'Attending Physician NPI'
+    name_column: Optional[str] = 'Attending Physician Name'
+    specialty_column: Optional[str] = 'Provider specialty'
+
+def build_npi_arrays(source: Path) -> dict[str, np.ndarray]:
+    """
+    Build the NPI registry index arrays from a .csv file with "npi", "name"
+    and "specialty" columns.  The first row of an NPI is used.
+    """
+    df = pd.read_csv(source, dtype=str, usecols=['npi', 'name', 'specialty'],
+                     keep_default_na=False)
+    df['npi'] = df['npi'].str.replace('[^0-9]', '', regex=True)
+    df = df.drop_duplicates('npi').sort_values('npi')
+    return {'npi': df['npi'].to_numpy(dtype=str),
+            'name': df['name'].str.strip().to_numpy(dtype=str),
+            'specialty': df['specialty'].str.strip().to_numpy(dtype=str)}
+
+class NpiRegistry:
+    """Provider name and specialty of each NPI in a local registry extract."""
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        self.index = SortedIndex(arrays['npi'], name=arrays['name'],
+                                 specialty=arrays['specialty'])
+
+    @classmethod
+    def load(cls, source: Path) -> 'NpiRegistry':
+        """Load the index cached next to the source .csv file."""
+        return cls(load_cached_arrays(source, build_npi_arrays))
+
+    def get(self, field: str, npis: pd.Series) -> pd.Series:
+        """
+        Get the "name" or "specialty" of each NPI, or NaN if the NPI is not in
+        the registry or has no value for the field.
+        """
+        values = self.index.get(field, npis.fillna('').astype(str))
+        return values.mask(values == '')
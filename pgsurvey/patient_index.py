@@ -0,0 +1,90 @@
+import datetime
+import hashlib
+from pathlib import Path
+import secrets
+import sqlite3
+from typing import Iterable, NamedTuple
+
+import pandas as pd
+
+class PatientDedup(NamedTuple):
+    """Settings for skipping patients that were surveyed in a previous run."""
+    key_columns: list[str]
+    lookback_days: int = 90
+    index_path: str = 'patient_index.sqlite3'
+
+class SurveyedPatientIndex:
+    """
+    Local SQLite index of the patients already sent to Press Ganey.
+    Patients are keyed by a salted hash so the index holds no identifiers.
+    """
+    def __init__(self, index_path: Path) -> None:
+        self.index_path = index_path
+        self.connection = sqlite3.connect(index_path)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS meta ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS surveyed ('
+                'key_hash TEXT NOT NULL, surveyed_on TEXT NOT NULL)')
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS surveyed_key_hash_surveyed_on '
+                'ON surveyed (key_hash, surveyed_on)')
+        self.salt = self.get_salt()
+
+    def close(self) -> None:
+        """Close the connection to the index."""
+        self.connection.close()
+
+    def get_salt(self) -> str:
+        """Get the salt for hashing patient keys, creating it on first use."""
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'salt'").fetchone()
+        if row is not None:
+            return row[0]
+        salt = secrets.token_hex(16)
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('salt', ?)", (salt,))
+        return salt
+
+    def hash_keys(self, keys: pd.Series) -> pd.Series:
+        """Get the salted hash of each key, hashing each distinct key once."""
+        hashes = {key: hashlib.sha256(f'{self.salt}{key}'.encode()).hexdigest()
+                  for key in keys.unique()}
+        return keys.map(hashes)
+
+    def get_surveyed_since(self, key_hashes: Iterable[str],
+                           since: datetime.date) -> set[str]:
+        """Get the key hashes that were surveyed on or after a date."""
+        with self.connection:
+            self.connection.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS run_keys (key_hash TEXT)')
+            self.connection.execute('DELETE FROM temp.run_keys')
+            self.connection.executemany(
+                'INSERT INTO temp.run_keys (key_hash) VALUES (?)',
+                ((key_hash,) for key_hash in set(key_hashes)))
+        rows = self.connection.execute(
+            'SELECT DISTINCT r.key_hash FROM temp.run_keys r '
+            'JOIN surveyed s ON s.key_hash = r.key_hash '
+            'AND s.surveyed_on >= ?', (since.isoformat(),))
+        return {row[0] for row in rows}
+
+    def is_recently_surveyed(self, key_hashes: pd.Series, lookback_days: int,
+                             today: datetime.date | None = None) -> pd.Series:
+        """Check which key hashes were surveyed within the lookback window."""
+        if today is None:
+            today = datetime.date.today()
+        since = today - datetime.timedelta(days=lookback_days)
+        return key_hashes.isin(self.get_surveyed_since(key_hashes.dropna(), since))
+
+    def record(self, key_hashes: Iterable[str],
+               surveyed_on: datetime.date | None = None) -> None:
+        """Record that the patients were sent to Press Ganey."""
+        if surveyed_on is None:
+            surveyed_on = datetime.date.today()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO surveyed (key_hash, surveyed_on) VALUES (?, ?)',
+                ((key_hash, surveyed_on.isoformat()) for key_hash in key_hashes))
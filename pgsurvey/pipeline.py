@@ -0,0 +1,117 @@
+import copy
+import functools
+import io
+import json
+from typing import NamedTuple
+
+import pandas as pd
+
+from .instrumentation import ActionMetric
+from .npi_registry import NpiEnrichment, NpiRegistry
+from .patient_index import PatientDedup, SurveyedPatientIndex
+from .report import (Column, Report, RowDedup, RowFilter,
+                     get_input_column_names)
+from .user_settings import (
+    read_config,
+    read_filters_config,
+    read_npi_registry_config,
+    read_patient_dedup_config,
+    read_row_dedup_config,
+    read_zip_reference_config,
+)
+from .zip_reference import ZipIndex, ZipReference
+
+class ReportConfig(NamedTuple):
+    """Every setting of a config .JSON file needed to transform a report."""
+    client_id: str
+    columns: list[Column]
+    actions: list[str]
+    patient_dedup: PatientDedup | None = None
+    row_dedup: RowDedup | None = None
+    filters: list[RowFilter] = []
+    zip_reference: ZipReference | None = None
+    npi_enrichment: NpiEnrichment | None = None
+
+    def get_input_column_names(self) -> set[str] | None:
+        """
+        Get the names of the report columns to read, including the columns
+        the filters and deduplication settings need.  None to read every
+        column.
+        """
+        key_columns = [row_filter.column for row_filter in self.filters]
+        for dedup in (self.patient_dedup, self.row_dedup):
+            if dedup is not None:
+                key_columns.extend(dedup.key_columns)
+        return get_input_column_names(self.columns, self.actions, key_columns)
+
+class ProcessResult(NamedTuple):
+    """The output of a report transformed in memory."""
+    df: pd.DataFrame
+    csv: bytes
+    rows_in: int
+    rejects: dict[str, int]
+    filtered: dict[str, int]
+    action_metrics: list[ActionMetric]
+    patient_key_hashes: list[str]
+
+def parse_report_config(config_serialized: dict) -> ReportConfig:
+    """
+    Parse the deserialized contents of the config .JSON file.  The contents
+    are left unchanged.
+    """
+    # read_config replaces each column's function name with the function
+    config_serialized = copy.deepcopy(config_serialized)
+    client_id, columns, actions = read_config(config_serialized)
+    return ReportConfig(client_id, columns, actions,
+                        patient_dedup=read_patient_dedup_config(config_serialized),
+                        row_dedup=read_row_dedup_config(config_serialized),
+                        filters=read_filters_config(config_serialized),
+                        zip_reference=read_zip_reference_config(config_serialized),
+                        npi_enrichment=read_npi_registry_config(config_serialized))
+
+@functools.lru_cache(maxsize=32)
+def compile_report_config(config_json: str) -> ReportConfig:
+    """Parse config .JSON text, reusing the result for the same text."""
+    return parse_report_config(json.loads(config_json))
+
+def get_report_config(config: dict | ReportConfig) -> ReportConfig:
+    """
+    Get the parsed settings of a deserialized config, parsing each distinct
+    config only once.
+    """
+    if isinstance(config, ReportConfig):
+        return config
+    return compile_report_config(json.dumps(config, sort_keys=True))
+
+def process(df: pd.DataFrame, config: dict | ReportConfig,
+            collect_rejects: bool = False,
+            workers: int = 1,
+            patient_index: SurveyedPatientIndex | None = None,
+            zip_index: ZipIndex | None = None,
+            npi_registry: NpiRegistry | None = None) -> ProcessResult:
+    """
+    Transform a report already in memory with the settings of a config
+    .JSON file and get the output rows and .csv file contents.  Nothing is
+    read from or written to disk and "df" is left unchanged.
+
+    With "collect_rejects", rejected values are counted per column and kept
+    instead of raising the first one, as in a dry run.  Reference indexes
+    the config's actions use are passed in already loaded.
+    """
+    report_config = get_report_config(config)
+    report = Report(df.copy(), report_config.columns, report_config.actions,
+                    patient_dedup=report_config.patient_dedup,
+                    patient_index=patient_index,
+                    row_dedup=report_config.row_dedup,
+                    collect_rejects=collect_rejects,
+                    filters=report_config.filters,
+                    zip_reference=report_config.zip_reference,
+                    zip_index=zip_index,
+                    npi_enrichment=report_config.npi_enrichment,
+                    npi_registry=npi_registry)
+    report.run_actions(workers)
+    buffer = io.BytesIO()
+    report.write_output_csv(buffer)
+    return ProcessResult(report.df, buffer.getvalue(), len(df), report.rejects,
+                         report.filtered, report.action_metrics,
+                         report.get_patient_key_hashes())
@@ -0,0 +1,88 @@
+import logging
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from .log_handling import LOGGER_NAME
+
+logger = logging.getLogger(LOGGER_NAME)
+
+def get_index_cache_path(source: Path) -> Path:
+    """Get the path of the prebuilt index cached next to a reference file."""
+    return source.with_name(f'{source.name}.npz')
+
+def load_cached_arrays(source: Path,
+                       build: Callable[[Path], dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    """
+    Load the arrays of a reference index from its cache next to the source
+    file, building and caching them first if the source file is newer.
+    Arrays are stored without pickling so loading stays fast.
+    """
+    cache = get_index_cache_path(source)
+    if cache.exists() and cache.stat().st_mtime >= source.stat().st_mtime:
+        try:
+            with np.load(cache, allow_pickle=False) as npz:
+                return {name: npz[name] for name in npz.files}
+        except (OSError, ValueError) as e:
+            logger.warning(f'Rebuilding unreadable index cache "{cache}": {e}')
+    logger.info(f'Build reference index from "{source}"')
+    arrays = build(source)
+    try:
+        np.savez(cache, **arrays)
+    except OSError as e:
+        logger.warning(f'Unable to cache reference index at "{cache}": {e}')
+    return arrays
+
+def map_distinct(series: pd.Series,
+                 func: Callable[[pd.Series], pd.Series]) -> pd.Series:
+    """
+    Run a column-level function on the distinct values of a column only,
+    then map its results back to every row.  NaN values stay NaN.
+    """
+    codes, uniques = pd.factorize(series)
+    results = func(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+    values = np.append(results, np.nan)[np.where(codes < 0, len(results), codes)]
+    return pd.Series(values, index=series.index, dtype=object)
+
+class SortedIndex:
+    """
+    Reference values sorted by key.  Columns are joined to it by binary
+    search on their distinct values.
+    """
+    def __init__(self, keys: np.ndarray, **fields: np.ndarray) -> None:
+        self.keys = keys
+        self.fields = fields
+
+    def find(self, keys: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the position of each key in the index and whether it was found.
+        Each distinct key is only searched for once.
+        """
+        codes, uniques = pd.factorize(keys)
+        distinct = np.asarray(uniques, dtype=str)
+        positions = np.searchsorted(self.keys, distinct)
+        found = np.zeros(len(distinct), dtype=bool)
+        in_bounds = positions < len(self.keys)
+        found[in_bounds] = self.keys[positions[in_bounds]] == distinct[in_bounds]
+        missing = codes < 0 # NaN keys
+        codes = np.where(missing, 0, codes)
+        if len(distinct) == 0:
+            return np.zeros(len(codes), dtype=int), np.zeros(len(codes), dtype=bool)
+        positions = np.minimum(positions, max(len(self.keys) - 1, 0))
+        return positions[codes], found[codes] & ~missing
+
+    def contains(self, keys: pd.Series) -> pd.Series:
+        """Check which keys are in the index."""
+        _, found = self.find(keys)
+        return pd.Series(found, index=keys.index)
+
+    def get(self, field: str, keys: pd.Series) -> pd.Series:
+        """Get a field of the index for each key, or NaN if not found."""
+        positions, found = self.find(keys)
+        if len(self.keys) == 0:
+            return pd.Series(np.nan, index=keys.index, dtype=object)
+        values = pd.Series(self.fields[field][positions], index=keys.index,
+                           dtype=object)
+        return values.where(found)
@@ -1,7 +1,23 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+import functools
+import hashlib
+import io
+import itertools
 from pathlib import Path
+import logging
+import multiprocessing
+import numpy as np
 import pandas as pd
 import datetime
-from typing import NamedTuple, Optional, Callable
+import time
+from typing import Any, BinaryIO, Iterable, NamedTuple, Optional, Callable
+from .instrumentation import ActionMetric, get_peak_memory_bytes
+from .log_handling import LOGGER_NAME
+from .patient_index import PatientDedup, SurveyedPatientIndex
+from .npi_registry import NpiEnrichment, NpiRegistry
+from .zip_reference import ZipIndex, ZipReference
+
+logger = logging.getLogger(LOGGER_NAME)
 
 class Column(NamedTuple):
     """Represents a column from the input or output spreadsheet."""
@@ -14,6 +30,141 @@ class Column(NamedTuple):
     func: Optional[Callable] = None
     drop_column: Optional[bool] = None
 
+class RowDedup(NamedTuple):
+    """Settings for removing duplicate rows within the input spreadsheet."""
+    key_columns: list[str]
+    latest_column: Optional[str] = None
+
+def parse_dates(series: pd.Series) -> pd.Series:
+    """
+    Parse a column of dates, whether still in the input format or already
+    transformed to MMDDYYYY.  Unparseable values become NaT.
+    """
+    dates = pd.to_datetime(series, errors='coerce', format='mixed')
+    transformed = pd.to_datetime(series.where(dates.isna()), errors='coerce',
+                                 format='%m%d%Y')
+    return dates.fillna(transformed)
+
+class RowFilter(NamedTuple):
+    """
+    A condition rows must meet to be sent to Press Ganey.  "type" is one of
+    "date_range", "age", "equals", "in" or "not_empty".
+    """
+    column: str
+    type: str
+    start: Optional[str] = None
+    end: Optional[str] = None
+    days: Optional[int] = None
+    min_age: Optional[int] = None
+    max_age: Optional[int] = None
+    value: Optional[str] = None
+    values: Optional[list[str]] = None
+    exclude: bool = False
+    reason: Optional[str] = None
+
+    def get_reason(self) -> str:
+        """Get the reason logged for rows the filter removes."""
+        if self.reason is not None:
+            return self.reason
+        return f'{self.type} on "{self.column}"'
+
+    def get_mask(self, series: pd.Series,
+                 today: datetime.date | None = None) -> pd.Series:
+        """Get which rows pass the filter."""
+        if today is None:
+            today = datetime.date.today()
+        match self.type:
+            case 'date_range':
+                dates = parse_dates(series)
+                mask = dates.notna()
+                if self.start is not None:
+                    mask &= dates >= pd.Timestamp(self.start)
+                if self.end is not None:
+                    mask &= dates <= pd.Timestamp(self.end)
+                if self.days is not None:
+                    since = today - datetime.timedelta(days=self.days)
+                    mask &= dates >= pd.Timestamp(since)
+            case 'age':
+                dates = parse_dates(series)
+                birthday_to_come = ((dates.dt.month > today.month)
+                                    | ((dates.dt.month == today.month)
+                                       & (dates.dt.day > today.day)))
+                ages = today.year - dates.dt.year - birthday_to_come.astype(int)
+                mask = dates.notna()
+                if self.min_age is not None:
+                    mask &= ages >= self.min_age
+                if self.max_age is not None:
+                    mask &= ages <= self.max_age
+            case 'equals' | 'in':
+                if self.type == 'equals':
+                    expected = [] if self.value is None else [self.value]
+                else:
+                    expected = self.values or []
+                if not expected:
+                    raise ValueError(f'Filter "{self.get_reason()}" has no value')
+                text = series.fillna('').astype(str).str.strip().str.casefold()
+                mask = text.isin([str(v).strip().casefold() for v in expected])
+            case 'not_empty':
+                text = series.fillna('').astype(str).str.strip()
+                mask = ~text.isin(('', 'nan'))
+            case _:
+                raise ValueError(f'Unknown filter type "{self.type}"')
+        if self.exclude:
+            return ~mask
+        return mask
+
+def get_input_column_names(columns: list[Column], actions: list[str],
+                           key_columns: Iterable[str] = ()) -> set[str] | None:
+    """
+    Get the names of the input columns the config uses, or None if every
+    input column is needed because the output keeps columns not in the
+    config.  Columns with a default value are not read since the default
+    replaces them.
+    """
+    if ('sort_column_order' not in actions
+            or 'remove_email_if_patient_did_not_opt_in' in actions):
+        return None
+    names = set(key_columns)
+    for col in columns:
+        if col.default_value is not None:
+            continue
+        names.add(col.name)
+        if col.old_name is not None:
+            names.add(col.old_name)
+        if col.source_column_name is not None:
+            names.add(col.source_column_name)
+    return names
+
+ROW_INDEPENDENT_ACTIONS = frozenset({
+    'coerce_all_columns_to_data_type_string',
+    'trim_whitespace_from_all_columns',
+    'create_new_columns_from_source_columns',
+    'rename_column_headers',
+    'run_functions_on_columns',
+    'add_columns_with_default_values',
+    'truncate_columns_longer_than_max_length',
+    'sort_column_order',
+    'remove_email_if_patient_did_not_opt_in',
+    'drop_columns_that_are_not_needed',
+})
+
+_worker_columns: list[Column] = []
+_worker_collect_rejects = False
+
+def init_worker(columns: list[Column], collect_rejects: bool) -> None:
+    """Keep the config columns in a worker process for the shards it runs."""
+    global _worker_columns, _worker_collect_rejects
+    _worker_columns = columns
+    _worker_collect_rejects = collect_rejects
+
+def run_actions_on_shard(df: pd.DataFrame,
+                         actions: list[str]) -> tuple[pd.DataFrame, dict[str, int]]:
+    """Run row-independent actions on a shard of rows in a worker process."""
+    report = Report(df, _worker_columns, actions,
+                    collect_rejects=_worker_collect_rejects)
+    report.run_actions()
+    return report.df, report.rejects
+
 class ReportPath:
     """Handle input and output spreadsheets."""
     def __init__(self, project_directory: Path,
@@ -27,40 +178,167 @@ class ReportPath:
         if create_output_directory:
             self.output_directory.mkdir(exist_ok=True)
         self.INPUT_FILE_EXT = '.xlsx'
+        self.INPUT_FILE_EXTS = ('.xlsx', '.csv', '.tsv')
     
     def get_input_file_path(self, input_file_name: str) -> Path:
-        """Get the path for the input .xlsx spreadsheet."""
-        if input_file_name.endswith(self.INPUT_FILE_EXT) is False:
+        """Get the path for the input .xlsx, .csv or .tsv report."""
+        if input_file_name.lower().endswith(self.INPUT_FILE_EXTS) is False:
             input_file_name += self.INPUT_FILE_EXT 
         input_file = self.input_directory / Path(input_file_name)
         if input_file.exists() is False:
             raise FileNotFoundError
         return input_file
 
-    def get_output_path(self, client_id: str, suffix: str) -> Path:
-        """Get the path for a spreadsheet being output."""
+    def get_output_path(self, client_id: str, suffix: str,
+                        shard: int | None = None) -> Path:
+        """
+        Get the path for a spreadsheet being output.
+        If a shard number is given it is appended to the file name.
+        """
         allowed_suffixes = ('.xlsx', '.csv')
         if suffix not in allowed_suffixes:
             raise ValueError('The suffix parameter only accepts file extensions: '
                              f'{", ".join(allowed_suffixes)}')
         today = datetime.date.today()
         output_file_stem = f'{client_id}{today.strftime("%m%d%Y")}'
+        if shard is not None:
+            output_file_stem += f'_{shard:03d}'
         return self.output_directory / Path(f'{output_file_stem}{suffix}')
 
 
 class Report:
     """Handle the parsing and transformation of the input data."""
+    PARALLEL_MIN_SHARD_ROWS = 10000
+    # Spawning the workers and pickling the shards costs more than it saves
+    # on smaller reports
+    PARALLEL_MIN_ROWS = 100000
+
     def __init__(self, df: pd.DataFrame,
                  columns: list[Column],
-                 actions: list[str]) -> None:
+                 actions: list[str],
+                 patient_dedup: PatientDedup | None = None,
+                 patient_index: SurveyedPatientIndex | None = None,
+                 row_dedup: RowDedup | None = None,
+                 collect_rejects: bool = False,
+                 filters: list[RowFilter] | None = None,
+                 zip_reference: ZipReference | None = None,
+                 zip_index: ZipIndex | None = None,
+                 npi_enrichment: NpiEnrichment | None = None,
+                 npi_registry: NpiRegistry | None = None) -> None:
         self.df = df
         self.columns = columns
         self.actions = actions
+        self.patient_dedup = patient_dedup
+        self.patient_index = patient_index
+        self.row_dedup = row_dedup
+        self.collect_rejects = collect_rejects
+        self.filters = filters or []
+        self.filtered: dict[str, int] = {}
+        self.zip_reference = zip_reference
+        self.zip_index = zip_index
+        self.npi_enrichment = npi_enrichment
+        self.npi_registry = npi_registry
+        self.rejects: dict[str, int] = {}
+        self.action_metrics: list[ActionMetric] = []
+        self.patient_key_hashes: pd.Series | None = None
+
+    def measure(self, name: str, func: Callable[[], Any]) -> Any:
+        """
+        Run a function on the report, recording and logging its wall time,
+        rows in and out and the growth of the process' peak memory.
+        """
+        rows_in = len(self.df)
+        peak_memory_before = get_peak_memory_bytes()
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        peak_memory_after = get_peak_memory_bytes()
+        peak_memory_delta = None
+        if peak_memory_before is not None and peak_memory_after is not None:
+            peak_memory_delta = peak_memory_after - peak_memory_before
+        metric = ActionMetric(name, seconds, rows_in, len(self.df),
+                              peak_memory_delta)
+        self.action_metrics.append(metric)
+        logger.info(f'Action {metric}')
+        return result
+
+    def get_current_column_name(self, name: str) -> str:
+        """
+        Get the name a config column currently has in the dataframe, which is
+        its old or source column name until the column headers are renamed.
+        """
+        if name in self.df.columns:
+            return name
+        for col in self.columns:
+            if col.name == name:
+                for current_name in (col.old_name, col.source_column_name):
+                    if current_name is not None and current_name in self.df.columns:
+                        return current_name
+        raise KeyError(name)
 
     def save_output_csv(self, output_path: Path) -> None:
         """Output to a .csv file."""
         self.df.to_csv(output_path, index=False, encoding='ascii')
 
+    def write_output_csv(self, buffer: BinaryIO) -> None:
+        """Output .csv file contents to an open binary stream."""
+        self.df.to_csv(buffer, index=False, encoding='ascii')
+
+    def hash_output_csv(self) -> str:
+        """Get the SHA-256 hex digest of the output .csv file contents."""
+        buffer = io.BytesIO()
+        self.write_output_csv(buffer)
+        return hashlib.sha256(buffer.getbuffer()).hexdigest()
+
+    def estimate_output_row_sizes(self) -> pd.Series:
+        """
+        Estimate the number of bytes each row takes up in the output .csv file.
+        Quoting of values is not accounted for.
+        """
+        value_lengths = self.df.astype(str).apply(lambda x: x.str.len())
+        delimiters_and_newline = len(self.df.columns)
+        return value_lengths.sum(axis=1) + delimiters_and_newline
+
+    def get_shard_bounds(self, max_rows: int | None = None,
+                         max_bytes: int | None = None) -> list[tuple[int, int]]:
+        """
+        Get the start and stop row positions of each output shard.
+        Every shard holds at least one row.
+        """
+        row_count = len(self.df)
+        if row_count == 0:
+            return [(0, 0)]
+        if max_bytes is not None:
+            header_size = len(','.join(map(str, self.df.columns))) + 1
+            row_size_budget = max_bytes - header_size
+            cumulative_sizes = self.estimate_output_row_sizes().cumsum().to_numpy()
+        bounds = []
+        start = 0
+        while start < row_count:
+            stop = row_count
+            if max_rows is not None:
+                stop = min(stop, start + max_rows)
+            if max_bytes is not None:
+                offset = cumulative_sizes[start - 1] if start > 0 else 0
+                fits = int(np.searchsorted(cumulative_sizes,
+                                           offset + row_size_budget,
+                                           side='right'))
+                stop = min(stop, max(fits, start + 1))
+            bounds.append((start, stop))
+            start = stop
+        return bounds
+
+    def get_shards(self, max_rows: int | None = None,
+                   max_bytes: int | None = None) -> list['Report']:
+        """Split the output into numbered shards by max rows or max bytes."""
+        if max_rows is None and max_bytes is None:
+            return [self]
+        shards = [Report(self.df.iloc[start:stop], self.columns, self.actions)
+                  for start, stop in self.get_shard_bounds(max_rows, max_bytes)]
+        for shard in shards:
+            shard.patient_key_hashes = self.patient_key_hashes
+        return shards
+
     def save_output_xlsx(self, output_path: Path) -> None:
         """Output to an .xlsx file."""
         self.df.to_excel(output_path, index=False)
@@ -89,7 +367,42 @@ class Report:
         """If a function is specified to be run on a column, run the function."""
         for col in self.columns:
             if col.func is not None:
-                self.df[col.name] = self.df[col.name].apply(col.func) 
+                self.measure(f'{col.func.__name__} on {col.name}',
+                             functools.partial(self.run_function_on_column,
+                                               col.name, col.func))
+
+    def run_function_on_column(self, name: str, func: Callable) -> None:
+        """
+        Run a column's function on each value of the column.  When collecting
+        rejects, values the function rejects are counted and kept unchanged
+        instead of stopping the run.
+        """
+        element_func = getattr(func, 'element_func', None)
+        if self.collect_rejects:
+            self.df[name] = self.df[name].apply(
+                functools.partial(self.run_function_collecting_rejects,
+                                  name, element_func or func))
+        elif element_func is not None:
+            self.df[name] = func(self.df[name])
+        else:
+            self.df[name] = self.df[name].apply(func)
+
+    def run_function_collecting_rejects(self, name: str, func: Callable,
+                                        v: Any) -> Any:
+        """Run a column's function on a value, counting the value if rejected."""
+        try:
+            return func(v)
+        except Exception:
+            self.rejects[name] = self.rejects.get(name, 0) + 1
+            return v
+
+    def get_column_summary(self, rows: int = 3) -> pd.DataFrame:
+        """Get the rejected value count and the first values of each column."""
+        return pd.DataFrame(
+            {'Rejects': [self.rejects.get(name, 0) for name in self.df.columns],
+             'Preview': [' | '.join(self.df[name].head(rows).astype(str))
+                         for name in self.df.columns]},
+            index=self.df.columns)
 
     def add_columns_with_default_values(self) -> None:
         """Add a column and fill with a default value."""
@@ -112,9 +425,18 @@ class Report:
                                         email_column_name: str = 'Email',
                                         use_email_column_name: str = 'Use Email?',
                                         use_email_negative_value: str = 'n') -> None:
-        """If email opt-in was not agreed to by patient then don't include email."""
-        self.df[email_column_name].mask(self.df[use_email_column_name] == \
-                                        use_email_negative_value, '', inplace=True)
+        """
+        If email opt-in was not agreed to by patient then don't include email.
+        The opt-in column may still hold yes/no text, so this can run before
+        the email column is validated.  A blank or missing opt-in counts as
+        "no", as it does for "to_yn_from_yesno".
+        """
+        email_column_name = self.get_current_column_name(email_column_name)
+        use_email = self.df[self.get_current_column_name(use_email_column_name)]
+        use_email = use_email.fillna('').astype(str).str.strip().str.lower()
+        use_email = use_email.replace({'no': 'n', '': 'n', 'nan': 'n', 'yes': 'y'})
+        self.df[email_column_name] = self.df[email_column_name].mask(
+            use_email == use_email_negative_value, '')
         
     def drop_columns_that_are_not_needed(self) -> None:
         """Drop specified columns."""
@@ -124,8 +446,182 @@ class Report:
                 columns_to_drop.append(col.name)
         self.df.drop(columns_to_drop, axis=1, inplace=True)
 
-    def run_actions(self) -> None:
-        """Run any functions specified in the config file."""
+    def remove_duplicate_rows(self) -> None:
+        """
+        Keep one row for each set of rows with the same key column values.
+        The row with the latest date in the latest column is kept, otherwise
+        the last row.  Rows with blank key columns are never removed.
+        """
+        if self.row_dedup is None:
+            raise ValueError('Removing duplicate rows requires "deduplicate" '
+                             'settings in the config file.')
+        key_columns = [self.get_current_column_name(c)
+                       for c in self.row_dedup.key_columns]
+        has_key = ~self.df[key_columns].astype(str) \
+            .isin(['', 'nan']).all(axis=1).to_numpy()
+        order = np.arange(len(self.df))
+        if self.row_dedup.latest_column is not None:
+            latest_column = self.get_current_column_name(
+                self.row_dedup.latest_column)
+            latest = parse_dates(self.df[latest_column]).reset_index(drop=True)
+            order = latest.sort_values(kind='stable',
+                                       na_position='first').index.to_numpy()
+        duplicated = np.empty(len(self.df), dtype=bool)
+        duplicated[order] = self.df.iloc[order] \
+            .duplicated(subset=key_columns, keep='last').to_numpy()
+        duplicated &= has_key
+        self.df = self.df[~duplicated]
+        logger.info(f'Removed {int(duplicated.sum())} duplicate row(s) by '
+                    f'{", ".join(self.row_dedup.key_columns)}')
+
+    def remove_previously_surveyed_patients(self) -> None:
+        """
+        Drop patients that were already sent to Press Ganey within the
+        lookback window of the patient dedup settings.
+        """
+        if self.patient_dedup is None or self.patient_index is None:
+            raise ValueError('Removing previously surveyed patients requires '
+                             '"patient_dedup" settings in the config file.')
+        key_columns = [self.get_current_column_name(c)
+                       for c in self.patient_dedup.key_columns]
+        key_values = self.df[key_columns].astype(str)
+        keys = key_values.agg('\x1f'.join, axis=1)
+        has_key = ~key_values.isin(['', 'nan']).all(axis=1)
+        key_hashes = self.patient_index.hash_keys(keys).where(has_key)
+        recently_surveyed = self.patient_index.is_recently_surveyed(
+            key_hashes, self.patient_dedup.lookback_days)
+        self.df = self.df[~recently_surveyed]
+        self.patient_key_hashes = key_hashes[~recently_surveyed].dropna()
+        logger.info(f'Removed {int(recently_surveyed.sum())} row(s) of patients '
+                    'surveyed in the last '
+                    f'{self.patient_dedup.lookback_days} days')
+
+    def cross_validate_zip_codes(self) -> None:
+        """
+        Check each row's city and state against its ZIP code in the ZIP code
+        reference, filling in a missing city or state.  Mismatches are
+        logged, or corrected if set in the "zip_reference" config section.
+        """
+        if self.zip_reference is None or self.zip_index is None:
+            raise ValueError('The "zip_reference" config section is required '
+                             'to cross validate ZIP codes')
+        city_name = self.get_current_column_name(self.zip_reference.city_column)
+        state_name = self.get_current_column_name(self.zip_reference.state_column)
+        check = self.zip_index.check(
+            self.df[self.get_current_column_name(self.zip_reference.zip_column)],
+            self.df[city_name], self.df[state_name],
+            self.zip_reference.correct_mismatches)
+        self.df[city_name] = check.city
+        self.df[state_name] = check.state
+        city_mismatches = int(check.city_mismatch.sum())
+        state_mismatches = int(check.state_mismatch.sum())
+        if self.collect_rejects and not self.zip_reference.correct_mismatches:
+            for name, count in ((city_name, city_mismatches),
+                                (state_name, state_mismatches)):
+                if count:
+                    self.rejects[name] = self.rejects.get(name, 0) + count
+        action = 'Corrected' if self.zip_reference.correct_mismatches else 'Found'
+        logger.info(f'{action} {city_mismatches} city and {state_mismatches} '
+                    'state mismatch(es) with the ZIP code, filled in '
+                    f'{check.filled} missing city or state value(s), '
+                    f'{int(check.unknown_zip.sum())} ZIP code(s) not in the '
+                    'reference')
+
+    def enrich_providers_from_npi_registry(self) -> None:
+        """
+        Fill in the provider name and specialty of each row whose NPI is in
+        the NPI registry, keeping the current values of the other rows.
+        """
+        if self.npi_enrichment is None or self.npi_registry is None:
+            raise ValueError('The "npi_registry" config section is required '
+                             'to enrich providers from the NPI registry')
+        npis = self.df[self.get_current_column_name(self.npi_enrichment.npi_column)]
+        found = pd.Series(False, index=self.df.index)
+        for field, column in (('name', self.npi_enrichment.name_column),
+                              ('specialty', self.npi_enrichment.specialty_column)):
+            if column is None:
+                continue
+            column_name = self.get_current_column_name(column)
+            values = self.npi_registry.get(field, npis)
+            self.df[column_name] = self.df[column_name].mask(values.notna(), values)
+            found |= values.notna()
+        missing = npis[~found & ~npis.fillna('').isin(('', 'nan'))]
+        logger.info(f'Filled in provider details of {int(found.sum())} row(s) '
+                    f'from the NPI registry, {missing.nunique()} NPI(s) not in '
+                    'the registry')
+
+    def get_patient_key_hashes(self) -> list[str]:
+        """Get the patient key hashes of the rows still in the output."""
+        if self.patient_key_hashes is None:
+            return []
+        key_hashes = self.patient_key_hashes
+        return key_hashes[key_hashes.index.isin(self.df.index)].tolist()
+
+    def run_actions_in_parallel(self, executor: Executor, actions: list[str],
+                                shards: int) -> None:
+        """
+        Split the rows into shards, run row-independent actions on each shard
+        in the worker processes, then join the shards in the original order.
+        """
+        bounds = np.linspace(0, len(self.df), shards + 1).astype(int)
+        dfs = [self.df.iloc[start:end] for start, end in zip(bounds, bounds[1:])]
+        results = list(executor.map(run_actions_on_shard, dfs,
+                                    itertools.repeat(actions)))
+        self.df = pd.concat([df for df, _ in results])
+        for _, rejects in results:
+            for name, count in rejects.items():
+                self.rejects[name] = self.rejects.get(name, 0) + count
+
+    def get_shard_count(self, workers: int) -> int:
+        """Get how many row shards to run in parallel on "workers" processes."""
+        return max(min(workers, len(self.df) // self.PARALLEL_MIN_SHARD_ROWS), 1)
+
+    def apply_filters(self, today: datetime.date | None = None) -> None:
+        """
+        Remove the rows that do not pass every filter.  Rows removed are
+        counted against the first filter they fail.
+        """
+        keep = pd.Series(True, index=self.df.index)
+        for row_filter in self.filters:
+            column_name = self.get_current_column_name(row_filter.column)
+            mask = row_filter.get_mask(self.df[column_name], today)
+            reason = row_filter.get_reason()
+            self.filtered[reason] = (self.filtered.get(reason, 0)
+                                     + int((keep & ~mask).sum()))
+            keep &= mask
+        self.df = self.df[keep].copy()
+        for reason, count in self.filtered.items():
+            logger.info(f'Filtered {count} row(s): {reason}')
+
+    def run_actions(self, workers: int = 1) -> None:
+        """
+        Run any functions specified in the config file, after removing rows
+        that do not pass the filters.  With more than one worker, consecutive
+        row-independent actions run on row shards in a pool of worker
+        processes, which receive the config columns once.  Reports of fewer
+        than PARALLEL_MIN_ROWS rows always run serially.
+        """
+        if self.filters:
+            self.measure('apply_filters', self.apply_filters)
+        if workers > 1 and len(self.df) < self.PARALLEL_MIN_ROWS:
+            logger.info(f'Run actions serially, {len(self.df)} row(s) is fewer '
+                        f'than the {self.PARALLEL_MIN_ROWS} needed for worker '
+                        'processes to be faster')
+        elif workers > 1 and self.get_shard_count(workers) > 1:
+            # Workers are spawned as on Windows, since forking would copy
+            # the logging queue listener's thread state into each worker
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=init_worker,
+                                     initargs=(self.columns,
+                                               self.collect_rejects)) as executor:
+                self.run_action_groups(executor, workers)
+            return None
+        for action_name in self.actions:
+            self.measure(action_name, self.get_action(action_name))
+
+    def get_action(self, action_name: str) -> Callable[[], None]:
+        """Get the method of an action named in the config file."""
         mapping: dict[str, Callable] = {
             'coerce_all_columns_to_data_type_string': self.coerce_all_columns_to_data_type_string,
             'trim_whitespace_from_all_columns': self.trim_whitespace_from_all_columns,
@@ -137,7 +633,26 @@ class Report:
             'sort_column_order': self.sort_column_order,
             'remove_email_if_patient_did_not_opt_in': self.remove_email_if_patient_did_not_opt_in,
             'drop_columns_that_are_not_needed': self.drop_columns_that_are_not_needed,
+            'remove_previously_surveyed_patients': self.remove_previously_surveyed_patients,
+            'remove_duplicate_rows': self.remove_duplicate_rows,
+            'cross_validate_zip_codes': self.cross_validate_zip_codes,
+            'enrich_providers_from_npi_registry': self.enrich_providers_from_npi_registry,
         }
-        for action_name in self.actions:
-            action = mapping[action_name]
-            action()
+        return mapping[action_name]
+
+    def run_action_groups(self, executor: Executor, workers: int) -> None:
+        """
+        Run groups of consecutive row-independent actions on the worker
+        processes and any other action on the whole report.
+        """
+        for row_independent, group in itertools.groupby(
+                self.actions, key=lambda action: action in ROW_INDEPENDENT_ACTIONS):
+            group_actions = list(group)
+            if row_independent:
+                shards = self.get_shard_count(workers)
+                self.measure(f'{", ".join(group_actions)} on {shards} shards',
+                             functools.partial(self.run_actions_in_parallel,
+                                               executor, group_actions, shards))
+            else:
+                for action_name in group_actions:
+                    self.measure(action_name, self.get_action(action_name))
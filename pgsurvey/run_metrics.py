@@ -0,0 +1,125 @@
+from contextlib import contextmanager
+import datetime
+import json
+import math
+from pathlib import Path
+import time
+from typing import Any, Iterator
+import uuid
+
+from .instrumentation import get_peak_memory_bytes
+
+RUN_METRICS_PATH = Path('logs/run_metrics.jsonl')
+RUN_COUNTS = ('rows_in', 'rows_out', 'rows_dropped', 'rejects')
+
+class RunMetrics:
+    """
+    Collect the stage durations and counts of a run and append them to a
+    JSON-lines file, one record per stage and one record for the run.
+    """
+    def __init__(self, metrics_path: Path = RUN_METRICS_PATH) -> None:
+        self.metrics_path = metrics_path
+        self.run_id = uuid.uuid4().hex
+        self.started_at = datetime.datetime.now(datetime.UTC)
+        self.start = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.values: dict[str, Any] = {}
+        self.status = 'success'
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a stage of the run."""
+        start = time.perf_counter()
+        try:
+            yield None
+        finally:
+            seconds = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def set(self, **values: Any) -> None:
+        """Set values to record for the run, such as row counts."""
+        self.values.update(values)
+
+    def get_records(self) -> list[dict[str, Any]]:
+        """Get the stage records and the run record."""
+        timestamp = self.started_at.isoformat()
+        records: list[dict[str, Any]] = [
+            {'type': 'stage', 'run_id': self.run_id, 'timestamp': timestamp,
+             'stage': stage, 'seconds': seconds}
+            for stage, seconds in self.stages.items()]
+        records.append({'type': 'run', 'run_id': self.run_id,
+                        'timestamp': timestamp, 'status': self.status,
+                        'seconds': time.perf_counter() - self.start,
+                        'stages': self.stages,
+                        'peak_rss_bytes': get_peak_memory_bytes(),
+                        **self.values})
+        return records
+
+    def write(self) -> None:
+        """Append the records to the JSON-lines file."""
+        self.metrics_path.parent.mkdir(exist_ok=True)
+        with self.metrics_path.open('a') as f:
+            for record in self.get_records():
+                f.write(json.dumps(record) + '\n')
+
+def read_run_metrics(metrics_path: Path = RUN_METRICS_PATH) -> list[dict[str, Any]]:
+    """Read the run records from the JSON-lines file, oldest first."""
+    if not metrics_path.exists():
+        return []
+    runs = []
+    with metrics_path.open() as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get('type') == 'run':
+                runs.append(record)
+    return runs
+
+def percentile(values: list[float], percent: float) -> float:
+    """Get the nearest-rank percentile of the values."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+def summarize_run_metrics(metrics_path: Path = RUN_METRICS_PATH,
+                          last: int = 100) -> dict[str, dict[str, float]]:
+    """Get the run count, p50 and p95 duration of each stage over the last runs."""
+    runs = read_run_metrics(metrics_path)[-last:]
+    durations: dict[str, list[float]] = {}
+    for run in runs:
+        for stage, seconds in run['stages'].items():
+            durations.setdefault(stage, []).append(seconds)
+        durations.setdefault('total', []).append(run['seconds'])
+    return {stage: {'runs': len(values),
+                    'p50': percentile(values, 50),
+                    'p95': percentile(values, 95)}
+            for stage, values in durations.items()}
+
+def summarize_run_counts(metrics_path: Path = RUN_METRICS_PATH,
+                         last: int = 100) -> dict[str, dict[str, float]]:
+    """Get the run count, p50 and p95 of each row count over the last runs."""
+    runs = read_run_metrics(metrics_path)[-last:]
+    counts = {name: [run[name] for run in runs if run.get(name) is not None]
+              for name in RUN_COUNTS}
+    return {name: {'runs': len(values),
+                   'p50': percentile(values, 50),
+                   'p95': percentile(values, 95)}
+            for name, values in counts.items() if values}
+
+def print_run_metrics_summary(metrics_path: Path = RUN_METRICS_PATH,
+                              last: int = 100) -> None:
+    """Print the p50 and p95 duration of each stage over the last runs."""
+    summary = summarize_run_metrics(metrics_path, last)
+    if not summary:
+        print(f'No runs recorded in "{metrics_path}"')
+        return None
+    print(f'{"Stage":<20}{"Runs":>6}{"p50 (s)":>12}{"p95 (s)":>12}')
+    for stage, stats in summary.items():
+        print(f'{stage:<20}{stats["runs"]:>6}'
+              f'{stats["p50"]:>12.3f}{stats["p95"]:>12.3f}')
+    counts = summarize_run_counts(metrics_path, last)
+    if counts:
+        print()
+        print(f'{"Count":<20}{"Runs":>6}{"p50":>12}{"p95":>12}')
+        for name, stats in counts.items():
+            print(f'{name:<20}{stats["runs"]:>6}'
+                  f'{stats["p50"]:>12.0f}{stats["p95"]:>12.0f}')
@@ -0,0 +1,355 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+import functools
+import json
+import logging
+import multiprocessing
+from pathlib import Path
+import re
+import time
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+import uuid
+
+from .log_handling import LOGGER_NAME
+from .manifest import UploadManifest
+from .npi_registry import NpiRegistry
+from .patient_index import SurveyedPatientIndex
+from .pipeline import ReportConfig, get_report_config, process
+from .report import ReportPath
+from .transmit_report import Transmission, send_files_not_yet_delivered
+from .user_interaction import get_dataframe_from_bytes
+from .zip_reference import ZipIndex
+
+logger = logging.getLogger(LOGGER_NAME)
+
+CONFIG_NAME = re.compile(r'[\w-]+')
+HTTP_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request',
+                404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Content Too Large', 503: 'Service Unavailable'}
+
+class HttpError(Exception):
+    """An error response to an HTTP request."""
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+def warm_up_worker() -> None:
+    """Import the .xlsx reader so a worker's first job does not pay for it."""
+    import openpyxl # type: ignore[import-untyped] # noqa: F401
+
+@functools.lru_cache(maxsize=8)
+def load_reference(load: Callable[[Path], Any], path: Path,
+                   modified_ns: int) -> Any:
+    """
+    Load a read-only reference index once per worker, and again only if its
+    file changes.
+    """
+    return load(path)
+
+def get_patient_index_path(report_config: ReportConfig,
+                           project_directory: Path) -> Path | None:
+    """Get the path of the patient index a config uses, if any."""
+    if report_config.patient_dedup is None:
+        return None
+    return project_directory / Path(report_config.patient_dedup.index_path)
+
+def transform_uploaded_report(data: bytes, config: dict,
+                              dry_run: bool = False,
+                              project_directory: Path = Path()) -> dict[str, Any]:
+    """
+    Transform an uploaded report in a worker process.  Each distinct config
+    is parsed once per worker, and the ZIP code reference and NPI registry
+    are loaded once per worker.  With "dry_run", rejected values are counted
+    instead of failing the job and no .csv contents are returned.
+    """
+    report_config = get_report_config(config)
+    df = get_dataframe_from_bytes(data, report_config.get_input_column_names())
+    zip_index = None
+    if report_config.zip_reference is not None:
+        path = project_directory / Path(report_config.zip_reference.path)
+        zip_index = load_reference(ZipIndex.load, path, path.stat().st_mtime_ns)
+    npi_registry = None
+    if report_config.npi_enrichment is not None:
+        path = project_directory / Path(report_config.npi_enrichment.path)
+        npi_registry = load_reference(NpiRegistry.load, path,
+                                      path.stat().st_mtime_ns)
+    patient_index = None
+    patient_index_path = get_patient_index_path(report_config, project_directory)
+    if patient_index_path is not None:
+        # SQLite connections cannot be shared between threads, so the index
+        # is opened for each job
+        patient_index = SurveyedPatientIndex(patient_index_path)
+    try:
+        result = process(df, report_config, collect_rejects=dry_run,
+                         patient_index=patient_index, zip_index=zip_index,
+                         npi_registry=npi_registry)
+    finally:
+        if patient_index is not None:
+            patient_index.close()
+    return {'rows_in': result.rows_in,
+            'rows_out': len(result.df),
+            'rejects': result.rejects,
+            'filtered': result.filtered,
+            'csv': None if dry_run else result.csv,
+            'patient_key_hashes': None if dry_run else result.patient_key_hashes}
+
+class Job:
+    """Status and summary of a submitted report."""
+    def __init__(self, config_name: str, dry_run: bool) -> None:
+        self.id = uuid.uuid4().hex
+        self.config_name = config_name
+        self.dry_run = dry_run
+        self.status = 'queued'
+        self.submitted = time.perf_counter()
+        self.seconds: float | None = None
+        self.summary: dict[str, Any] = {}
+        self.output_file: str | None = None
+        self.transmitted = False
+        self.error: str | None = None
+
+    def is_finished(self) -> bool:
+        """Check if the job is done or failed."""
+        return self.status in ('done', 'failed')
+
+    def to_dict(self) -> dict[str, Any]:
+        """Get the job as a JSON serializable dictionary."""
+        return {'id': self.id, 'config': self.config_name,
+                'dry_run': self.dry_run, 'status': self.status,
+                'seconds': self.seconds, **self.summary,
+                'output_file': self.output_file,
+                'transmitted': self.transmitted, 'error': self.error}
+
+class SubmissionService:
+    """
+    HTTP service that transforms uploaded reports on a pool of warm worker
+    processes, at most one job per worker at a time.
+
+    POST /jobs?config=NAME uploads an .xlsx, .csv or .tsv report to transform
+    with the "NAME.json" config, adding "&dry_run=1" to only count rejected
+    values.  GET /jobs/ID gets the status and summary of a job.  Only the
+    last "max_finished_jobs" finished jobs are kept.
+    """
+    def __init__(self, executor: Executor, workers: int,
+                 config_directory: Path,
+                 project_directory: Path,
+                 transmission: Transmission | None = None,
+                 max_queued: int = 100,
+                 max_upload_bytes: int = 268435456,
+                 max_finished_jobs: int = 1000) -> None:
+        self.executor = executor
+        self.workers = workers
+        self.config_directory = config_directory
+        self.project_directory = project_directory
+        self.report_path = ReportPath(project_directory,
+                                      create_input_directory=False)
+        self.manifest_path = project_directory / Path('manifest.sqlite3')
+        self.transmission = transmission
+        self.max_queued = max_queued
+        self.max_upload_bytes = max_upload_bytes
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: dict[str, Job] = {}
+        self.created_patient_indexes: set[Path] = set()
+        self.tasks: set[asyncio.Task] = set()
+        self.semaphore = asyncio.Semaphore(workers)
+
+    async def warm_up(self) -> None:
+        """Start every worker process before accepting jobs."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, warm_up_worker)
+                               for _ in range(self.workers)))
+
+    async def serve(self, host: str, port: int) -> None:
+        """Accept requests until cancelled."""
+        await self.warm_up()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        address = server.sockets[0].getsockname()
+        logger.info(f'Serving on http://{address[0]}:{address[1]} with '
+                    f'{self.workers} worker(s)')
+        print(f'Serving on http://{address[0]}:{address[1]} with '
+              f'{self.workers} worker(s), press Ctrl+C to stop')
+        async with server:
+            await server.serve_forever()
+
+    def get_pending_count(self) -> int:
+        """Get the number of jobs queued or running."""
+        return sum(job.status in ('queued', 'running')
+                   for job in self.jobs.values())
+
+    def evict_finished_jobs(self) -> None:
+        """Forget the oldest finished jobs past "max_finished_jobs"."""
+        finished = [job_id for job_id, job in self.jobs.items()
+                    if job.is_finished()]
+        for job_id in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self.jobs[job_id]
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Answer one HTTP request, then close the connection."""
+        try:
+            status, body = await self.handle_request(reader)
+        except HttpError as e:
+            status, body = e.status, {'error': str(e)}
+        except Exception as e:
+            logger.exception('Unable to handle request')
+            status, body = 400, {'error': f'{type(e).__name__}: {e}'}
+        payload = json.dumps(body).encode()
+        writer.write(f'HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n'
+                     'Content-Type: application/json\r\n'
+                     f'Content-Length: {len(payload)}\r\n'
+                     'Connection: close\r\n\r\n'.encode() + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def handle_request(self, reader: asyncio.StreamReader) -> tuple[int, Any]:
+        """Read an HTTP request and route it."""
+        request_line = (await reader.readline()).decode('latin-1')
+        try:
+            method, target, _ = request_line.split(' ', 2)
+        except ValueError:
+            raise HttpError(400, 'Malformed request line')
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        if length > self.max_upload_bytes:
+            raise HttpError(413, f'Reports are limited to '
+                                 f'{self.max_upload_bytes} bytes')
+        body = await reader.readexactly(length)
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+        match method, parts:
+            case 'POST', ['jobs']:
+                return 202, self.submit(query, body).to_dict()
+            case 'GET', ['jobs', job_id]:
+                if job_id not in self.jobs:
+                    raise HttpError(404, f'No job "{job_id}"')
+                return 200, self.jobs[job_id].to_dict()
+            case 'GET', ['health']:
+                return 200, {'workers': self.workers,
+                             'pending': self.get_pending_count()}
+            case _, ['jobs'] | ['jobs', _] | ['health']:
+                raise HttpError(405, f'{method} is not allowed on {url.path}')
+        raise HttpError(404, f'No resource at {url.path}')
+
+    def submit(self, query: dict[str, list[str]], data: bytes) -> Job:
+        """Queue an uploaded report to transform with a named config."""
+        config_name = query.get('config', [''])[0]
+        if not CONFIG_NAME.fullmatch(config_name):
+            raise HttpError(400, 'The "config" query parameter must be a '
+                                 'config file name without ".json"')
+        config_path = self.config_directory / Path(f'{config_name}.json')
+        if not config_path.is_file():
+            raise HttpError(404, f'No config "{config_name}"')
+        if not data:
+            raise HttpError(400, 'The request body must be the report file')
+        if self.get_pending_count() >= self.max_queued:
+            raise HttpError(503, f'{self.max_queued} jobs are already pending, '
+                                 'try again later')
+        try:
+            config = json.loads(config_path.read_text())
+            report_config = get_report_config(config)
+        except (KeyError, TypeError, ValueError) as e:
+            raise HttpError(400, f'Invalid config "{config_name}": {e}')
+        patient_index_path = get_patient_index_path(report_config,
+                                                    self.project_directory)
+        if (patient_index_path is not None
+                and patient_index_path not in self.created_patient_indexes):
+            # Created here, so workers opening it at the same time do not
+            # each create its salt
+            SurveyedPatientIndex(patient_index_path).close()
+            self.created_patient_indexes.add(patient_index_path)
+        dry_run = query.get('dry_run', ['0'])[0].lower() in ('1', 'true', 'yes')
+        self.evict_finished_jobs()
+        job = Job(config_name, dry_run)
+        self.jobs[job.id] = job
+        task = asyncio.create_task(self.run_job(job, data, config,
+                                                report_config.client_id,
+                                                patient_index_path))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        logger.info(f'Queued job {job.id} with config "{config_name}", '
+                    f'{len(data)} bytes')
+        return job
+
+    async def run_job(self, job: Job, data: bytes, config: dict,
+                      client_id: str,
+                      patient_index_path: Path | None = None) -> None:
+        """
+        Transform a report once a worker is free, save the output .csv file
+        and transmit it to Press Ganey if the service transmits, then record
+        the transmitted patients in the patient index.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            async with self.semaphore:
+                job.status = 'running'
+                summary = await loop.run_in_executor(
+                    self.executor, transform_uploaded_report, data, config,
+                    job.dry_run, self.project_directory)
+            csv = summary.pop('csv')
+            patient_key_hashes = summary.pop('patient_key_hashes')
+            job.summary = summary
+            if csv is not None:
+                output_csv = self.report_path.get_output_path(client_id, '.csv')
+                output_csv = output_csv.with_stem(f'{output_csv.stem}_{job.id}')
+                await asyncio.to_thread(output_csv.write_bytes, csv)
+                job.output_file = str(output_csv)
+                if self.transmission is not None:
+                    job.status = 'transmitting'
+                    await asyncio.to_thread(self.transmit, output_csv, client_id)
+                    job.transmitted = True
+                    if patient_index_path is not None:
+                        await asyncio.to_thread(record_surveyed_patients,
+                                                patient_index_path,
+                                                patient_key_hashes)
+            job.status = 'done'
+        except Exception as e:
+            logger.exception(f'Job {job.id} failed')
+            job.status = 'failed'
+            job.error = f'{type(e).__name__}: {e}'
+        job.seconds = time.perf_counter() - job.submitted
+        logger.info(f'Job {job.id} {job.status} in {job.seconds:.3f}s')
+
+    def transmit(self, output_csv: Path, client_id: str) -> None:
+        """Transmit an output .csv file unless it was already delivered."""
+        assert self.transmission is not None
+        manifest = UploadManifest(self.manifest_path)
+        try:
+            send_files_not_yet_delivered(self.transmission, [output_csv],
+                                         manifest, client_id)
+        finally:
+            manifest.close()
+
+def record_surveyed_patients(patient_index_path: Path,
+                             patient_key_hashes: list[str]) -> None:
+    """Record the patients of a transmitted report in the patient index."""
+    logger.info(f'Record {len(patient_key_hashes)} surveyed patient(s) in '
+                f'the patient index')
+    patient_index = SurveyedPatientIndex(patient_index_path)
+    try:
+        patient_index.record(patient_key_hashes)
+    finally:
+        patient_index.close()
+
+def run_service(host: str, port: int, workers: int, config_directory: Path,
+                transmission: Transmission | None = None,
+                max_queued: int = 100) -> None:
+    """Run the submission service until interrupted."""
+    # Workers are spawned as on Windows, since forking would copy the
+    # logging queue listener's thread state into each worker
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        async def serve() -> None:
+            service = SubmissionService(executor, workers, config_directory,
+                                        Path().resolve(), transmission,
+                                        max_queued)
+            await service.serve(host, port)
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            logger.info('Submission service stopped')
@@ -1,9 +1,20 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+import io
+import logging
 import pysftp
 from pathlib import Path
+import threading
+import time
+from typing import Any, Callable
+from .log_handling import LOGGER_NAME
+from .manifest import UploadManifest, hash_file
+from .report import Report
 from .user_settings import get_connection_options
 from .transmit_option import TransmitOption
 
+logger = logging.getLogger(LOGGER_NAME)
+
 def get_transmit_option_from_cli_args(no_transmit: bool,
                                       sftp_transmit: bool) -> TransmitOption:
     """Return the appropriate transmit option based off of CLI arguments."""
@@ -13,6 +24,21 @@ def get_transmit_option_from_cli_args(no_transmit: bool,
         return TransmitOption.SFTP
     return TransmitOption.USER_INPUT
 
+class TeeWriter(io.RawIOBase):
+    """Binary stream that writes the same bytes to several other streams."""
+    def __init__(self, *streams: Any) -> None:
+        super().__init__()
+        self.streams = streams
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        """Write the bytes to every stream."""
+        for stream in self.streams:
+            stream.write(b)
+        return len(b)
+
 class Transmission(ABC):
     """Abstract base class to handle transmission of .csv files to Press Ganey."""
     @abstractmethod
@@ -23,28 +49,248 @@ class Transmission(ABC):
     def send(self, file: Path) -> None: # pragma: no cover
         pass
 
+    def connect_in_background(self) -> None:
+        """
+        Start connecting to Press Ganey in the background, for the next
+        transmission to use.  Concrete classes with a costly connection
+        override this.
+        """
+        return None
+
+    def close(self) -> None:
+        """Close any connection opened in the background and not used."""
+        return None
+
+    def send_report(self, report: Report, file: Path) -> None:
+        """
+        Save the report's .csv file then transmit it.
+        Concrete classes can override this to upload while the file is written.
+        """
+        report.save_output_csv(file)
+        self.send(file)
+
+    def send_batch(self, files: list[Path]) -> dict[Path, BaseException]:
+        """
+        Transmit files one after another and return the error of each file
+        that was not transmitted.  Concrete classes with a costly connection
+        override this to send every file over one connection.
+        """
+        errors: dict[Path, BaseException] = {}
+        for file in files:
+            try:
+                self.send(file)
+            except Exception as e:
+                errors[file] = e
+        return errors
+
+    def send_many(self, files: list[Path], max_workers: int = 4,
+                  attempts: int = 3, retry_delay: float = 1.0,
+                  on_sent: Callable[[Path], None] | None = None) -> None:
+        """
+        Transmit several files concurrently, split between at most
+        "max_workers" batches that each reuse one connection.  Only the files
+        that failed are retried, after "retry_delay" seconds doubled on each
+        attempt.  "on_sent" is called from the calling thread for each file
+        transmitted.
+        """
+        remaining = list(files)
+        errors: dict[Path, BaseException] = {}
+        for attempt in range(attempts):
+            if not remaining:
+                return None
+            if attempt > 0:
+                delay = retry_delay * 2 ** (attempt - 1)
+                logger.warning(f'Retrying {len(remaining)} file(s) in '
+                               f'{delay:.1f}s: {errors[remaining[0]]}')
+                time.sleep(delay)
+            batches = [remaining[n::max_workers]
+                       for n in range(min(max_workers, len(remaining)))]
+            with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+                batch_errors = list(executor.map(self.send_batch, batches))
+            errors = {}
+            for batch, batch_error in zip(batches, batch_errors):
+                errors.update(batch_error)
+                if on_sent is not None:
+                    for file in batch:
+                        if file not in batch_error:
+                            on_sent(file)
+            remaining = [file for file in remaining if file in errors]
+        if not remaining:
+            return None
+        failed = ', '.join(f'"{file}"' for file in remaining)
+        raise ConnectionError(f'Unable to transmit {failed} after {attempts} '
+                              'attempts.') from errors[remaining[0]]
+
+def is_connection_alive(connection: pysftp.Connection) -> bool:
+    """
+    Check that an SFTP connection still answers, since the server can drop
+    an idle one while a large report is transformed.
+    """
+    try:
+        connection.pwd
+    except Exception:
+        return False
+    return True
+
 class SftpTransmission(Transmission):
     """Concrete class to transmit .csv files to Press Ganey via SFTP."""
     def __init__(self, address: str, username: str, password: str) -> None:
         self.address = address
         self.username = username
         self.password = password
+        self.sub_directory = '/Inbox'
+        self.background_connection: Future | None = None
+        self.lock = threading.Lock()
 
-    def send(self, file: Path) -> None: # pragma: no cover
-        """Upload the .csv file to Press Ganey."""
+    def connect_in_background(self) -> None:
+        """
+        Open and authenticate an SFTP connection on a background thread while
+        the report is read and transformed.  The next upload uses it.
+        """
+        future: Future = Future()
+        def connect() -> None:
+            start = time.perf_counter()
+            try:
+                connection = self.connect()
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result((connection, time.perf_counter() - start))
+        with self.lock:
+            self.background_connection = future
+        # A daemon thread, so an aborted run does not wait for the handshake
+        threading.Thread(target=connect, daemon=True).start()
+
+    def take_connection(self) -> pysftp.Connection:
+        """
+        Get the connection opened in the background if there is one and it is
+        still alive, otherwise open a new one.  The background connection is
+        only used once.
+        """
+        with self.lock:
+            future, self.background_connection = self.background_connection, None
+        if future is not None:
+            start = time.perf_counter()
+            try:
+                connection, connect_seconds = future.result()
+            except Exception as e:
+                logger.warning(f'Unable to connect to "{self.address}" in the '
+                               f'background, connecting again: {e}')
+            else:
+                waited = time.perf_counter() - start
+                if is_connection_alive(connection):
+                    logger.info(f'Used the SFTP connection opened in the '
+                                f'background in {connect_seconds:.3f}s, saving '
+                                f'{max(connect_seconds - waited, 0):.3f}s')
+                    return connection
+                logger.warning(f'The SFTP connection to "{self.address}" opened '
+                               'in the background was dropped, connecting again')
+                connection.close()
+        return self.connect()
+
+    def close(self) -> None:
+        """Close the connection opened in the background if it was not used."""
+        with self.lock:
+            future, self.background_connection = self.background_connection, None
+        if future is None:
+            return None
+        def close_connection(future: Future) -> None:
+            if future.exception() is None:
+                connection, _ = future.result()
+                connection.close()
+                logger.info(f'Closed the unused SFTP connection to "{self.address}"')
+        future.add_done_callback(close_connection)
+
+    def connect(self) -> pysftp.Connection: # pragma: no cover
+        """Open an authenticated SFTP connection to Press Ganey."""
         cnopts = pysftp.CnOpts()
         self.pub_key = f'{self.address}.pub'
         if Path(self.pub_key).exists():
             cnopts.hostkeys.load(self.pub_key) # type: ignore
-        with pysftp.Connection(self.address,
-                            username=self.username,
-                            password=self.password,
-                            cnopts=cnopts) as sftp:
-            sub_directory = '/Inbox'
-            with sftp.cd(sub_directory):
+        return pysftp.Connection(self.address,
+                                 username=self.username,
+                                 password=self.password,
+                                 cnopts=cnopts)
+
+    def send(self, file: Path) -> None: # pragma: no cover
+        """Upload the .csv file to Press Ganey."""
+        with self.take_connection() as sftp:
+            with sftp.cd(self.sub_directory):
                 sftp.put(str(file))
                 print(f'Uploaded "{str(file)}" to Press Ganey')
 
+    def send_batch(self, files: list[Path]) -> dict[Path, BaseException]:
+        """
+        Upload the .csv files to Press Ganey over one connection.  The first
+        error ends the batch and is returned for every file not yet uploaded.
+        """
+        uploaded = 0
+        try:
+            with self.take_connection() as sftp:
+                with sftp.cd(self.sub_directory):
+                    for file in files:
+                        sftp.put(str(file))
+                        uploaded += 1
+                        print(f'Uploaded "{str(file)}" to Press Ganey')
+        except Exception as e:
+            return {file: e for file in files[uploaded:]}
+        return {}
+
+    def send_report(self, report: Report, file: Path) -> None:
+        """
+        Serialize the report's .csv file once, writing the encoded bytes to
+        the local file and a temporary remote file at the same time.  The
+        remote file is only given its name once it is complete, so a failed
+        write never leaves a truncated file in the inbox.
+        """
+        part_name = f'{file.name}.part'
+        with self.take_connection() as sftp:
+            with sftp.cd(self.sub_directory):
+                try:
+                    with (file.open('wb') as local_file,
+                          sftp.open(part_name, 'wb') as remote_file):
+                        remote_file.set_pipelined(True)
+                        with io.BufferedWriter(TeeWriter(local_file,
+                                                         remote_file)) as buffer:
+                            report.write_output_csv(buffer)
+                    if sftp.exists(file.name):
+                        sftp.remove(file.name)
+                    sftp.rename(part_name, file.name)
+                except BaseException:
+                    try:
+                        sftp.remove(part_name)
+                    except Exception as e:
+                        logger.warning(f'Unable to remove "{part_name}" from '
+                                       f'Press Ganey: {e}')
+                    raise
+                print(f'Uploaded "{str(file)}" to Press Ganey')
+
+def send_files_not_yet_delivered(transmission: Transmission,
+                                 files: list[Path],
+                                 manifest: UploadManifest,
+                                 client_id: str,
+                                 max_workers: int = 4) -> list[Path]:
+    """
+    Transmit the files whose content hash is not already recorded as delivered
+    in the upload manifest, then record the upload status of each file.
+    Return the files that were skipped.
+    """
+    hashes = {file: hash_file(file) for file in files}
+    skipped = [file for file in files if manifest.is_delivered(hashes[file])]
+    to_send = [file for file in files if file not in skipped]
+    for file in to_send:
+        manifest.record(file, client_id, UploadManifest.PENDING, hashes[file])
+    def record_delivered(file: Path) -> None:
+        manifest.record(file, client_id, UploadManifest.DELIVERED, hashes[file])
+    try:
+        transmission.send_many(to_send, max_workers=max_workers,
+                               on_sent=record_delivered)
+    except ConnectionError:
+        for file in to_send:
+            manifest.record(file, client_id, UploadManifest.FAILED, hashes[file])
+        raise
+    return skipped
+
 def create_transmission_from_factory(transmit_option: TransmitOption) -> Transmission:
     """Factory to create concrete transmission classes."""
     match transmit_option:
@@ -52,4 +298,4 @@ def create_transmission_from_factory(transmit_option: TransmitOption) -> Transmi
             connection_options = get_connection_options(TransmitOption.SFTP)
             return SftpTransmission(**connection_options)
         case _:
-            raise ValueError
\ No newline at end of file
+            raise ValueError
@@ -1,10 +1,29 @@
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+import csv
+import datetime
 import functools
+import glob
+import io
+from itertools import repeat
+import logging
+import multiprocessing
+import os
 from pathlib import Path
-from typing import Any
+import threading
+import time
+from typing import Any, Callable, Collection, Iterator, Sequence
+import zipfile
 
+import numpy as np
 import pandas as pd
 
+from .log_handling import LOGGER_NAME
 from .transmit_option import TransmitOption
+from .xlsx_reader import get_xlsx_sheet_names, read_xlsx
+
+logger = logging.getLogger(LOGGER_NAME)
+
+SHEET_NAME_COLUMN = 'Sheet Name'
 
 class UserInputException(Exception):
     def __init__(self, response):
@@ -24,7 +43,7 @@ def loop_user_input(func, loop_count: int = 10) -> Any:
 
 def get_input_file(input_directory: Path) -> Path:
     """
-    User input the file name of the input .xlsx spreadsheet.  
+    User input the file name of the input .xlsx, .csv or .tsv report.
     Validate that the input file exists.
     """
     report_file_name = input('Please save the EMR report to the '
@@ -35,26 +54,407 @@ def get_input_file(input_directory: Path) -> Path:
         return input_file
     raise UserInputException('Unable to locate the input file. Please try again.')
 
-def get_dataframe(input_file: Path) -> pd.DataFrame:
-    """Get a Pandas dataframe from an .xlsx file path."""
+def get_delimiter(input_file: Path) -> str | None:
+    """
+    Get the delimiter of a delimited text report, or None if the report is an
+    .xlsx workbook.  Detected from the file extension, otherwise the contents.
+    """
+    match input_file.suffix.lower():
+        case '.xlsx':
+            return None
+        case '.csv':
+            return ','
+        case '.tsv':
+            return '\t'
+    with input_file.open('rb') as f:
+        return get_delimiter_from_sample(f.read(65536))
+
+def get_delimiter_from_sample(sample: bytes) -> str | None:
+    """
+    Get the delimiter of a delimited text report from its first bytes, or
+    None if the report is an .xlsx workbook.
+    """
+    if sample.startswith(b'PK\x03\x04'): # .xlsx files are zip archives
+        return None
+    try:
+        text = sample.decode('utf-8-sig', errors='replace')
+        return csv.Sniffer().sniff(text, delimiters=',\t;|').delimiter
+    except csv.Error:
+        return ','
+
+def get_dataframe_chunks(input_file: Path, delimiter: str,
+                         usecols: Collection[str] | None = None,
+                         chunksize: int = 100000,
+                         nrows: int | None = None) -> Iterator[pd.DataFrame]:
+    """Read a delimited text report in chunks of rows."""
+    with pd.read_csv(input_file, sep=delimiter, engine='c', dtype=str,
+                     encoding='utf-8-sig', usecols=get_usecols(usecols),
+                     chunksize=chunksize, nrows=nrows) as reader:
+        yield from reader
+
+def get_usecols(usecols: Collection[str] | None) -> Callable[[str], bool] | None:
+    """Get a column filter that ignores columns missing from the report."""
+    if usecols is None:
+        return None
+    wanted = set(usecols)
+    return lambda column: column in wanted
+
+def read_worksheet(input_file: Path, sheet_name: str,
+                   usecols: Collection[str] | None = None,
+                   nrows: int | None = None,
+                   cancelled: threading.Event | None = None) -> pd.DataFrame:
+    """Read one worksheet of a workbook, in a worker process."""
+    return read_xlsx(input_file, usecols=get_usecols(usecols), nrows=nrows,
+                     sheet_name=sheet_name, cancelled=cancelled)
+
+def get_dataframe_from_sheets(input_file: Path, sheets: Sequence[str] = (),
+                              usecols: Collection[str] | None = None,
+                              nrows: int | None = None,
+                              max_workers: int | None = None,
+                              cancelled: threading.Event | None = None) -> pd.DataFrame:
+    """
+    Read every worksheet of a workbook, or only the "sheets" named, into one
+    dataframe with the name of each row's worksheet in a "Sheet Name"
+    column.  The worksheets are read at the same time by up to
+    "max_workers" worker processes, one per worksheet and CPU by default.
+    Every worksheet must have the same columns as the first, in any order.
+    Once "cancelled" is set, InterruptedError is raised without waiting for
+    worksheets not yet started.
+    """
+    sheet_names = get_xlsx_sheet_names(input_file)
+    missing = [sheet for sheet in sheets if sheet not in sheet_names]
+    if missing:
+        missing_names = ', '.join(f'"{sheet}"' for sheet in missing)
+        found_names = ', '.join(f'"{sheet}"' for sheet in sheet_names)
+        raise UserInputException(f'"{input_file.name}" has no worksheet named '
+                                 f'{missing_names}.  Its worksheets are '
+                                 f'{found_names}.')
+    if sheets:
+        sheet_names = list(dict.fromkeys(sheets))
+    if max_workers is None:
+        max_workers = min(len(sheet_names), os.cpu_count() or 1)
+    start = time.perf_counter()
+    if max_workers > 1 and len(sheet_names) > 1:
+        # Workers are spawned as on Windows, since forking would copy the
+        # logging queue listener's thread state into each worker
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(read_worksheet, input_file, sheet_name,
+                                       usecols, nrows)
+                       for sheet_name in sheet_names]
+            pending = set(futures)
+            while pending:
+                if cancelled is not None and cancelled.is_set():
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise InterruptedError('Reading the worksheets was cancelled')
+                _, pending = wait(pending, timeout=0.1, return_when=FIRST_EXCEPTION)
+            dfs = [future.result() for future in futures]
+    else:
+        dfs = [read_worksheet(input_file, sheet_name, usecols, nrows, cancelled)
+               for sheet_name in sheet_names]
+    columns = list(dfs[0].columns)
+    for df, sheet_name in zip(dfs, sheet_names):
+        if SHEET_NAME_COLUMN in df.columns:
+            raise UserInputException(f'The worksheet "{sheet_name}" already has '
+                                     f'a "{SHEET_NAME_COLUMN}" column.')
+        if set(df.columns) != set(columns):
+            raise UserInputException(f'The columns of the worksheet '
+                                     f'"{sheet_name}" do not match the '
+                                     f'worksheet "{sheet_names[0]}".')
+    df = pd.concat([df[columns] for df in dfs], ignore_index=True)
+    df[SHEET_NAME_COLUMN] = np.repeat(np.array(sheet_names, dtype=object),
+                                      [len(part) for part in dfs])
+    if nrows is not None:
+        df = df.head(nrows)
+    logger.info(f'Read {len(df)} row(s) from {len(sheet_names)} worksheet(s) '
+                f'of "{input_file.name}" with {min(max_workers, len(sheet_names))} '
+                f'worker(s) in {time.perf_counter() - start:.3f}s')
+    return df
+
+def get_dataframe(input_file: Path, usecols: Collection[str] | None = None,
+                  nrows: int | None = None,
+                  sheets: Sequence[str] | None = None,
+                  cancelled: threading.Event | None = None) -> pd.DataFrame:
+    """
+    Get a Pandas dataframe from an .xlsx, .csv or .tsv file path.
+    Only the "usecols" columns and the first "nrows" rows are read when given.
+    Every value is read as a string.  Only the first worksheet of a workbook
+    is read unless "sheets" is given, an empty sequence reading every
+    worksheet.  Reading a workbook stops soon after "cancelled" is set.
+    """
     try:
-        return pd.read_excel(input_file)
-    except (PermissionError, AssertionError):
+        delimiter = get_delimiter(input_file)
+        if delimiter is None:
+            if sheets is not None:
+                return get_dataframe_from_sheets(input_file, sheets, usecols, nrows,
+                                                 cancelled=cancelled)
+            return read_xlsx(input_file, usecols=get_usecols(usecols), nrows=nrows,
+                             cancelled=cancelled)
+        return pd.read_csv(input_file, sep=delimiter, engine='c', dtype=str,
+                           encoding='utf-8-sig', usecols=get_usecols(usecols),
+                           nrows=nrows)
+    except (OSError, AssertionError, UnicodeDecodeError, ValueError,
+            pd.errors.ParserError, zipfile.BadZipFile):
         pass
     raise UserInputException('Unable to open the EMR report file.  '
-                             'Ensure it is a valid .xlsx file.'
+                             'Ensure it is a valid .xlsx, .csv or .tsv file.'
                              'If it is currently open in another program, '
                              'such as Excel, please close it.')
 
+def get_input_files(input_directory: Path, patterns: Sequence[Path]) -> list[Path]:
+    """
+    Get the input files of paths or glob patterns relative to the input
+    directory, in the order given and each file once.  Files matching a glob
+    pattern are sorted by name.
+    """
+    input_files: list[Path] = []
+    for pattern in patterns:
+        path = input_directory / pattern
+        if any(c in str(pattern) for c in '*?['):
+            matches = sorted(Path(match) for match in glob.glob(str(path)))
+            if not matches:
+                raise FileNotFoundError(f'No input files match "{pattern}"')
+        else:
+            matches = [path]
+        input_files.extend(match for match in matches if match not in input_files)
+    return input_files
+
+def get_dataframes(input_files: Sequence[Path],
+                   usecols: Collection[str] | None = None,
+                   nrows: int | None = None,
+                   max_workers: int | None = None,
+                   sheets: Sequence[str] | None = None) -> list[pd.DataFrame]:
+    """
+    Read several reports, in the order given.  The reports are read at the
+    same time by up to "max_workers" worker processes, one per report and
+    CPU by default, since parsing a workbook holds the GIL.  When "sheets"
+    is given the reports are read one after another, each with its
+    worksheets read in parallel.
+    """
+    if max_workers is None:
+        max_workers = min(len(input_files), os.cpu_count() or 1)
+    if max_workers <= 1 or len(input_files) == 1 or sheets is not None:
+        return [get_dataframe(input_file, usecols, nrows=nrows, sheets=sheets)
+                for input_file in input_files]
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        return list(executor.map(get_dataframe, input_files, repeat(usecols),
+                                 repeat(nrows)))
+
+def merge_dataframes(dfs: Sequence[pd.DataFrame], input_files: Sequence[Path],
+                     drop_duplicate_rows: bool = False) -> pd.DataFrame:
+    """
+    Merge the reports of several input files into one.  Every report must
+    have the same columns as the first, in any order.  With
+    "drop_duplicate_rows", rows identical to a row of an earlier report are
+    dropped, while repeated rows within a report are kept.
+    """
+    columns = list(dfs[0].columns)
+    for df, input_file in zip(dfs[1:], input_files[1:]):
+        if set(df.columns) != set(columns):
+            missing = ', '.join(f'"{c}"' for c in columns if c not in df.columns)
+            extra = ', '.join(f'"{c}"' for c in df.columns if c not in columns)
+            raise ValueError(f'The columns of "{input_file.name}" do not match '
+                             f'"{input_files[0].name}".  Missing: '
+                             f'{missing or "none"}.  Extra: {extra or "none"}.')
+    if len(dfs) == 1:
+        return dfs[0]
+    df = pd.concat([df[columns] for df in dfs], ignore_index=True)
+    if drop_duplicate_rows:
+        report_numbers: pd.Series = pd.Series(np.repeat(np.arange(len(dfs)),
+                                                        [len(part) for part in dfs]))
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        first_report = report_numbers.groupby(row_hashes).transform('min')
+        df = df[(first_report == report_numbers).to_numpy()]
+        df = df.reset_index(drop=True)
+    return df
+
+def get_dataframe_from_bytes(data: bytes,
+                             usecols: Collection[str] | None = None) -> pd.DataFrame:
+    """
+    Get a Pandas dataframe from the contents of an .xlsx, .csv or .tsv file,
+    such as an uploaded report.
+    """
+    try:
+        delimiter = get_delimiter_from_sample(data[:65536])
+        if delimiter is None:
+            return read_xlsx(io.BytesIO(data), usecols=get_usecols(usecols))
+        return pd.read_csv(io.BytesIO(data), sep=delimiter, engine='c',
+                           dtype=str, encoding='utf-8-sig',
+                           usecols=get_usecols(usecols))
+    except (AssertionError, ValueError, zipfile.BadZipFile):
+        pass
+    raise UserInputException('Unable to read the EMR report.  Ensure it is a '
+                             'valid .xlsx, .csv or .tsv file.')
+
+def get_recent_input_files(input_directory: Path) -> list[Path]:
+    """
+    Get the files in the input directory, most recently modified first.
+    Hidden files and Excel's lock files of open workbooks are left out.
+    """
+    input_files = [path for path in input_directory.iterdir()
+                   if path.is_file() and not path.name.startswith(('.', '~$'))]
+    return sorted(input_files, key=lambda path: path.stat().st_mtime,
+                  reverse=True)
+
+def get_file_signature(input_file: Path) -> tuple[int, int] | None:
+    """Get the modification time and size of a file, None if it is missing."""
+    try:
+        stat = input_file.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class ReportPrefetch:
+    """
+    Read a report in a background thread while the operator is choosing the
+    input file, in case they choose it.  Delimited text is read in chunks
+    and workbooks row by row, so the read stops soon after it is cancelled.
+    """
+    def __init__(self, input_file: Path,
+                 usecols: Collection[str] | None = None,
+                 nrows: int | None = None,
+                 sheets: Sequence[str] | None = None) -> None:
+        self.input_file = input_file
+        self.usecols = usecols
+        self.nrows = nrows
+        self.sheets = sheets
+        # The file as it was when the read started, to detect a report
+        # saved over it while the operator was prompted
+        self.signature = get_file_signature(input_file)
+        self.df: pd.DataFrame | None = None
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+        self.cancelled = threading.Event()
+        # A daemon thread, so a read still running does not delay exiting
+        self.thread = threading.Thread(target=self.read, daemon=True)
+        self.thread.start()
+
+    def read(self) -> None:
+        """Read the report, leaving "df" as None if it fails or is cancelled."""
+        try:
+            delimiter = get_delimiter(self.input_file)
+            if delimiter is None:
+                df = get_dataframe(self.input_file, self.usecols, nrows=self.nrows,
+                                   sheets=self.sheets, cancelled=self.cancelled)
+                if not self.cancelled.is_set():
+                    self.df = df
+                return None
+            chunks = []
+            for chunk in get_dataframe_chunks(self.input_file, delimiter,
+                                              self.usecols, nrows=self.nrows):
+                if self.cancelled.is_set():
+                    return None
+                chunks.append(chunk)
+            if not self.cancelled.is_set():
+                self.df = pd.concat(chunks, ignore_index=True)
+        except Exception:
+            pass
+        finally:
+            self.finished = time.perf_counter()
+
+    def is_for(self, input_file: Path) -> bool:
+        """Check if the prefetch is reading an input file."""
+        try:
+            return input_file.samefile(self.input_file)
+        except OSError:
+            return False
+
+    def is_modified(self) -> bool:
+        """Check if the input file changed since the read started."""
+        return get_file_signature(self.input_file) != self.signature
+
+    def cancel(self) -> None:
+        """Stop reading the report and discard it."""
+        self.cancelled.set()
+        self.df = None
+
+    def result(self) -> pd.DataFrame:
+        """
+        Wait for the report to be read.  If the read failed it is read again
+        in the calling thread, raising the error.
+        """
+        chosen = time.perf_counter()
+        self.thread.join()
+        finished = self.finished if self.finished is not None else chosen
+        logger.info(f'Used the report "{self.input_file.name}" read in the '
+                    f'background, saving {min(chosen, finished) - self.started:.3f}s')
+        if self.df is None:
+            return get_dataframe(self.input_file, self.usecols, nrows=self.nrows,
+                                 sheets=self.sheets)
+        return self.df
+
+def print_recent_input_files(input_files: list[Path], count: int = 10) -> None:
+    """Print the most recent input files the operator can choose from."""
+    if not input_files:
+        return None
+    print('Most recent files in the input folder:')
+    for input_file in input_files[:count]:
+        modified = datetime.datetime.fromtimestamp(input_file.stat().st_mtime)
+        print(f'  {modified:%Y-%m-%d %H:%M}  {input_file.name}')
+
 @loop_user_input
-def get_dataframe_from_user_input(input_directory: Path) -> pd.DataFrame:
+def get_input_file_and_dataframe(input_directory: Path,
+                                 usecols: Collection[str] | None = None,
+                                 nrows: int | None = None,
+                                 prefetch: ReportPrefetch | None = None,
+                                 sheets: Sequence[str] | None = None) -> tuple[Path, pd.DataFrame]:
     """
-    User input to provide the report file name then generate a Pandas dataframe.
+    User input to provide the report file name then generate a Pandas
+    dataframe, using the prefetched report if it is the one chosen.
+    Return the chosen file path and the dataframe.
     If the user input is invalid loop until it is valid or an exception is raised
     when the loop ends.
     """
     input_file = get_input_file(input_directory)
-    return get_dataframe(input_file)
+    if prefetch is not None:
+        if prefetch.is_for(input_file) and not prefetch.is_modified():
+            return input_file, prefetch.result()
+        if prefetch.is_for(input_file):
+            logger.info(f'Cancel reading "{prefetch.input_file.name}" in the '
+                        'background, it changed since the read started')
+        else:
+            logger.info(f'Cancel reading "{prefetch.input_file.name}" in the '
+                        'background, another report was chosen')
+        prefetch.cancel()
+    return input_file, get_dataframe(input_file, usecols, nrows=nrows,
+                                     sheets=sheets)
+
+def get_input_file_and_dataframe_from_user_input(input_directory: Path,
+                                                 usecols: Collection[str] | None = None,
+                                                 nrows: int | None = None,
+                                                 sheets: Sequence[str] | None = None) -> tuple[Path, pd.DataFrame]:
+    """
+    User input to provide the report file name then generate a Pandas dataframe.
+    The most recent file in the input directory starts being read while the
+    operator is prompted.  Return the chosen file path and the dataframe.
+    If the user input is invalid loop until it is valid or an exception is raised
+    when the loop ends.
+    """
+    input_files = get_recent_input_files(input_directory)
+    print_recent_input_files(input_files)
+    prefetch = None
+    if input_files:
+        prefetch = ReportPrefetch(input_files[0], usecols, nrows, sheets)
+    try:
+        return get_input_file_and_dataframe(input_directory, usecols, nrows,
+                                            prefetch, sheets)
+    finally:
+        if prefetch is not None:
+            prefetch.cancelled.set()
+
+def get_dataframe_from_user_input(input_directory: Path,
+                                  usecols: Collection[str] | None = None,
+                                  nrows: int | None = None,
+                                  sheets: Sequence[str] | None = None) -> pd.DataFrame:
+    """
+    User input to provide the report file name then generate a Pandas dataframe.
+    If the user input is invalid loop until it is valid or an exception is raised
+    when the loop ends.
+    """
+    _, df = get_input_file_and_dataframe_from_user_input(input_directory,
+                                                         usecols, nrows, sheets)
+    return df
 
 @loop_user_input
 def input_to_transmit_to_press_ganey() -> TransmitOption:
@@ -2,7 +2,10 @@ import subprocess
 import os
 import re
 from .user_interaction import input_environment_variable
-from .report import Column
+from .report import Column, RowDedup, RowFilter
+from .patient_index import PatientDedup
+from .zip_reference import ZipReference
+from .npi_registry import NpiEnrichment
 from .validation_sanitization import get_validator_func_from_name
 from .transmit_option import TransmitOption
 
@@ -86,3 +89,41 @@ def read_config(config_serialized: dict) -> tuple[str, list[Column], list[str]]:
         columns.append(Column(**col))
     return client_id, columns, actions
 
+def read_patient_dedup_config(config_serialized: dict) -> PatientDedup | None:
+    """Parse the optional "patient_dedup" section of the config .JSON file."""
+    patient_dedup = config_serialized.get('patient_dedup')
+    if patient_dedup is None:
+        return None
+    return PatientDedup(**patient_dedup)
+
+def read_row_dedup_config(config_serialized: dict) -> RowDedup | None:
+    """Parse the optional "deduplicate" section of the config .JSON file."""
+    row_dedup = config_serialized.get('deduplicate')
+    if row_dedup is None:
+        return None
+    return RowDedup(**row_dedup)
+
+def read_filters_config(config_serialized: dict) -> list[RowFilter]:
+    """Parse the optional "filters" section of the config .JSON file."""
+    filters = [RowFilter(**row_filter)
+               for row_filter in config_serialized.get('filters', [])]
+    filter_types = ('date_range', 'age', 'equals', 'in', 'not_empty')
+    for row_filter in filters:
+        if row_filter.type not in filter_types:
+            raise ValueError(f'Unknown filter type "{row_filter.type}", '
+                             f'expected one of: {", ".join(filter_types)}')
+    return filters
+
+def read_zip_reference_config(config_serialized: dict) -> ZipReference | None:
+    """Parse the optional "zip_reference" section of the config .JSON file."""
+    zip_reference = config_serialized.get('zip_reference')
+    if zip_reference is None:
+        return None
+    return ZipReference(**zip_reference)
+
+def read_npi_registry_config(config_serialized: dict) -> NpiEnrichment | None:
+    """Parse the optional "npi_registry" section of the config .JSON file."""
+    npi_registry = config_serialized.get('npi_registry')
+    if npi_registry is None:
+        return None
+    return NpiEnrichment(**npi_registry)
@@ -1,8 +1,26 @@
 import re
 import datetime
-from email_validator import EmailUndeliverableError, validate_email
+from email_validator import EmailSyntaxError, EmailUndeliverableError, validate_email
+import numpy as np
+import pandas as pd
 from typing import Callable
 
+from .reference_index import map_distinct
+
+PLAUSIBLE_EMAIL = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+EMPTY_VALUES = ('', 'nan')
+NPI_PREFIX_LUHN_SUM = 24 # Luhn sum of the "80840" prefix of every NPI
+
+def vectorized(element_func: Callable[[str], str]) -> Callable[[Callable], Callable]:
+    """
+    Mark a function as running on a whole column at once.  The element-wise
+    function is kept for when each rejected value needs to be counted.
+    """
+    def decorator(column_func: Callable[[pd.Series], pd.Series]) -> Callable:
+        column_func.element_func = element_func # type: ignore
+        return column_func
+    return decorator
+
 def numbers_only(v: str) -> str:
     """Only keep digits in a string."""
     return re.sub("[^0-9]", "", v)
@@ -98,6 +116,81 @@ def email(v: str) -> str:
             raise EmailUndeliverableError
     return v
 
+def optional_email(v: str) -> str:
+    """Validate email address, allowing it to be empty."""
+    if v in EMPTY_VALUES:
+        return ''
+    return email(v)
+
+@vectorized(optional_email)
+def email_column(s: pd.Series) -> pd.Series:
+    """
+    Validate a column of email addresses, allowing empty values.  Values
+    that cannot be an address are rejected without being parsed, and each
+    distinct remaining address is validated once.
+    """
+    s = s.fillna('').astype(str)
+    empty = s.isin(EMPTY_VALUES)
+    plausible = s.str.fullmatch(PLAUSIBLE_EMAIL.pattern)
+    invalid = ~empty & ~plausible
+    if invalid.any():
+        raise EmailSyntaxError(f'{int(invalid.sum())} invalid email address(es), '
+                               f'such as: {s[invalid].iloc[0]}')
+    validated = {v: email(v) for v in s[plausible].unique()}
+    return s.map(validated).where(plausible, '')
+
+def get_npi_check_digits(bases: np.ndarray) -> np.ndarray:
+    """
+    Get the Luhn check digit of each row of nine NPI base digits, including
+    the "80840" prefix in the sum.
+    """
+    doubled = bases[:, ::2] * 2
+    doubled -= 9 * (doubled > 9)
+    total = NPI_PREFIX_LUHN_SUM + doubled.sum(axis=1) + bases[:, 1::2].sum(axis=1)
+    return (10 - total % 10) % 10
+
+def get_valid_npis(digits: pd.Series) -> np.ndarray:
+    """Check which strings of digits are empty or a valid ten digit NPI."""
+    lengths = digits.str.len().to_numpy()
+    valid = lengths == 0
+    ten_digits = lengths == 10
+    if ten_digits.any():
+        text = ''.join(digits[ten_digits]).encode('ascii')
+        npis = (np.frombuffer(text, dtype=np.uint8).reshape(-1, 10) - 48).astype(int)
+        valid[ten_digits] = get_npi_check_digits(npis[:, :9]) == npis[:, 9]
+    return valid
+
+def npi(v: str) -> str:
+    """Validate a National Provider Identifier, allowing it to be empty."""
+    n = numbers_only(v)
+    if len(n) == 0:
+        return n
+    if len(n) == 10:
+        total = NPI_PREFIX_LUHN_SUM
+        for position, digit in enumerate(int(d) for d in n[:9]):
+            if position % 2 == 0:
+                digit *= 2
+                if digit > 9:
+                    digit -= 9
+            total += digit
+        if (10 - total % 10) % 10 == int(n[9]):
+            return n
+    raise ValueError(f'Invalid NPI: {v}')
+
+@vectorized(npi)
+def npi_column(s: pd.Series) -> pd.Series:
+    """
+    Validate a column of National Provider Identifiers, allowing empty
+    values.  The check digit of each distinct value is checked at once.
+    """
+    codes, uniques = pd.factorize(s.fillna('').astype(str))
+    digits = pd.Series(uniques, dtype=object).str.replace('[^0-9]', '', regex=True)
+    invalid = ~get_valid_npis(digits)
+    if invalid.any():
+        raise ValueError(f'{int(invalid[codes].sum())} invalid NPI(s), '
+                         f'such as: {uniques[invalid][0]}')
+    return pd.Series(digits.to_numpy()[codes], index=s.index, dtype=object)
+
 def format_phone(v: str) -> str:
     """Parse a ten digit phone number to the expected phone number format."""
     return f'{v[:3]}-{v[3:6]}-{v[6:]}'
@@ -144,6 +237,88 @@ def address(v: str) -> str:
     else:
         return v.lower().title()
 
+STREET_SUFFIXES = {
+    'ALLEY': 'Aly', 'ALY': 'Aly', 'AVENUE': 'Ave', 'AVE': 'Ave', 'AV': 'Ave',
+    'BOULEVARD': 'Blvd', 'BLVD': 'Blvd', 'CENTER': 'Ctr', 'CTR': 'Ctr',
+    'CIRCLE': 'Cir', 'CIR': 'Cir', 'COURT': 'Ct', 'CT': 'Ct', 'COVE': 'Cv',
+    'CV': 'Cv', 'CROSSING': 'Xing', 'XING': 'Xing', 'DRIVE': 'Dr', 'DR': 'Dr',
+    'EXPRESSWAY': 'Expy', 'EXPY': 'Expy', 'FREEWAY': 'Fwy', 'FWY': 'Fwy',
+    'HEIGHTS': 'Hts', 'HTS': 'Hts', 'HIGHWAY': 'Hwy', 'HWY': 'Hwy',
+    'LANE': 'Ln', 'LN': 'Ln', 'LOOP': 'Loop', 'PARKWAY': 'Pkwy', 'PKWY': 'Pkwy',
+    'PIKE': 'Pike', 'PLACE': 'Pl', 'PL': 'Pl', 'PLAZA': 'Plz', 'PLZ': 'Plz',
+    'POINT': 'Pt', 'PT': 'Pt', 'ROAD': 'Rd', 'RD': 'Rd', 'ROUTE': 'Rte',
+    'RTE': 'Rte', 'SQUARE': 'Sq', 'SQ': 'Sq', 'STREET': 'St', 'ST': 'St',
+    'STR': 'St', 'TERRACE': 'Ter', 'TER': 'Ter', 'TRAIL': 'Trl', 'TRL': 'Trl',
+    'TURNPIKE': 'Tpke', 'TPKE': 'Tpke', 'WAY': 'Way',
+}
+DIRECTIONALS = {
+    'NORTH': 'N', 'N': 'N', 'SOUTH': 'S', 'S': 'S', 'EAST': 'E', 'E': 'E',
+    'WEST': 'W', 'W': 'W', 'NORTHEAST': 'NE', 'NE': 'NE', 'NORTHWEST': 'NW',
+    'NW': 'NW', 'SOUTHEAST': 'SE', 'SE': 'SE', 'SOUTHWEST': 'SW', 'SW': 'SW',
+}
+UNIT_DESIGNATORS = {
+    'APARTMENT': 'Apt', 'APT': 'Apt', 'BUILDING': 'Bldg', 'BLDG': 'Bldg',
+    'DEPARTMENT': 'Dept', 'DEPT': 'Dept', 'FLOOR': 'Fl', 'FL': 'Fl',
+    'LOT': 'Lot', 'ROOM': 'Rm', 'RM': 'Rm', 'SPACE': 'Spc', 'SPC': 'Spc',
+    'SUITE': 'Ste', 'STE': 'Ste', 'TRAILER': 'Trlr', 'TRLR': 'Trlr',
+    'UNIT': 'Unit', '#': '#',
+}
+PO_BOX = re.compile(r'\b(?:P\s*\.?\s*O\s*\.?\s*BOX|POST\s+OFFICE\s+BOX|POB)\b')
+ADDRESS_PUNCTUATION = re.compile(r'[.,]')
+ORDINAL = re.compile(r'(\d+)(ST|ND|RD|TH)')
+
+def format_address_token(token: str) -> str:
+    """Format an address word that is not an abbreviation."""
+    ordinal = ORDINAL.fullmatch(token)
+    if ordinal is not None:
+        return f'{ordinal[1]}{ordinal[2].lower()}'
+    if len(token) == 1 or any(c.isdigit() for c in token):
+        return token
+    return token.title()
+
+def normalize_address(v: str) -> str:
+    """
+    Normalize address text to USPS style: standard street suffix,
+    directional and unit abbreviations, lowercase ordinals and "PO Box".
+    """
+    if v is None or v in ('-', 'nan'):
+        return ''
+    tokens = ADDRESS_PUNCTUATION.sub(' ', PO_BOX.sub('PO BOX', v.upper())).split()
+    unit_start = next((i for i, token in enumerate(tokens)
+                       if token in UNIT_DESIGNATORS or token.startswith('#')),
+                      len(tokens))
+    name_start = 1 if tokens and any(c.isdigit() for c in tokens[0]) else 0
+    street_end = unit_start
+    if street_end - name_start > 1 and tokens[street_end - 1] in DIRECTIONALS:
+        street_end -= 1
+    suffix = next((i for i in range(street_end - 1, name_start, -1)
+                   if tokens[i] in STREET_SUFFIXES), None)
+    name_end = street_end if suffix is None else suffix
+    normalized = []
+    for i, token in enumerate(tokens):
+        if token == 'PO' and tokens[i + 1:i + 2] == ['BOX']:
+            normalized.append('PO')
+        elif token == 'BOX' and tokens[i - 1:i] == ['PO']:
+            normalized.append('Box')
+        elif i >= unit_start:
+            normalized.append(UNIT_DESIGNATORS.get(token, token))
+        elif i == suffix:
+            normalized.append(STREET_SUFFIXES[token])
+        elif token in DIRECTIONALS and (len(token) <= 2 or i == street_end
+                                        or (i == name_start and i + 1 < name_end)):
+            normalized.append(DIRECTIONALS[token])
+        else:
+            normalized.append(format_address_token(token))
+    return ' '.join(normalized)
+
+@vectorized(normalize_address)
+def address_column(s: pd.Series) -> pd.Series:
+    """
+    Normalize a column of address text to USPS style, normalizing each
+    distinct value once.
+    """
+    return map_distinct(s, lambda distinct: distinct.map(normalize_address)).fillna('')
+
 def language(v: str) -> str:
     """Parse languages and return the appropriate Press Ganey language code."""
     v = v.strip().lower()
@@ -225,11 +400,13 @@ def get_validator_func_from_name(name: str) -> Callable:
     Used to take in values from the config .JSON file and return the appropriate
     function.
     """
-    mapping = {
+    mapping: dict[str, Callable] = {
         'has_characters': has_characters,
         'get_first_name': get_first_name,
         'get_last_name': get_last_name,
         'address': address,
+        'normalize_address': normalize_address,
+        'address_column': address_column,
         'city': city,
         'state_initials': state_initials,
         'zip_code': zip_code,
@@ -241,5 +418,9 @@ def get_validator_func_from_name(name: str) -> Callable:
         'flip_name': flip_name,
         'to_yn_from_yesno': to_yn_from_yesno,
         'email': email,
+        'optional_email': optional_email,
+        'email_column': email_column,
+        'npi': npi,
+        'npi_column': npi_column,
     }
     return mapping[name]
\ No newline at end of file
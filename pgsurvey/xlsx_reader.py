@@ -0,0 +1,308 @@
+from collections import defaultdict
+import datetime
+import posixpath
+import threading
+from typing import Any, BinaryIO, Callable, Iterator
+from xml.etree import ElementTree
+import zipfile
+
+import numpy as np
+import pandas as pd
+from openpyxl.reader.strings import read_string_table # type: ignore[import-untyped]
+from openpyxl.styles.stylesheet import Stylesheet # type: ignore[import-untyped]
+from openpyxl.utils.datetime import ( # type: ignore[import-untyped]
+    MAC_EPOCH, WINDOWS_EPOCH, from_excel, from_ISO8601)
+
+SHEET_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+DOCUMENT_RELATIONSHIPS_NS = ('http://schemas.openxmlformats.org/'
+                             'officeDocument/2006/relationships')
+PACKAGE_RELATIONSHIPS_NS = ('http://schemas.openxmlformats.org/'
+                            'package/2006/relationships')
+ROW_TAG = f'{{{SHEET_MAIN_NS}}}row'
+CELL_TAG = f'{{{SHEET_MAIN_NS}}}c'
+VALUE_TAG = f'{{{SHEET_MAIN_NS}}}v'
+INLINE_STRING_TAG = f'{{{SHEET_MAIN_NS}}}is'
+TEXT_TAG = f'{{{SHEET_MAIN_NS}}}t'
+RICH_TEXT_RUN_TAG = f'{{{SHEET_MAIN_NS}}}r'
+SHEET_DATA_TAG = f'{{{SHEET_MAIN_NS}}}sheetData'
+# Values pandas reads as NaN by default
+NA_VALUES = frozenset(('', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN',
+                       '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A',
+                       'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'))
+
+class XlsxStyles:
+    """The cell styles of a workbook that format numbers as dates or durations."""
+    def __init__(self, date_styles: set[int], timedelta_styles: set[int],
+                 epoch: datetime.datetime) -> None:
+        self.date_styles = date_styles
+        self.timedelta_styles = timedelta_styles
+        self.epoch = epoch
+
+def read_xml(archive: zipfile.ZipFile, name: str) -> ElementTree.Element:
+    """Parse an XML part of a workbook."""
+    with archive.open(name) as f:
+        return ElementTree.parse(f).getroot()
+
+def get_xlsx_sheet_paths(archive: zipfile.ZipFile) -> dict[str, str]:
+    """Get the archive path of each worksheet by name, in workbook order."""
+    workbook = read_xml(archive, 'xl/workbook.xml')
+    relationships = read_xml(archive, 'xl/_rels/workbook.xml.rels')
+    targets = {}
+    for relationship in relationships.iter(f'{{{PACKAGE_RELATIONSHIPS_NS}}}Relationship'):
+        if relationship.get('Type', '').endswith('/worksheet'):
+            target = relationship.get('Target', '')
+            if target.startswith('/'):
+                target = target.lstrip('/')
+            else:
+                target = posixpath.normpath(posixpath.join('xl', target))
+            targets[relationship.get('Id')] = target
+    sheet_paths = {}
+    for sheet in workbook.iter(f'{{{SHEET_MAIN_NS}}}sheet'):
+        relationship_id = sheet.get(f'{{{DOCUMENT_RELATIONSHIPS_NS}}}id')
+        if relationship_id in targets:
+            sheet_paths[sheet.get('name', '')] = targets[relationship_id]
+    return sheet_paths
+
+def get_xlsx_styles(archive: zipfile.ZipFile) -> XlsxStyles:
+    """
+    Get the styles that format numbers as dates, found by openpyxl's rules so
+    dates are converted as pd.read_excel converts them.
+    """
+    workbook = read_xml(archive, 'xl/workbook.xml')
+    properties = workbook.find(f'{{{SHEET_MAIN_NS}}}workbookPr')
+    date1904 = properties is not None and properties.get('date1904') in ('1', 'true')
+    if 'xl/styles.xml' not in archive.namelist():
+        return XlsxStyles(set(), set(), MAC_EPOCH if date1904 else WINDOWS_EPOCH)
+    stylesheet = Stylesheet.from_tree(read_xml(archive, 'xl/styles.xml'))
+    return XlsxStyles(stylesheet.date_formats, stylesheet.timedelta_formats,
+                      MAC_EPOCH if date1904 else WINDOWS_EPOCH)
+
+def get_column_index(reference: str, cache: dict[str, int]) -> int:
+    """Get the zero-based column index of a cell reference such as "AB12"."""
+    letters = reference.rstrip('0123456789')
+    index = cache.get(letters)
+    if index is None:
+        index = 0
+        for letter in letters:
+            index = index * 26 + ord(letter) - 64
+        index -= 1
+        cache[letters] = index
+    return index
+
+def get_text_content(node: ElementTree.Element) -> str:
+    """
+    Get the text of an inline string stripped of formatting, as openpyxl's
+    Text.content gets it.
+    """
+    snippets = []
+    for child in node:
+        if child.tag == TEXT_TAG:
+            snippets.append(child.text or '')
+        elif child.tag == RICH_TEXT_RUN_TAG:
+            snippets.append(child.findtext(TEXT_TAG) or '')
+    return ''.join(snippets)
+
+def convert_cell(cell: ElementTree.Element, shared_strings: list[str],
+                 styles: XlsxStyles) -> Any:
+    """
+    Convert a cell to the text pd.read_excel(dtype=str) gives it, NaN for an
+    error, or '' if it has no value.
+    """
+    data_type = cell.get('t', 'n')
+    if data_type == 'inlineStr':
+        inline_string = cell.find(INLINE_STRING_TAG)
+        if inline_string is None:
+            return ''
+        return get_text_content(inline_string)
+    value = cell.findtext(VALUE_TAG)
+    if not value:
+        return ''
+    match data_type:
+        case 'n':
+            number = float(value) if ('.' in value or 'E' in value
+                                      or 'e' in value) else int(value)
+            style = int(cell.get('s', 0))
+            if style in styles.date_styles:
+                try:
+                    return str(from_excel(number, styles.epoch,
+                                          timedelta=style in styles.timedelta_styles))
+                except (OverflowError, ValueError):
+                    return np.nan
+            if int(number) == number:
+                return str(int(number))
+            return str(number)
+        case 's':
+            return shared_strings[int(value)]
+        case 'b':
+            return str(bool(int(value)))
+        case 'd':
+            return str(from_ISO8601(value))
+        case 'e':
+            return np.nan
+    return value
+
+def iter_sheet_rows(archive: zipfile.ZipFile, sheet_path: str,
+                    cancelled: threading.Event | None = None
+                    ) -> Iterator[tuple[int, list[ElementTree.Element]]]:
+    """
+    Stream the rows of a worksheet with an incremental parser, getting the
+    zero-based row number and the cells of each row.  Rows are discarded
+    once read, so memory does not grow with the sheet.  InterruptedError is
+    raised once "cancelled" is set.
+    """
+    row_counter = -1
+    with archive.open(sheet_path) as f:
+        sheet_data = None
+        for event, element in ElementTree.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == SHEET_DATA_TAG:
+                    sheet_data = element
+                continue
+            if element.tag != ROW_TAG:
+                continue
+            if cancelled is not None and cancelled.is_set():
+                raise InterruptedError('Reading the worksheet was cancelled')
+            row_number = element.get('r')
+            row_counter = int(row_number) - 1 if row_number else row_counter + 1
+            yield row_counter, list(element)
+            if sheet_data is not None:
+                sheet_data.clear()
+
+def dedup_column_names(names: list[Any]) -> list[Any]:
+    """Number repeated column names "A", "A.1", "A.2" as pandas does."""
+    counts: defaultdict[Any, int] = defaultdict(int)
+    deduped = []
+    for name in names:
+        count = counts[name]
+        while count > 0:
+            counts[name] = count + 1
+            name = f'{name}.{count}'
+            count = counts[name]
+        deduped.append(name)
+        counts[name] = count + 1
+    return deduped
+
+def get_column_names(header: list[Any]) -> list[Any]:
+    """Name the columns of a header row as pandas names them."""
+    return dedup_column_names([name if name != '' else f'Unnamed: {index}'
+                               for index, name in enumerate(header)])
+
+def read_xlsx_sheet(archive: zipfile.ZipFile, sheet_path: str,
+                    shared_strings: list[str], styles: XlsxStyles,
+                    usecols: Callable[[Any], bool] | None = None,
+                    nrows: int | None = None,
+                    cancelled: threading.Event | None = None) -> pd.DataFrame:
+    """
+    Read a worksheet into a dataframe of text.  Only the cells of the
+    "usecols" columns are converted, straight into a list per column.
+    """
+    columns_index: dict[str, int] = {}
+    header: list[Any] = []
+    names: list[Any] = []
+    column_values: dict[int, list[Any]] = {}
+    skipped: set[int] = set()
+    rows = 0
+    data_rows = 0 # rows up to the last row with a value
+    for row_number, cells in iter_sheet_rows(archive, sheet_path, cancelled):
+        if row_number == 0:
+            for cell in cells:
+                index = get_column_index(cell.get('r', ''), columns_index) \
+                    if cell.get('r') else len(header)
+                header.extend([''] * (index - len(header)))
+                header.append(convert_cell(cell, shared_strings, styles))
+            names = get_column_names(header)
+            continue
+        if nrows is not None and row_number > nrows:
+            break
+        row = row_number - 1
+        for _ in range(rows, row):
+            for values in column_values.values():
+                values.append('')
+        rows = row + 1
+        has_value = False
+        index = -1
+        for cell in cells:
+            reference = cell.get('r')
+            index = get_column_index(reference, columns_index) if reference else index + 1
+            if index in skipped:
+                if not has_value and (cell.find(VALUE_TAG) is not None
+                                      or cell.find(INLINE_STRING_TAG) is not None):
+                    has_value = convert_cell(cell, shared_strings, styles) != ''
+                continue
+            column = column_values.get(index)
+            if column is None:
+                name = names[index] if index < len(names) else f'Unnamed: {index}'
+                if usecols is not None and not usecols(name):
+                    skipped.add(index)
+                    if not has_value:
+                        has_value = convert_cell(cell, shared_strings, styles) != ''
+                    continue
+                column = column_values[index] = [''] * row
+            value = convert_cell(cell, shared_strings, styles)
+            column.extend([''] * (row - len(column)))
+            column.append(value)
+            has_value = has_value or value != ''
+        for values in column_values.values():
+            if len(values) < rows:
+                values.append('')
+        if has_value:
+            data_rows = rows
+    if not header and not data_rows:
+        return pd.DataFrame()
+    # Every column of the header and the data, as pd.read_excel reads them
+    width = max([len(header)] + [index + 1 for index, values in column_values.items()
+                                  if any(value != '' for value in values[:data_rows])])
+    while header and header[-1] == '' and len(header) > width:
+        header.pop()
+    names = get_column_names(header + [''] * (width - len(header)))
+    data = {}
+    for index, name in enumerate(names):
+        if usecols is not None and not usecols(name):
+            continue
+        values = column_values.get(index, [])[:data_rows]
+        values.extend([''] * (data_rows - len(values)))
+        data[name] = pd.Series(values, dtype=object)
+    df = pd.DataFrame(data, index=pd.RangeIndex(data_rows if data else 0),
+                      columns=pd.Index(list(data), dtype=object))
+    return df.mask(df.isin(NA_VALUES), np.nan)
+
+def get_xlsx_sheet_names(input_file: str | BinaryIO | Any) -> list[str]:
+    """Get the names of the worksheets of an .xlsx workbook, in workbook order."""
+    try:
+        with zipfile.ZipFile(input_file) as archive:
+            return list(get_xlsx_sheet_paths(archive))
+    except (KeyError, ElementTree.ParseError) as e:
+        raise ValueError(f'Unable to read the workbook: {e}') from e
+
+def read_xlsx(input_file: str | BinaryIO | Any,
+              usecols: Callable[[Any], bool] | None = None,
+              nrows: int | None = None,
+              sheet_name: str | None = None,
+              cancelled: threading.Event | None = None) -> pd.DataFrame:
+    """
+    Read a worksheet of an .xlsx workbook, the first one unless "sheet_name"
+    is given, into the same dataframe as pd.read_excel(dtype=str).  The
+    sheet XML is streamed and only the "usecols" columns are converted,
+    without creating an openpyxl cell object for every cell.  The read stops
+    with InterruptedError soon after "cancelled" is set.
+    """
+    try:
+        with zipfile.ZipFile(input_file) as archive:
+            sheet_paths = get_xlsx_sheet_paths(archive)
+            if not sheet_paths:
+                raise ValueError('The workbook has no worksheets')
+            if sheet_name is None:
+                sheet_path = next(iter(sheet_paths.values()))
+            elif sheet_name in sheet_paths:
+                sheet_path = sheet_paths[sheet_name]
+            else:
+                raise ValueError(f'Worksheet named "{sheet_name}" not found')
+            shared_strings = []
+            if 'xl/sharedStrings.xml' in archive.namelist():
+                with archive.open('xl/sharedStrings.xml') as f:
+                    shared_strings = read_string_table(f)
+            styles = get_xlsx_styles(archive)
+            return read_xlsx_sheet(archive, sheet_path, shared_strings, styles,
+                                   usecols, nrows, cancelled)
+    except (KeyError, ElementTree.ParseError) as e:
+        raise ValueError(f'Unable to read the workbook: {e}') from e
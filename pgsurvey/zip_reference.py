@@ -0,0 +1,105 @@
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .reference_index import SortedIndex, load_cached_arrays, map_distinct
+
+class ZipReference(NamedTuple):
+    """Settings for checking city and state against a ZIP code reference file."""
+    path: str
+    zip_column: str = 'ZIP Code'
+    city_column: str = 'City'
+    state_column: str = 'State'
+    correct_mismatches: bool = False
+
+class ZipCheck(NamedTuple):
+    """Cities and states checked against the ZIP code reference."""
+    city: pd.Series
+    state: pd.Series
+    unknown_zip: pd.Series
+    city_mismatch: pd.Series
+    state_mismatch: pd.Series
+    filled: int
+
+def normalize_city(cities: pd.Series) -> pd.Series:
+    """Normalize city names for comparison, ignoring case and punctuation."""
+    return (cities.fillna('').astype(str).str.upper()
+            .str.replace(r'[^A-Z0-9 ]', '', regex=True)
+            .str.split().str.join(' '))
+
+def get_zip5(zips: pd.Series) -> pd.Series:
+    """Get the five digit ZIP code of each value, or '' if it has none."""
+    digits = zips.fillna('').astype(str).str.replace(r'\D', '', regex=True)
+    return digits.str.slice(0, 5).where(digits.str.len() >= 5, '')
+
+def build_zip_arrays(source: Path) -> dict[str, np.ndarray]:
+    """
+    Build the ZIP code index arrays from a .csv file with "zip", "city" and
+    "state" columns.  The first row of a ZIP code is its primary city and any
+    later rows are other accepted cities.
+    """
+    df = pd.read_csv(source, dtype=str, usecols=['zip', 'city', 'state'],
+                     keep_default_na=False)
+    df['zip'] = df['zip'].str.strip().str.zfill(5)
+    df['city'] = df['city'].str.strip().str.title()
+    df['state'] = df['state'].str.strip().str.upper()
+    primary = df.drop_duplicates('zip').sort_values('zip')
+    accepted = df['zip'] + '|' + normalize_city(df['city'])
+    return {'zip': primary['zip'].to_numpy(dtype=str),
+            'city': primary['city'].to_numpy(dtype=str),
+            'state': primary['state'].to_numpy(dtype=str),
+            'zip_city': np.unique(accepted.to_numpy(dtype=str))}
+
+class ZipIndex:
+    """Primary city and state of each ZIP code, and every accepted city."""
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        self.primary = SortedIndex(arrays['zip'], city=arrays['city'],
+                                   state=arrays['state'])
+        self.accepted = SortedIndex(arrays['zip_city'])
+
+    @classmethod
+    def load(cls, source: Path) -> 'ZipIndex':
+        """Load the index cached next to the source .csv file."""
+        return cls(load_cached_arrays(source, build_zip_arrays))
+
+    def accepted_pairs(self, zip5: pd.Series, normalized_cities: pd.Series) -> pd.Series:
+        """Check which ZIP code and normalized city pairs are accepted."""
+        pairs = pd.DataFrame({'zip': zip5, 'city': normalized_cities})
+        codes = pairs.groupby(['zip', 'city'], sort=False).ngroup().to_numpy()
+        distinct = pairs.drop_duplicates()
+        accepted = self.accepted.contains(distinct['zip'] + '|' + distinct['city'])
+        return pd.Series(accepted.to_numpy()[codes], index=zip5.index)
+
+    def check(self, zips: pd.Series, cities: pd.Series, states: pd.Series,
+              correct_mismatches: bool = False) -> ZipCheck:
+        """
+        Check each row's city and state against its ZIP code.  A missing city
+        or state is filled in from the ZIP code, and mismatches are corrected
+        if "correct_mismatches" is set.
+        """
+        zip5 = map_distinct(zips.fillna(''), get_zip5)
+        reference_city = self.primary.get('city', zip5)
+        reference_state = self.primary.get('state', zip5)
+        known = reference_city.notna()
+        city_text = map_distinct(cities.fillna(''), normalize_city)
+        state_text = map_distinct(states.fillna(''),
+                                  lambda s: s.astype(str).str.strip().str.upper())
+        city_empty = city_text.isin(('', 'NAN'))
+        state_empty = state_text.isin(('', 'NAN'))
+        city_accepted = self.accepted_pairs(zip5, city_text)
+        city_mismatch = known & ~city_empty & ~city_accepted
+        state_mismatch = known & ~state_empty & (state_text != reference_state)
+        fill_city = known & city_empty
+        fill_state = known & state_empty
+        if correct_mismatches:
+            fill_city |= city_mismatch
+            fill_state |= state_mismatch
+        return ZipCheck(city=cities.mask(fill_city, reference_city),
+                        state=states.mask(fill_state, reference_state),
+                        unknown_zip=(zip5 != '') & ~known,
+                        city_mismatch=city_mismatch,
+                        state_mismatch=state_mismatch,
+                        filled=int((known & city_empty).sum()
+                                   + (known & state_empty).sum()))
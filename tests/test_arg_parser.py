@@ -1,6 +1,8 @@
-from pgsurvey import accept_arguments, TransmitOption
+from pgsurvey import accept_arguments, parse_run_options, TransmitOption
 from pathlib import Path
 
+import pytest
+
 def test_accept_arguments_config_path():
     config = 'example_config.json'
     config_path, _, _ = accept_arguments(['-c', config])
@@ -18,4 +20,65 @@ def test_accept_arguments_empty():
     config_path, input_file, transmit_option = accept_arguments([])
     assert config_path == Path('config.json')
     assert input_file is None
-    assert transmit_option == TransmitOption.USER_INPUT
\ No newline at end of file
+    assert transmit_option == TransmitOption.USER_INPUT
+
+def test_parse_run_options_stream_upload():
+    options = parse_run_options(['-s', '--stream-upload'])
+    assert options.stream_upload is True
+    assert options.transmit_option is TransmitOption.SFTP
+
+def test_parse_run_options_stream_upload_default():
+    options = parse_run_options([])
+    assert options.stream_upload is False
+
+def test_parse_run_options_transmit_only():
+    options = parse_run_options(['--transmit-only', 'output.csv'])
+    assert options.transmit_only == Path('output.csv')
+    assert options.transmit_option is TransmitOption.SFTP
+
+@pytest.mark.parametrize('dry_run_args', [['--dry-run'], ['--sample', '10']])
+def test_parse_run_options_transmit_only_dry_run(dry_run_args):
+    with pytest.raises(SystemExit):
+        parse_run_options(['--transmit-only', 'output.csv', *dry_run_args])
+
+def test_parse_run_options_profile():
+    assert parse_run_options(['--profile']).profile is True
+    assert parse_run_options([]).profile is False
+
+def test_parse_run_options_dry_run():
+    assert parse_run_options(['--dry-run']).dry_run is True
+    assert parse_run_options([]).dry_run is False
+
+def test_parse_run_options_sample():
+    options = parse_run_options(['--sample', '100', '--sample-seed', '7'])
+    assert options.dry_run is True
+    assert options.sample == 100
+    assert options.sample_seed == 7
+
+@pytest.mark.parametrize('upload_workers', ['0', '-1', 'two'])
+def test_parse_run_options_upload_workers_invalid(upload_workers):
+    with pytest.raises(SystemExit):
+        parse_run_options(['--upload-workers', upload_workers])
+
+def test_parse_run_options_upload_workers():
+    assert parse_run_options(['--upload-workers', '2']).upload_workers == 2
+    assert parse_run_options([]).upload_workers == 4
+
+def test_parse_run_options_workers():
+    assert parse_run_options(['--workers', '4']).workers == 4
+    assert parse_run_options([]).workers == 1
+
+def test_parse_run_options_multiple_input_files():
+    options = parse_run_options(['-f', 'a.csv', 'b_*.csv', '-n'])
+    assert options.input_files == (Path('a.csv'), Path('b_*.csv'))
+    assert options.input_file == Path('a.csv')
+    assert options.drop_duplicate_rows_across_files is False
+    assert parse_run_options(['-f', 'a.csv', '--drop-duplicate-rows-across-files']) \
+        .drop_duplicate_rows_across_files is True
+    assert parse_run_options([]).input_files == ()
+
+def test_parse_run_options_sheets():
+    assert parse_run_options([]).sheets is None
+    assert parse_run_options(['-f', 'sites.xlsx', '--sheets']).sheets == ()
+    assert parse_run_options(['--sheets', 'North', 'South Clinic', '-n']).sheets \
+        == ('North', 'South Clinic')
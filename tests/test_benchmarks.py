@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from benchmarks.generate_report import generate_report, npi_check_digit, save_report
+from benchmarks.run_benchmarks import (
+    StageResult,
+    benchmark_workers,
+    compare_to_baseline,
+)
+from pgsurvey import Report, read_config, read_row_dedup_config
+
+def test_generate_report_is_seeded():
+    assert generate_report(200, seed=1).equals(generate_report(200, seed=1))
+    assert not generate_report(200, seed=1).equals(generate_report(200, seed=2))
+
+def test_generate_report_has_config_source_columns():
+    config_serialized = json.loads(Path('config.json').read_text())
+    df = generate_report(10)
+    for col in config_serialized['columns']:
+        if 'default_value' in col:
+            continue
+        source_name = col.get('old_name', col.get('source_column_name', col['name']))
+        assert source_name in df.columns
+
+def test_generate_report_runs_config_actions():
+    config_serialized = json.loads(Path('config.json').read_text())
+    _, columns, actions = read_config(config_serialized)
+    report = Report(generate_report(500), columns, actions,
+                    row_dedup=read_row_dedup_config(config_serialized))
+    report.run_actions()
+    assert 0 < len(report.df) <= 500
+
+def test_generate_report_invalid_rate():
+    config_serialized = json.loads(Path('config.json').read_text())
+    _, columns, actions = read_config(config_serialized)
+    report = Report(generate_report(500, invalid_rate=0.1), columns, actions)
+    with pytest.raises((ValueError, KeyError)):
+        report.run_actions()
+
+@pytest.mark.parametrize('npi_base, expected', [('123456789', '3')])
+def test_npi_check_digit(npi_base, expected):
+    assert npi_check_digit(npi_base) == expected
+
+@pytest.mark.parametrize('suffix', ['.csv', '.tsv', '.xlsx'])
+def test_save_report(tmp_path, suffix):
+    df = generate_report(20)
+    path = tmp_path / Path(f'report{suffix}')
+    save_report(df, path)
+    assert path.exists()
+
+def test_compare_to_baseline():
+    baseline = {'read_xlsx': {'seconds': 1.0, 'peak_bytes': 0},
+                'sort_column_order': {'seconds': 0.001, 'peak_bytes': 0}}
+    results = {'read_xlsx': StageResult(2.0, 0),
+               'sort_column_order': StageResult(0.01, 0),
+               'write_csv': StageResult(1.0, 0)}
+    regressions = compare_to_baseline(results, baseline, tolerance=1.5)
+    assert len(regressions) == 1
+    assert regressions[0].startswith('read_xlsx')
+
+def test_benchmark_workers():
+    seconds = benchmark_workers(100, Path('config.json'), [1, 2])
+    assert list(seconds) == [1, 2]
+    assert all(result > 0 for result in seconds.values())
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from pgsurvey import ActionMetric, Column, Report, get_peak_memory_bytes, numbers_only
+
+def test_get_peak_memory_bytes():
+    peak_memory = get_peak_memory_bytes()
+    assert peak_memory is None or peak_memory > 0
+
+def test_action_metric_str():
+    metric = ActionMetric('sort_column_order', 0.25, 10, 8, 1048576)
+    assert str(metric) == ('"sort_column_order" took 0.250s, rows 10 -> 8, '
+                           'peak memory +1.0 MiB')
+
+def test_action_metric_str_without_memory():
+    metric = ActionMetric('sort_column_order', 0.25, 10, 8)
+    assert 'peak memory' not in str(metric)
+
+def test_report_run_actions_records_metrics():
+    columns = [Column(name='NPI', func=numbers_only)]
+    report = Report(pd.DataFrame({'NPI': ['a1', 'b2']}), columns,
+                    ['run_functions_on_columns', 'sort_column_order'])
+    report.run_actions()
+    names = [metric.name for metric in report.action_metrics]
+    assert names == ['numbers_only on NPI', 'run_functions_on_columns',
+                     'sort_column_order']
+    for metric in report.action_metrics:
+        assert metric.seconds >= 0
+        assert metric.rows_in == metric.rows_out == 2
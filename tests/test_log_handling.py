@@ -1,10 +1,17 @@
+import gzip
+import os
 from pathlib import Path
 import sys
 import logging
 
+import pytest
+
 from pgsurvey import (
+    CompressingRotatingFileHandler,
     create_logger,
     create_logs_dir_if_not_exists,
+    flush_logger,
+    get_profile_path,
     override_sys_excepthook_to_log_uncaught_exceptions
 )
 
@@ -23,10 +30,10 @@ def test_logger_type_valid():
     # Generate a log message with same severity and text as below:
     # 2023-10-24 13:38:34,711 UTC|INFO|Test Log
     logger.info(log_text)
+    flush_logger()
     _, logged_severity, logged_text = tuple(log_path.read_text().split('|'))
     assert log_severity == logged_severity
     assert log_text == logged_text.strip()
-    logger.handlers.clear()
     log_path.unlink()
     log_dir.rmdir()
 
@@ -37,6 +44,102 @@ def test_override_sys_excepthook_and_set_logger_to_handle_uncaught_exceptions():
     original_sys_excepthook = sys.excepthook
     assert override_sys_excepthook_to_log_uncaught_exceptions(logger) is None
     sys.excepthook = original_sys_excepthook
-    logger.handlers.clear()
+    flush_logger()
     log_path.unlink()
-    log_dir.rmdir()
\ No newline at end of file
+    log_dir.rmdir()
+
+def test_get_profile_path():
+    log_dir = Path('tests/temp_logs')
+    profile_path = get_profile_path(log_dir)
+    assert profile_path.parent == log_dir
+    assert profile_path.suffix == '.pstats'
+    log_dir.rmdir()
+
+def test_create_logger_is_idempotent():
+    log_dir = Path('tests/temp_logs')
+    log_path = log_dir / Path('test.log')
+    logger = create_logger(log_path=log_path)
+    assert create_logger(log_path=log_path) is logger
+    assert len(logger.handlers) == 1
+    logger.info('Written once')
+    flush_logger()
+    assert log_path.read_text().count('Written once') == 1
+    log_path.unlink()
+    log_dir.rmdir()
+
+def test_create_logger_after_flush():
+    log_dir = Path('tests/temp_logs')
+    log_path = log_dir / Path('test.log')
+    logger = create_logger(log_path=log_path)
+    flush_logger()
+    assert create_logger(log_path=log_path) is logger
+    assert len(logger.handlers) == 1
+    logger.info('Written after flush')
+    flush_logger()
+    assert 'Written after flush' in log_path.read_text()
+    log_path.unlink()
+    log_dir.rmdir()
+
+def test_flush_logger_writes_queued_records():
+    log_dir = Path('tests/temp_logs')
+    log_path = log_dir / Path('test.log')
+    logger = create_logger(log_path=log_path)
+    for n in range(1000):
+        logger.info(f'Record {n}')
+    flush_logger()
+    assert len(log_path.read_text().splitlines()) == 1000
+    assert flush_logger() is None
+    log_path.unlink()
+    log_dir.rmdir()
+
+@pytest.fixture
+def rotating_log_path(tmp_path):
+    return tmp_path / Path('test.log')
+
+def write_records(handler: logging.Handler, count: int) -> None:
+    for n in range(count):
+        handler.emit(logging.LogRecord('test', logging.INFO, __file__, 0,
+                                       f'Record {n:04d} ' + 'x' * 80, None, None))
+
+def test_compressing_rotating_file_handler_compresses_backups(rotating_log_path):
+    handler = CompressingRotatingFileHandler(rotating_log_path, maxBytes=1024,
+                                             backupCount=5)
+    write_records(handler, 30)
+    handler.close()
+    backups = handler.get_backups()
+    assert 0 < len(backups) <= 5
+    assert backups[0].name == 'test.log.1.gz'
+    assert b'Record' in gzip.decompress(backups[0].read_bytes())
+    assert not list(rotating_log_path.parent.glob('*.rotated'))
+
+def test_compressing_rotating_file_handler_keeps_all_records(rotating_log_path):
+    handler = CompressingRotatingFileHandler(rotating_log_path, maxBytes=1024,
+                                             backupCount=100)
+    write_records(handler, 50)
+    handler.close()
+    text = rotating_log_path.read_text()
+    for backup in handler.get_backups():
+        text += gzip.decompress(backup.read_bytes()).decode()
+    assert sorted(text.splitlines()) == [f'Record {n:04d} ' + 'x' * 80
+                                         for n in range(50)]
+
+def test_compressing_rotating_file_handler_max_total_bytes(rotating_log_path):
+    handler = CompressingRotatingFileHandler(rotating_log_path, maxBytes=1024,
+                                             backupCount=100,
+                                             max_total_bytes=200)
+    write_records(handler, 100)
+    handler.close()
+    assert sum(b.stat().st_size for b in handler.get_backups()) <= 200
+
+def test_compressing_rotating_file_handler_max_age_days(rotating_log_path):
+    handler = CompressingRotatingFileHandler(rotating_log_path, maxBytes=1024,
+                                             backupCount=100)
+    write_records(handler, 30)
+    handler.wait_for_compression()
+    for backup in handler.get_backups():
+        os.utime(backup, (0, 0))
+    handler.max_age_days = 30
+    write_records(handler, 30)
+    handler.close()
+    for backup in handler.get_backups():
+        assert backup.stat().st_mtime > 0
@@ -0,0 +1,95 @@
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from pgsurvey import (
+    ManifestEntry,
+    Report,
+    Transmission,
+    UploadManifest,
+    hash_file,
+    send_files_not_yet_delivered,
+)
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = UploadManifest(tmp_path / Path('manifest.sqlite3'))
+    yield manifest
+    manifest.close()
+
+@pytest.fixture
+def output_csv(tmp_path):
+    output_csv = tmp_path / Path('output.csv')
+    output_csv.write_bytes(b'a,b\n1,2\n')
+    return output_csv
+
+class RecordingTransmission(Transmission):
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.sent: list[Path] = []
+
+    def send(self, file: Path) -> None:
+        if self.fail:
+            raise ConnectionError
+        self.sent.append(file)
+
+def test_hash_file(output_csv):
+    assert hash_file(output_csv, chunk_size=3) == \
+        hashlib.sha256(b'a,b\n1,2\n').hexdigest()
+
+def test_report_hash_output_csv_matches_saved_csv(tmp_path):
+    report = Report(pd.DataFrame({'a': ['1', '2'], 'b': ['x', 'y']}), [], [])
+    saved_csv = tmp_path / Path('saved.csv')
+    report.save_output_csv(saved_csv)
+    assert report.hash_output_csv() == hash_file(saved_csv)
+
+def test_manifest_record(manifest, output_csv):
+    entry = manifest.record(output_csv, '654321', UploadManifest.PENDING)
+    assert isinstance(entry, ManifestEntry)
+    assert entry.size == 8
+    assert entry.client_id == '654321'
+    assert entry.status == UploadManifest.PENDING
+    assert manifest.is_delivered(entry.sha256) is False
+
+def test_manifest_delivered_is_not_downgraded(manifest, output_csv):
+    entry = manifest.record(output_csv, '654321', UploadManifest.DELIVERED)
+    entry = manifest.record(output_csv, '654321', UploadManifest.PENDING)
+    assert entry.status == UploadManifest.DELIVERED
+    assert manifest.is_delivered(entry.sha256) is True
+
+def test_manifest_persists(tmp_path, output_csv):
+    manifest_path = tmp_path / Path('manifest.sqlite3')
+    manifest = UploadManifest(manifest_path)
+    entry = manifest.record(output_csv, '654321', UploadManifest.DELIVERED)
+    manifest.close()
+    manifest = UploadManifest(manifest_path)
+    assert manifest.is_delivered(entry.sha256) is True
+    manifest.close()
+
+def test_manifest_patient_key_hashes(manifest):
+    manifest.record_patient_key_hashes('abc', ['key1', 'key2'])
+    manifest.record_patient_key_hashes('abc', ['key3'])
+    manifest.record_patient_key_hashes('def', ['key4'])
+    assert manifest.pop_patient_key_hashes('abc') == ['key3']
+    assert manifest.pop_patient_key_hashes('abc') == []
+    assert manifest.pop_patient_key_hashes('def') == ['key4']
+
+def test_send_files_not_yet_delivered_skips_duplicates(manifest, output_csv):
+    transmission = RecordingTransmission()
+    assert send_files_not_yet_delivered(transmission, [output_csv],
+                                        manifest, '654321') == []
+    assert send_files_not_yet_delivered(transmission, [output_csv],
+                                        manifest, '654321') == [output_csv]
+    assert transmission.sent == [output_csv]
+
+def test_send_files_not_yet_delivered_records_failure(manifest, output_csv,
+                                                       monkeypatch):
+    monkeypatch.setattr('pgsurvey.transmit_report.time.sleep', lambda _: None)
+    transmission = RecordingTransmission(fail=True)
+    with pytest.raises(ConnectionError):
+        send_files_not_yet_delivered(transmission, [output_csv],
+                                     manifest, '654321')
+    entry = manifest.get_entry(hash_file(output_csv))
+    assert entry.status == UploadManifest.FAILED
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from pgsurvey import Column, NpiEnrichment, NpiRegistry, Report
+
+@pytest.fixture
+def npi_registry(tmp_path):
+    source = tmp_path / Path('npi_registry.csv')
+    source.write_text('npi,name,specialty,state\n'
+                      '1245319599,JANE SMITH,Cardiology,MA\n'
+                      '1234567893,JOHN DOE,,MA\n'
+                      '1234567893,JOHN DOE JR,Oncology,MA\n')
+    return NpiRegistry.load(source)
+
+def test_npi_registry_get(npi_registry):
+    npis = pd.Series(['1234567893', '1245319599', '1000000004', None])
+    assert npi_registry.get('name', npis).tolist()[:2] == ['JOHN DOE', 'JANE SMITH']
+    assert npi_registry.get('name', npis).isna().tolist() == [False, False,
+                                                              True, True]
+    assert npi_registry.get('specialty', npis).isna().tolist() == [True, False,
+                                                                   True, True]
+
+def test_report_enrich_providers_from_npi_registry(npi_registry):
+    columns = [Column('Attending Physician NPI', old_name='NPI'),
+               Column('Attending Physician Name', old_name='Provider'),
+               Column('Provider specialty', default_value='Ophthalmology')]
+    df = pd.DataFrame({'NPI': ['1234567893', '1245319599', '1000000004'],
+                       'Provider': ['Doe, John', 'Smith, Jane', 'Roe, Pat']})
+    report = Report(df, columns, ['add_columns_with_default_values',
+                                  'enrich_providers_from_npi_registry'],
+                    npi_enrichment=NpiEnrichment('npi_registry.csv'),
+                    npi_registry=npi_registry)
+    report.run_actions()
+    assert report.df['Provider'].tolist() == ['JOHN DOE', 'JANE SMITH', 'Roe, Pat']
+    assert report.df['Provider specialty'].tolist() == ['Ophthalmology',
+                                                        'Cardiology',
+                                                        'Ophthalmology']
+
+def test_report_enrich_providers_requires_settings():
+    report = Report(pd.DataFrame(), [], ['enrich_providers_from_npi_registry'])
+    with pytest.raises(ValueError):
+        report.run_actions()
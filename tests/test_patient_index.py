@@ -0,0 +1,66 @@
+import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from pgsurvey import (
+    Column,
+    PatientDedup,
+    Report,
+    SurveyedPatientIndex,
+    read_patient_dedup_config,
+)
+
+@pytest.fixture
+def patient_index(tmp_path):
+    patient_index = SurveyedPatientIndex(tmp_path / Path('patient_index.sqlite3'))
+    yield patient_index
+    patient_index.close()
+
+def test_salt_is_persisted(tmp_path):
+    index_path = tmp_path / Path('patient_index.sqlite3')
+    patient_index = SurveyedPatientIndex(index_path)
+    salt = patient_index.salt
+    patient_index.close()
+    patient_index = SurveyedPatientIndex(index_path)
+    assert patient_index.salt == salt
+    patient_index.close()
+
+def test_hash_keys_are_salted(patient_index):
+    key_hashes = patient_index.hash_keys(pd.Series(['A1', 'A2', 'A1']))
+    assert key_hashes[0] == key_hashes[2]
+    assert key_hashes[0] != key_hashes[1]
+    assert 'A1' not in key_hashes[0]
+
+def test_is_recently_surveyed_lookback_window(patient_index):
+    today = datetime.date(2024, 3, 31)
+    key_hashes = patient_index.hash_keys(pd.Series(['A1', 'A2', 'A3']))
+    patient_index.record([key_hashes[0]], today - datetime.timedelta(days=10))
+    patient_index.record([key_hashes[1]], today - datetime.timedelta(days=100))
+    recently_surveyed = patient_index.is_recently_surveyed(key_hashes, 90, today)
+    assert recently_surveyed.tolist() == [True, False, False]
+
+def test_read_patient_dedup_config():
+    config = {'patient_dedup': {'key_columns': ['Medical Record Number'],
+                                'lookback_days': 30}}
+    patient_dedup = read_patient_dedup_config(config)
+    assert patient_dedup == PatientDedup(['Medical Record Number'], 30)
+    assert read_patient_dedup_config({}) is None
+
+def test_remove_previously_surveyed_patients(patient_index):
+    columns = [Column(name='Medical Record Number', old_name='MRN')]
+    df = pd.DataFrame({'MRN': ['A1', 'A2', '', 'A3']})
+    patient_dedup = PatientDedup(['Medical Record Number'])
+    first_run = Report(df.copy(), columns, [], patient_dedup, patient_index)
+    first_run.remove_previously_surveyed_patients()
+    first_run.df = first_run.df[first_run.df['MRN'] != 'A3']
+    patient_index.record(first_run.get_patient_key_hashes())
+    second_run = Report(df.copy(), columns, [], patient_dedup, patient_index)
+    second_run.remove_previously_surveyed_patients()
+    assert second_run.df['MRN'].tolist() == ['', 'A3']
+
+def test_remove_previously_surveyed_patients_requires_settings():
+    report = Report(pd.DataFrame({'MRN': ['A1']}), [], [])
+    with pytest.raises(ValueError):
+        report.remove_previously_surveyed_patients()
@@ -0,0 +1,79 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+import pandas as pd
+
+from benchmarks.generate_report import generate_report
+from pgsurvey import (
+    Report,
+    ReportConfig,
+    compile_report_config,
+    get_report_config,
+    parse_report_config,
+    process,
+    read_config,
+    read_row_dedup_config,
+)
+
+@pytest.fixture
+def config_serialized():
+    return json.loads(Path('config.json').read_text())
+
+@pytest.fixture
+def report_df():
+    return generate_report(50, seed=5)
+
+def test_parse_report_config_leaves_config_unchanged(config_serialized):
+    before = json.dumps(config_serialized, sort_keys=True)
+    config = parse_report_config(config_serialized)
+    assert json.dumps(config_serialized, sort_keys=True) == before
+    assert config.client_id == config_serialized['client_id']
+    assert config.actions == config_serialized['actions']
+    assert all(not isinstance(col.func, str) for col in config.columns)
+
+def test_get_report_config_is_cached(config_serialized):
+    compile_report_config.cache_clear()
+    config = get_report_config(config_serialized)
+    assert get_report_config(json.loads(json.dumps(config_serialized))) is config
+    assert get_report_config(config) is config
+    assert compile_report_config.cache_info().misses == 1
+
+def test_process_matches_report(config_serialized, report_df):
+    _, columns, actions = read_config(json.loads(json.dumps(config_serialized)))
+    report = Report(report_df.copy(), columns, actions,
+                    row_dedup=read_row_dedup_config(config_serialized))
+    report.run_actions()
+    buffer = io.BytesIO()
+    report.write_output_csv(buffer)
+    result = process(report_df, config_serialized)
+    pd.testing.assert_frame_equal(result.df, report.df)
+    assert result.csv == buffer.getvalue()
+    assert result.rows_in == len(report_df)
+    assert result.rejects == {}
+
+def test_process_leaves_input_unchanged(config_serialized, report_df):
+    before = report_df.copy()
+    process(report_df, config_serialized)
+    pd.testing.assert_frame_equal(report_df, before)
+
+def test_process_writes_no_files(config_serialized, report_df, tmp_path,
+                                 monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    process(report_df, config_serialized)
+    assert list(tmp_path.iterdir()) == []
+
+def test_process_collect_rejects(config_serialized):
+    df = generate_report(50, seed=5, invalid_rate=0.2)
+    with pytest.raises(Exception):
+        process(df, config_serialized)
+    result = process(df, config_serialized, collect_rejects=True)
+    assert sum(result.rejects.values()) > 0
+
+def test_process_filters(config_serialized, report_df):
+    config_serialized['filters'] = [{'column': 'Gender', 'type': 'equals',
+                                     'value': 'Female'}]
+    result = process(report_df, config_serialized)
+    assert sum(result.filtered.values()) > 0
+    assert isinstance(get_report_config(config_serialized), ReportConfig)
@@ -0,0 +1,77 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pgsurvey import SortedIndex, get_index_cache_path, load_cached_arrays, map_distinct
+
+@pytest.fixture
+def sorted_index():
+    return SortedIndex(np.array(['02134', '10001', '94105']),
+                       city=np.array(['Boston', 'New York', 'San Francisco']))
+
+def test_sorted_index_get(sorted_index):
+    keys = pd.Series(['94105', '00000', None, '02134', '99999'],
+                     index=[5, 4, 3, 2, 1])
+    values = sorted_index.get('city', keys)
+    assert values.index.tolist() == [5, 4, 3, 2, 1]
+    assert values.tolist()[0] == 'San Francisco'
+    assert values.tolist()[3] == 'Boston'
+    assert values.isna().tolist() == [False, True, True, False, True]
+
+def test_sorted_index_contains(sorted_index):
+    keys = pd.Series(['10001', '1000', '10001'])
+    assert sorted_index.contains(keys).tolist() == [True, False, True]
+
+def test_sorted_index_empty():
+    index = SortedIndex(np.array([], dtype=str), city=np.array([], dtype=str))
+    assert index.get('city', pd.Series(['02134'])).isna().all()
+    assert index.contains(pd.Series([], dtype=object)).empty
+
+def test_map_distinct():
+    calls = []
+    def upper(s):
+        calls.append(len(s))
+        return s.str.upper()
+    series = pd.Series(['a', 'b', 'a', None], index=[3, 2, 1, 0])
+    result = map_distinct(series, upper)
+    assert result.tolist()[:3] == ['A', 'B', 'A']
+    assert pd.isna(result.tolist()[3])
+    assert result.index.tolist() == [3, 2, 1, 0]
+    assert calls == [2]
+
+def build(source: Path) -> dict[str, np.ndarray]:
+    build.calls += 1
+    return {'key': np.array(source.read_text().split())}
+
+def test_load_cached_arrays(tmp_path):
+    build.calls = 0
+    source = tmp_path / Path('reference.txt')
+    source.write_text('b a')
+    assert load_cached_arrays(source, build)['key'].tolist() == ['b', 'a']
+    assert get_index_cache_path(source).exists()
+    assert load_cached_arrays(source, build)['key'].tolist() == ['b', 'a']
+    assert build.calls == 1
+
+def test_load_cached_arrays_rebuilds_stale_cache(tmp_path):
+    build.calls = 0
+    source = tmp_path / Path('reference.txt')
+    source.write_text('a')
+    load_cached_arrays(source, build)
+    source.write_text('c')
+    cache_mtime = get_index_cache_path(source).stat().st_mtime
+    os.utime(source, (cache_mtime + 10, cache_mtime + 10))
+    assert load_cached_arrays(source, build)['key'].tolist() == ['c']
+    assert build.calls == 2
+
+def test_load_cached_arrays_unreadable_cache(tmp_path):
+    build.calls = 0
+    source = tmp_path / Path('reference.txt')
+    source.write_text('a')
+    cache = get_index_cache_path(source)
+    cache.write_bytes(b'not an npz file')
+    os.utime(cache, (source.stat().st_mtime + 10, source.stat().st_mtime + 10))
+    assert load_cached_arrays(source, build)['key'].tolist() == ['a']
+    assert build.calls == 1
@@ -7,12 +7,22 @@ import json
 import pytest
 import pandas as pd
 
+from benchmarks.generate_report import generate_report
 from pgsurvey import (
+    Column,
     ReportPath,
     EnvVar,
     Report,
+    RowDedup,
+    RowFilter,
+    email_column,
     get_dataframe,
+    get_input_column_names,
     read_config,
+    read_row_dedup_config,
+    state_initials,
+    to_yn_from_yesno,
+    zip_code,
 )
 
 def return_none(*args, **kwargs):
@@ -102,6 +112,29 @@ def test_report_path_project_directory_output(project_directory, report_path):
 def test_report_path_file_extension(report_path):
     assert report_path.INPUT_FILE_EXT == '.xlsx'
 
+@pytest.mark.parametrize('file_name', ['test.csv', 'test.TSV'])
+def test_report_path_get_input_file_path_delimited(project_directory,
+                                                   report_path, file_name):
+    test_path = project_directory / Path(f'input/{file_name}')
+    with patch.object(pathlib.Path, 'exists', return_true):
+        assert report_path.get_input_file_path(file_name) == test_path
+
+def test_get_input_column_names():
+    columns = [Column('Client ID', default_value='12345'),
+               Column('City', old_name='Patient City'),
+               Column('First Name', source_column_name='Patient First Name'),
+               Column('Patient Language', drop_column=True)]
+    actions = ['rename_column_headers', 'sort_column_order']
+    assert get_input_column_names(columns, actions, ['MRN']) == {
+        'MRN', 'City', 'Patient City', 'First Name', 'Patient First Name',
+        'Patient Language'}
+
+@pytest.mark.parametrize('actions', [['rename_column_headers'],
+                                     ['sort_column_order',
+                                      'remove_email_if_patient_did_not_opt_in']])
+def test_get_input_column_names_all_columns_needed(actions):
+    assert get_input_column_names([Column('City')], actions) is None
+
 def test_report_path_output_path_valid(report_path, project_directory):
     today = datetime.date.today()
     client_id = '654321'
@@ -200,4 +233,260 @@ def test_drop_columns_that_are_not_needed(report_instance: Report):
     assert report_instance.drop_columns_that_are_not_needed() is None
 
 def test_report_run_actions(report_instance: Report):
-    assert report_instance.run_actions() is None
\ No newline at end of file
+    assert report_instance.run_actions() is None
+
+def test_report_path_output_path_shard(report_path, project_directory):
+    today = datetime.date.today()
+    client_id = '654321'
+    output_dir = project_directory / Path('output')
+    output_path = output_dir / Path(f'{client_id}{today.strftime('%m%d%Y')}_002.csv')
+    assert report_path.get_output_path(client_id, '.csv', shard=2) == output_path
+
+@pytest.fixture
+def shard_report():
+    df = pd.DataFrame({'a': [str(n) for n in range(10)], 'b': ['xyz'] * 10})
+    return Report(df, [], [])
+
+def test_get_shards_no_limits(shard_report: Report):
+    assert shard_report.get_shards() == [shard_report]
+
+def test_get_shards_max_rows(shard_report: Report):
+    shards = shard_report.get_shards(max_rows=4)
+    assert [len(s.df) for s in shards] == [4, 4, 2]
+    assert pd.concat([s.df for s in shards]).equals(shard_report.df)
+
+def test_get_shards_max_bytes(shard_report: Report, temp_dir):
+    # Each row is written as "0,xyz\n" (6 bytes) and the header "a,b\n" (4 bytes)
+    shards = shard_report.get_shards(max_bytes=4 + 6 * 3)
+    assert [len(s.df) for s in shards] == [3, 3, 3, 1]
+    shard_csv = temp_dir / Path('shard.csv')
+    shards[0].save_output_csv(shard_csv)
+    assert len(shard_csv.read_bytes().replace(b'\r\n', b'\n')) == 4 + 6 * 3
+    shard_csv.unlink()
+
+def test_get_shards_max_bytes_row_larger_than_limit(shard_report: Report):
+    shards = shard_report.get_shards(max_bytes=1)
+    assert len(shards) == 10
+
+def test_get_shards_max_rows_and_bytes(shard_report: Report):
+    shards = shard_report.get_shards(max_rows=2, max_bytes=4 + 6 * 3)
+    assert [len(s.df) for s in shards] == [2, 2, 2, 2, 2]
+
+def test_get_shards_patient_key_hashes(shard_report: Report):
+    shard_report.patient_key_hashes = pd.Series([f'hash{n}' for n in range(10)])
+    shards = shard_report.get_shards(max_rows=4)
+    assert shards[2].get_patient_key_hashes() == ['hash8', 'hash9']
+
+@pytest.fixture
+def dedup_columns():
+    return [Column(name='Medical Record Number', old_name='MRN'),
+            Column(name='Visit or Admit Date', old_name='Last Visit Date')]
+
+def test_remove_duplicate_rows_keeps_latest(dedup_columns):
+    df = pd.DataFrame({
+        'MRN': ['A1', 'A2', 'A1', 'A1', '', ''],
+        'Last Visit Date': ['2024-01-05', '2024-01-01', '2024-02-01',
+                            '01/10/2024', '2024-01-01', '2024-01-01'],
+    })
+    report = Report(df, dedup_columns, [],
+                    row_dedup=RowDedup(['Medical Record Number'],
+                                       'Visit or Admit Date'))
+    report.remove_duplicate_rows()
+    assert report.df.index.tolist() == [1, 2, 4, 5]
+
+def test_remove_duplicate_rows_transformed_dates(dedup_columns):
+    df = pd.DataFrame({
+        'Medical Record Number': ['A1', 'A1'],
+        'Visit or Admit Date': ['02012024', '01052024'],
+    })
+    report = Report(df, dedup_columns, [],
+                    row_dedup=RowDedup(['Medical Record Number'],
+                                       'Visit or Admit Date'))
+    report.remove_duplicate_rows()
+    assert report.df['Visit or Admit Date'].tolist() == ['02012024']
+
+def test_remove_duplicate_rows_without_latest_column(dedup_columns):
+    df = pd.DataFrame({'MRN': ['A1', 'A1', 'A2']})
+    report = Report(df, dedup_columns, ['remove_duplicate_rows'],
+                    row_dedup=RowDedup(['Medical Record Number']))
+    report.run_actions()
+    assert report.df.index.tolist() == [1, 2]
+
+def test_remove_duplicate_rows_requires_settings():
+    report = Report(pd.DataFrame({'MRN': ['A1']}), [], [])
+    with pytest.raises(ValueError):
+        report.remove_duplicate_rows()
+
+def test_get_current_column_name_missing(dedup_columns):
+    report = Report(pd.DataFrame({'MRN': ['A1']}), dedup_columns, [])
+    with pytest.raises(KeyError):
+        report.get_current_column_name('Visit or Admit Date')
+
+@pytest.fixture
+def reject_columns():
+    return [Column(name='ZIP Code', func=zip_code),
+            Column(name='State', func=state_initials)]
+
+def test_run_functions_on_columns_collect_rejects(reject_columns):
+    df = pd.DataFrame({'ZIP Code': ['2134', '', '123456'],
+                       'State': ['ma', 'MA', 'Mass']})
+    report = Report(df, reject_columns, ['run_functions_on_columns'],
+                    collect_rejects=True)
+    report.run_actions()
+    assert report.rejects == {'ZIP Code': 2, 'State': 1}
+    assert report.df['ZIP Code'].tolist() == ['02134', '', '123456']
+    assert report.df['State'].tolist() == ['MA', 'MA', 'Mass']
+
+def test_run_functions_on_columns_rejects_raise(reject_columns):
+    df = pd.DataFrame({'ZIP Code': [''], 'State': ['MA']})
+    report = Report(df, reject_columns, ['run_functions_on_columns'])
+    with pytest.raises(ValueError):
+        report.run_actions()
+
+def test_get_column_summary(reject_columns):
+    df = pd.DataFrame({'ZIP Code': ['2134', ''], 'State': ['MA', 'RI']})
+    report = Report(df, reject_columns, ['run_functions_on_columns'],
+                    collect_rejects=True)
+    report.run_actions()
+    summary = report.get_column_summary(rows=1)
+    assert summary.loc['ZIP Code', 'Rejects'] == 1
+    assert summary.loc['State', 'Rejects'] == 0
+    assert summary.loc['ZIP Code', 'Preview'] == '02134'
+    assert summary.loc['State', 'Preview'] == 'MA'
+
+@pytest.fixture
+def parallel_report_args():
+    config_serialized = json.loads(Path('config.json').read_text())
+    _, columns, actions = read_config(config_serialized)
+    df = generate_report(300, seed=3, invalid_rate=0.05)
+    return df, columns, actions, read_row_dedup_config(config_serialized)
+
+def test_run_actions_parallel_matches_serial(monkeypatch, parallel_report_args):
+    df, columns, actions, row_dedup = parallel_report_args
+    serial = Report(df.copy(), columns, actions, row_dedup=row_dedup,
+                    collect_rejects=True)
+    serial.run_actions()
+    monkeypatch.setattr(Report, 'PARALLEL_MIN_SHARD_ROWS', 50)
+    monkeypatch.setattr(Report, 'PARALLEL_MIN_ROWS', 0)
+    parallel = Report(df.copy(), columns, actions, row_dedup=row_dedup,
+                      collect_rejects=True)
+    parallel.run_actions(workers=3)
+    assert parallel.df.equals(serial.df)
+    assert parallel.rejects == serial.rejects
+    assert any(metric.name.endswith('on 3 shards')
+               for metric in parallel.action_metrics)
+
+def test_run_actions_small_report_runs_serially(monkeypatch, parallel_report_args):
+    df, columns, actions, row_dedup = parallel_report_args
+    monkeypatch.setattr(Report, 'PARALLEL_MIN_SHARD_ROWS', 50)
+    report = Report(df, columns, actions, row_dedup=row_dedup,
+                    collect_rejects=True)
+    report.run_actions(workers=3)
+    assert not any(metric.name.endswith('shards')
+                   for metric in report.action_metrics)
+
+def test_get_shard_count():
+    report = Report(pd.DataFrame({'a': range(25000)}), [], [])
+    assert report.get_shard_count(8) == 2
+    assert report.get_shard_count(1) == 1
+    assert Report(pd.DataFrame({'a': []}), [], []).get_shard_count(4) == 1
+
+@pytest.fixture
+def email_columns():
+    return [Column(name='Email', old_name='Patient Email Address',
+                   func=email_column),
+            Column(name='Use Email?',
+                   old_name='Patient Opt-In Email Notifications?',
+                   func=to_yn_from_yesno)]
+
+def test_remove_email_if_patient_did_not_opt_in_raw_values(email_columns):
+    df = pd.DataFrame({
+        'Patient Email Address': ['a@example.com', 'b@example.com',
+                                  'c@example.com', 'd@example.com'],
+        'Patient Opt-In Email Notifications?': ['Yes', ' no ', '', 'Y'],
+    })
+    report = Report(df, email_columns, ['remove_email_if_patient_did_not_opt_in'])
+    report.run_actions()
+    assert report.df['Patient Email Address'].tolist() == ['a@example.com', '',
+                                                           '', 'd@example.com']
+
+def test_remove_email_if_patient_opt_in_missing(email_columns):
+    df = pd.DataFrame({
+        'Patient Email Address': ['a@example.com', 'b@example.com',
+                                  'c@example.com', 'd@example.com'],
+        'Patient Opt-In Email Notifications?': [None, 'nan', ' ', 'yes'],
+    })
+    report = Report(df, email_columns, ['remove_email_if_patient_did_not_opt_in'])
+    report.run_actions()
+    assert report.df['Patient Email Address'].tolist() == ['', '', '',
+                                                           'd@example.com']
+
+def test_opted_out_emails_are_not_validated(email_columns):
+    df = pd.DataFrame({
+        'Patient Email Address': ['a@example.com', 'not an email'],
+        'Patient Opt-In Email Notifications?': ['yes', 'no'],
+    })
+    report = Report(df, email_columns,
+                    ['remove_email_if_patient_did_not_opt_in',
+                     'rename_column_headers', 'run_functions_on_columns'])
+    report.run_actions()
+    assert report.df['Email'].tolist() == ['a@example.com', '']
+    assert report.df['Use Email?'].tolist() == ['y', 'n']
+
+def test_vectorized_column_function_collect_rejects(email_columns):
+    df = pd.DataFrame({'Email': ['a@example.com', 'not an email', ''],
+                       'Use Email?': ['y', 'y', 'n']})
+    report = Report(df, email_columns, ['run_functions_on_columns'],
+                    collect_rejects=True)
+    report.run_actions()
+    assert report.rejects == {'Email': 1}
+    assert report.df['Email'].tolist() == ['a@example.com', 'not an email', '']
+
+TODAY = datetime.date(2024, 6, 15)
+
+@pytest.mark.parametrize('row_filter, values, expected', [
+    (RowFilter('d', 'date_range', start='2024-06-01', end='2024-06-30'),
+     ['2024-06-01', '06/30/2024', '05312024', 'bad', None],
+     [True, True, False, False, False]),
+    (RowFilter('d', 'date_range', days=10),
+     ['2024-06-05', '2024-06-04'], [True, False]),
+    (RowFilter('d', 'age', min_age=18),
+     ['2006-06-15', '2006-06-16', '1950-01-01', ''], [True, False, True, False]),
+    (RowFilter('d', 'age', max_age=64), ['1959-06-15', '1959-06-16'],
+     [False, True]),
+    (RowFilter('d', 'equals', value='Y', exclude=True), ['y', ' Y ', 'N', None],
+     [False, False, True, True]),
+    (RowFilter('d', 'in', values=['Main', 'North']), ['main', 'South'],
+     [True, False]),
+    (RowFilter('d', 'not_empty'), ['a', ' ', 'nan', None], [True, False, False,
+                                                          False]),
+])
+def test_row_filter_get_mask(row_filter, values, expected):
+    mask = row_filter.get_mask(pd.Series(values, dtype=object), TODAY)
+    assert mask.tolist() == expected
+
+def test_row_filter_equals_without_value():
+    with pytest.raises(ValueError):
+        RowFilter('d', 'equals').get_mask(pd.Series(['a']), TODAY)
+
+def test_apply_filters_counts_first_failed_filter(dedup_columns):
+    df = pd.DataFrame({'MRN': ['A1', '', 'A3', ''],
+                       'Last Visit Date': ['2024-06-01', '2023-01-01',
+                                           '2023-01-01', '2024-06-02']})
+    filters = [RowFilter('Medical Record Number', 'not_empty',
+                         reason='missing MRN'),
+               RowFilter('Visit or Admit Date', 'date_range', days=30)]
+    report = Report(df, dedup_columns, [], filters=filters)
+    report.apply_filters(TODAY)
+    assert report.df.index.tolist() == [0]
+    assert report.filtered == {'missing MRN': 2,
+                               'date_range on "Visit or Admit Date"': 1}
+
+def test_run_actions_applies_filters_first(reject_columns):
+    df = pd.DataFrame({'ZIP Code': ['2134', 'bad'], 'State': ['MA', 'RI']})
+    report = Report(df, reject_columns, ['run_functions_on_columns'],
+                    filters=[RowFilter('ZIP Code', 'equals', value='bad',
+                                       exclude=True)])
+    report.run_actions()
+    assert report.df['ZIP Code'].tolist() == ['02134']
+    assert report.action_metrics[0].name == 'apply_filters'
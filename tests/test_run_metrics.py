@@ -0,0 +1,84 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from pgsurvey import (
+    RunMetrics,
+    percentile,
+    read_run_metrics,
+    summarize_run_counts,
+    summarize_run_metrics,
+)
+from pgsurvey.__main__ import main as pgsurvey_main
+
+@pytest.fixture
+def metrics_path(tmp_path):
+    return tmp_path / Path('logs/run_metrics.jsonl')
+
+def write_run(metrics_path: Path, read_seconds: float) -> RunMetrics:
+    metrics = RunMetrics(metrics_path)
+    metrics.stages['read'] = read_seconds
+    metrics.set(rows_in=10, rows_out=8, rows_dropped=2, rejects=0)
+    metrics.write()
+    return metrics
+
+def test_run_metrics_stage():
+    metrics = RunMetrics()
+    with metrics.stage('read'):
+        pass
+    with metrics.stage('read'):
+        pass
+    assert list(metrics.stages) == ['read']
+    assert metrics.stages['read'] >= 0
+
+def test_run_metrics_stage_records_failed_stage():
+    metrics = RunMetrics()
+    with pytest.raises(ValueError):
+        with metrics.stage('transform'):
+            raise ValueError
+    assert 'transform' in metrics.stages
+
+def test_run_metrics_write_json_lines(metrics_path):
+    metrics = write_run(metrics_path, 1.5)
+    records = [json.loads(line) for line in metrics_path.read_text().splitlines()]
+    assert [r['type'] for r in records] == ['stage', 'run']
+    assert records[0] == {'type': 'stage', 'run_id': metrics.run_id,
+                          'timestamp': metrics.started_at.isoformat(),
+                          'stage': 'read', 'seconds': 1.5}
+    assert records[1]['rows_in'] == 10
+    assert records[1]['rows_dropped'] == 2
+    assert records[1]['rejects'] == 0
+    assert records[1]['status'] == 'success'
+
+def test_read_run_metrics_missing_file(metrics_path):
+    assert read_run_metrics(metrics_path) == []
+
+@pytest.mark.parametrize('values, percent, expected', [
+    ([1.0], 50, 1.0),
+    ([3.0, 1.0, 2.0, 4.0], 50, 2.0),
+    ([float(n) for n in range(1, 101)], 95, 95.0),
+])
+def test_percentile(values, percent, expected):
+    assert percentile(values, percent) == expected
+
+def test_summarize_run_metrics_last_runs(metrics_path):
+    for read_seconds in (100.0, 1.0, 2.0, 3.0):
+        write_run(metrics_path, read_seconds)
+    summary = summarize_run_metrics(metrics_path, last=3)
+    assert summary['read'] == {'runs': 3, 'p50': 2.0, 'p95': 3.0}
+    assert summary['total']['runs'] == 3
+
+def test_summarize_run_counts(metrics_path):
+    write_run(metrics_path, 1.0)
+    RunMetrics(metrics_path).write()
+    summary = summarize_run_counts(metrics_path)
+    assert summary['rows_dropped'] == {'runs': 1, 'p50': 2, 'p95': 2}
+    assert summary['rejects']['p50'] == 0
+
+def test_pgsurvey_stats_command(metrics_path, capsys):
+    write_run(metrics_path, 1.0)
+    pgsurvey_main(['stats', '--metrics', str(metrics_path), '-n', '5'])
+    out = capsys.readouterr().out
+    assert 'read' in out
+    assert 'rows_dropped' in out
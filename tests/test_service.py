@@ -0,0 +1,133 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+from pathlib import Path
+import shutil
+
+import pytest
+
+from benchmarks.generate_report import generate_report
+from benchmarks.load_test import request, run_job
+from pgsurvey import HttpError, Job, SubmissionService, Transmission, process
+
+class RecordingTransmission(Transmission):
+    def __init__(self) -> None:
+        self.sent: list[Path] = []
+
+    def send(self, file: Path) -> None:
+        self.sent.append(file)
+
+@pytest.fixture
+def config_directory(tmp_path):
+    config_directory = tmp_path / Path('configs')
+    config_directory.mkdir()
+    shutil.copy('config.json', config_directory / Path('clinic.json'))
+    return config_directory
+
+def run_with_service(config_directory: Path, project_directory: Path,
+                     client, **kwargs):
+    """Run a client coroutine against a service on an unused local port."""
+    async def run():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            service = SubmissionService(executor, 2, config_directory,
+                                        project_directory, **kwargs)
+            await service.warm_up()
+            server = await asyncio.start_server(service.handle_connection,
+                                                '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return await client(port)
+    return asyncio.run(run())
+
+def test_submit_report(config_directory, tmp_path):
+    df = generate_report(100, seed=2)
+    body = df.to_csv(index=False).encode()
+    async def client(port):
+        return await run_job('127.0.0.1', port, '/jobs?config=clinic', body, 0.01)
+    _, job = run_with_service(config_directory, tmp_path, client)
+    assert job['status'] == 'done', job['error']
+    assert job['rows_in'] == 100
+    output_file = Path(job['output_file'])
+    assert output_file.parent == tmp_path / Path('output')
+    assert job['id'] in output_file.name
+    config = json.loads(Path('config.json').read_text())
+    assert output_file.read_bytes() == process(df, config).csv
+    assert job['rows_out'] == len(process(df, config).df)
+
+def test_submit_report_dry_run(config_directory, tmp_path):
+    body = generate_report(100, seed=2, invalid_rate=0.2).to_csv(index=False).encode()
+    async def client(port):
+        _, failed = await run_job('127.0.0.1', port, '/jobs?config=clinic',
+                                  body, 0.01)
+        _, dry_run = await run_job('127.0.0.1', port,
+                                   '/jobs?config=clinic&dry_run=1', body, 0.01)
+        return failed, dry_run
+    failed, dry_run = run_with_service(config_directory, tmp_path, client)
+    assert failed['status'] == 'failed'
+    assert failed['error']
+    assert dry_run['status'] == 'done'
+    assert sum(dry_run['rejects'].values()) > 0
+    assert dry_run['output_file'] is None
+
+@pytest.mark.parametrize('method, path, body, status', [
+    ('POST', '/jobs?config=../clinic', b'a', 400),
+    ('POST', '/jobs', b'a', 400),
+    ('POST', '/jobs?config=missing', b'a', 404),
+    ('POST', '/jobs?config=clinic', b'', 400),
+    ('GET', '/jobs/missing', b'', 404),
+    ('DELETE', '/jobs', b'', 405),
+    ('GET', '/missing', b'', 404),
+    ('GET', '/health', b'', 200),
+])
+def test_request_errors(config_directory, tmp_path, method, path, body, status):
+    async def client(port):
+        return await request('127.0.0.1', port, method, path, body)
+    response_status, _ = run_with_service(config_directory, tmp_path, client)
+    assert response_status == status
+
+def test_submit_refused_when_queue_is_full(config_directory, tmp_path):
+    body = generate_report(10).to_csv(index=False).encode()
+    async def submit_twice():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            service = SubmissionService(executor, 1, config_directory,
+                                        tmp_path, max_queued=1)
+            service.submit({'config': ['clinic']}, body)
+            with pytest.raises(HttpError) as e:
+                service.submit({'config': ['clinic']}, body)
+            await asyncio.gather(*service.tasks)
+            return e.value.status
+    assert asyncio.run(submit_twice()) == 503
+
+def test_patient_dedup_across_submissions(tmp_path):
+    config_directory = tmp_path / Path('configs')
+    config_directory.mkdir()
+    config = json.loads(Path('config.json').read_text())
+    config['actions'].insert(0, 'remove_previously_surveyed_patients')
+    config['patient_dedup'] = {'key_columns': ['Medical Record Number']}
+    (config_directory / Path('clinic.json')).write_text(json.dumps(config))
+    transmission = RecordingTransmission()
+    body = generate_report(50, seed=2).to_csv(index=False).encode()
+    async def client(port):
+        _, first_job = await run_job('127.0.0.1', port, '/jobs?config=clinic',
+                                     body, 0.01)
+        _, second_job = await run_job('127.0.0.1', port, '/jobs?config=clinic',
+                                      body, 0.01)
+        return first_job, second_job
+    first_job, second_job = run_with_service(config_directory, tmp_path, client,
+                                             transmission=transmission)
+    assert first_job['status'] == 'done', first_job['error']
+    assert first_job['transmitted']
+    assert second_job['status'] == 'done', second_job['error']
+    assert first_job['rows_out'] > 0
+    assert second_job['rows_out'] == 0
+
+def test_finished_jobs_are_evicted(config_directory, tmp_path):
+    service = SubmissionService(None, 1, config_directory, tmp_path,
+                                max_finished_jobs=2)
+    jobs = [Job('clinic', False) for _ in range(4)]
+    for job in jobs:
+        service.jobs[job.id] = job
+    jobs[0].status = jobs[1].status = jobs[3].status = 'done'
+    service.evict_finished_jobs()
+    assert list(service.jobs) == [jobs[1].id, jobs[2].id, jobs[3].id]
+
@@ -1,8 +1,20 @@
-from unittest.mock import patch
+import io
+from pathlib import Path
+import time
+from unittest.mock import MagicMock, PropertyMock, patch
 
+import pandas as pd
 import pytest
 
-from pgsurvey import Transmission, TransmitOption, create_transmission_from_factory, get_transmit_option_from_cli_args
+from pgsurvey import (
+    Report,
+    SftpTransmission,
+    TeeWriter,
+    Transmission,
+    TransmitOption,
+    create_transmission_from_factory,
+    get_transmit_option_from_cli_args,
+)
 
 
 @patch('pgsurvey.transmit_report.get_connection_options', return_value={
@@ -30,4 +42,147 @@ def test_get_transmit_option_from_cli_args_sftp_transmit():
 
 def test_get_transmit_option_from_cli_args_user_input():
     assert get_transmit_option_from_cli_args(no_transmit=False,
-                                    sftp_transmit=False) == TransmitOption.USER_INPUT
\ No newline at end of file
+                                    sftp_transmit=False) == TransmitOption.USER_INPUT
+
+def test_tee_writer_writes_to_all_streams():
+    first, second = io.BytesIO(), io.BytesIO()
+    tee = TeeWriter(first, second)
+    assert tee.write(b'abc') == 3
+    assert first.getvalue() == second.getvalue() == b'abc'
+
+def test_tee_writer_report_csv_matches_saved_csv(tmp_path):
+    report = Report(pd.DataFrame({'a': ['1', '2'], 'b': ['x', 'y']}), [], [])
+    saved_csv = tmp_path / Path('saved.csv')
+    report.save_output_csv(saved_csv)
+    first, second = io.BytesIO(), io.BytesIO()
+    report.write_output_csv(TeeWriter(first, second))
+    assert first.getvalue() == second.getvalue() == saved_csv.read_bytes()
+
+def test_transmission_send_report_saves_then_sends(tmp_path):
+    class RecordingTransmission(Transmission):
+        def __init__(self) -> None:
+            self.sent: list[Path] = []
+
+        def send(self, file: Path) -> None:
+            self.sent.append(file)
+
+    transmission = RecordingTransmission()
+    report = Report(pd.DataFrame({'a': ['1']}), [], [])
+    output_csv = tmp_path / Path('output.csv')
+    transmission.send_report(report, output_csv)
+    assert transmission.sent == [output_csv]
+    assert output_csv.read_text() == 'a\n1\n'
+
+class FlakyTransmission(Transmission):
+    def __init__(self, failures: dict[str, int]) -> None:
+        self.failures = failures
+        self.sent: list[Path] = []
+
+    def send(self, file: Path) -> None:
+        if self.failures.get(file.name, 0) > 0:
+            self.failures[file.name] -= 1
+            raise ConnectionError(file.name)
+        self.sent.append(file)
+
+def test_transmission_send_many_retries_only_failed_files():
+    files = [Path(f'shard_{n}.csv') for n in range(5)]
+    transmission = FlakyTransmission({'shard_3.csv': 2})
+    transmission.send_many(files, max_workers=2, retry_delay=0)
+    assert sorted(transmission.sent) == files
+    assert transmission.sent.count(Path('shard_3.csv')) == 1
+
+def test_transmission_send_many_raises_after_attempts():
+    files = [Path('shard_1.csv'), Path('shard_2.csv')]
+    transmission = FlakyTransmission({'shard_2.csv': 5})
+    with pytest.raises(ConnectionError):
+        transmission.send_many(files, attempts=2, retry_delay=0)
+    assert transmission.sent == [Path('shard_1.csv')]
+
+def test_transmission_send_many_backs_off_between_attempts(monkeypatch):
+    delays = []
+    monkeypatch.setattr('pgsurvey.transmit_report.time.sleep', delays.append)
+    transmission = FlakyTransmission({'shard_1.csv': 2})
+    transmission.send_many([Path('shard_1.csv')], retry_delay=0.5)
+    assert delays == [0.5, 1.0]
+
+@pytest.fixture
+def sftp_transmission(monkeypatch):
+    connections = []
+    def mock_connect(self):
+        connections.append(MagicMock())
+        return connections[-1]
+    monkeypatch.setattr(SftpTransmission, 'connect', mock_connect)
+    transmission = SftpTransmission('sftp.example.com', 'test', 'test')
+    return transmission, connections
+
+def test_sftp_transmission_uses_background_connection_once(sftp_transmission):
+    transmission, connections = sftp_transmission
+    transmission.connect_in_background()
+    assert transmission.take_connection() is connections[0]
+    assert transmission.take_connection() is connections[1]
+    transmission.close()
+    connections[0].close.assert_not_called()
+
+def test_sftp_transmission_replaces_dropped_background_connection(sftp_transmission):
+    transmission, connections = sftp_transmission
+    transmission.connect_in_background()
+    for _ in range(100):
+        if connections:
+            break
+        time.sleep(0.01)
+    type(connections[0]).pwd = PropertyMock(side_effect=EOFError)
+    assert transmission.take_connection() is connections[1]
+    connections[0].close.assert_called_once()
+
+def test_sftp_transmission_close_unused_background_connection(sftp_transmission):
+    transmission, connections = sftp_transmission
+    transmission.connect_in_background()
+    transmission.close()
+    assert transmission.background_connection is None
+    for _ in range(100):
+        if connections and connections[0].close.called:
+            break
+        time.sleep(0.01)
+    connections[0].close.assert_called_once()
+
+def test_sftp_transmission_send_many_reuses_connections(sftp_transmission):
+    transmission, connections = sftp_transmission
+    files = [Path(f'shard_{n}.csv') for n in range(5)]
+    transmission.send_many(files, max_workers=2)
+    assert len(connections) == 2
+    uploaded = [call.args[0] for connection in connections
+                for call in connection.__enter__.return_value.put.call_args_list]
+    assert sorted(uploaded) == [str(file) for file in files]
+
+def test_sftp_transmission_send_report_renames_complete_file(sftp_transmission,
+                                                            tmp_path):
+    transmission, connections = sftp_transmission
+    report = Report(pd.DataFrame({'a': ['1', '2']}), [], [])
+    output_csv = tmp_path / Path('output.csv')
+    transmission.send_report(report, output_csv)
+    sftp = connections[0].__enter__.return_value
+    sftp.open.assert_called_once_with('output.csv.part', 'wb')
+    sftp.rename.assert_called_once_with('output.csv.part', 'output.csv')
+    sftp.remove.assert_called_once_with('output.csv')
+    assert output_csv.read_text() == 'a\n1\n2\n'
+
+def test_sftp_transmission_send_report_removes_partial_file(sftp_transmission,
+                                                            tmp_path):
+    transmission, connections = sftp_transmission
+    report = Report(pd.DataFrame({'a': ['1', 'Ren\u00e9e']}), [], [])
+    with pytest.raises(UnicodeEncodeError):
+        transmission.send_report(report, tmp_path / Path('output.csv'))
+    sftp = connections[0].__enter__.return_value
+    sftp.rename.assert_not_called()
+    sftp.remove.assert_called_once_with('output.csv.part')
+
+def test_sftp_transmission_background_connection_failure(sftp_transmission,
+                                                         monkeypatch):
+    transmission, connections = sftp_transmission
+    connect = SftpTransmission.connect
+    def fail_once(self):
+        monkeypatch.setattr(SftpTransmission, 'connect', connect)
+        raise ConnectionError
+    monkeypatch.setattr(SftpTransmission, 'connect', fail_once)
+    transmission.connect_in_background()
+    assert transmission.take_connection() is connections[0]
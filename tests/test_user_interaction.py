@@ -1,3 +1,4 @@
+import os
 import pytest
 from pathlib import Path
 from unittest.mock import patch, MagicMock
@@ -10,9 +11,20 @@ from pgsurvey import (
     input_environment_variable,
     input_to_transmit_to_press_ganey,
     get_dataframe,
+    get_dataframe_from_bytes,
+    get_dataframes,
+    get_input_files,
+    merge_dataframes,
+    get_delimiter,
     UserInputException,
     TransmitOption,
-    get_dataframe_from_user_input
+    get_input_file_and_dataframe,
+    get_input_file_and_dataframe_from_user_input,
+    get_dataframe_from_user_input,
+    get_dataframe_from_sheets,
+    get_recent_input_files,
+    ReportPrefetch,
+    SHEET_NAME_COLUMN,
 )
 
 @pytest.fixture
@@ -101,7 +113,8 @@ def test_get_dataframe_valid():
     assert isinstance(df, pd.DataFrame)
 
 def test_get_dataframe_user_input_exception():
-    with patch.object(pd, 'read_excel', MagicMock(side_effect=PermissionError())):
+    with patch('pgsurvey.user_interaction.read_xlsx',
+               MagicMock(side_effect=PermissionError())):
         with pytest.raises(UserInputException):
             assert get_dataframe(Path('missing.xlsx'))
 
@@ -117,3 +130,210 @@ def test_get_dataframe_from_user_input_value_error(mock_input, mock_report_path)
 def test_get_dataframe_from_user_input_valid(mock_input, temp_xlsx):
     assert isinstance(get_dataframe_from_user_input(Path('temp')),
                           pd.DataFrame)
+
+@pytest.fixture
+def report_df():
+    return pd.DataFrame({'MRN': ['00123', '00456'],
+                         'Patient City': ['Boston', 'Salem'],
+                         'Unused': ['x', 'y']})
+
+@pytest.mark.parametrize('file_name, delimiter', [('report.csv', ','),
+                                                  ('report.tsv', '\t'),
+                                                  ('report.txt', '\t'),
+                                                  ('report', ',')])
+def test_get_delimiter(tmp_path, report_df, file_name, delimiter):
+    input_file = tmp_path / Path(file_name)
+    report_df.to_csv(input_file, sep=delimiter, index=False)
+    assert get_delimiter(input_file) == delimiter
+
+def test_get_delimiter_xlsx_contents(tmp_path, report_df):
+    input_file = tmp_path / Path('report.dat')
+    report_df.to_excel(input_file, index=False, engine='openpyxl')
+    assert get_delimiter(input_file) is None
+
+def test_get_dataframe_csv(tmp_path, report_df):
+    input_file = tmp_path / Path('report.csv')
+    report_df.to_csv(input_file, index=False, encoding='utf-8-sig')
+    df = get_dataframe(input_file)
+    assert df.equals(report_df)
+
+def test_get_dataframe_csv_usecols(tmp_path, report_df):
+    input_file = tmp_path / Path('report.tsv')
+    report_df.to_csv(input_file, sep='\t', index=False)
+    df = get_dataframe(input_file, usecols={'MRN', 'Patient City', 'Missing'})
+    assert list(df.columns) == ['MRN', 'Patient City']
+    assert df['MRN'].tolist() == ['00123', '00456']
+
+def test_get_dataframe_csv_parser_error(tmp_path):
+    input_file = tmp_path / Path('report.csv')
+    input_file.write_text('a,b\n1,2\n1,2,3,4\n')
+    with pytest.raises(UserInputException):
+        get_dataframe(input_file)
+
+@pytest.mark.parametrize('delimiter', [',', '\t'])
+def test_get_dataframe_from_bytes_csv(report_df, delimiter):
+    data = report_df.to_csv(sep=delimiter, index=False).encode('utf-8-sig')
+    df = get_dataframe_from_bytes(data, usecols={'MRN', 'Patient City'})
+    assert list(df.columns) == ['MRN', 'Patient City']
+    assert df['MRN'].tolist() == ['00123', '00456']
+
+def test_get_dataframe_from_bytes_xlsx(tmp_path, report_df):
+    input_file = tmp_path / Path('report.xlsx')
+    report_df.to_excel(input_file, index=False, engine='openpyxl')
+    df = get_dataframe_from_bytes(input_file.read_bytes())
+    assert df.equals(get_dataframe(input_file))
+
+@pytest.mark.parametrize('data', [b'PK\x03\x04not a workbook', b'a,b\n1,2\n1,2,3,4\n'])
+def test_get_dataframe_from_bytes_invalid(data):
+    with pytest.raises(UserInputException):
+        get_dataframe_from_bytes(data)
+
+def test_get_input_files(tmp_path):
+    for name in ('part_2.csv', 'part_1.csv', 'other.csv'):
+        (tmp_path / Path(name)).write_text('a\n1\n')
+    input_files = get_input_files(tmp_path, [Path('other.csv'), Path('part_*.csv'),
+                                             Path('part_1.csv')])
+    assert [f.name for f in input_files] == ['other.csv', 'part_1.csv',
+                                             'part_2.csv']
+
+def test_get_input_files_no_match(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        get_input_files(tmp_path, [Path('part_*.csv')])
+
+@pytest.mark.parametrize('max_workers', [None, 1, 2])
+def test_get_dataframes(tmp_path, report_df, max_workers):
+    input_files = [tmp_path / Path('part_1.csv'), tmp_path / Path('part_2.tsv')]
+    report_df.iloc[:1].to_csv(input_files[0], index=False)
+    report_df.iloc[1:].to_csv(input_files[1], sep='\t', index=False)
+    dfs = get_dataframes(input_files, usecols={'MRN'}, max_workers=max_workers)
+    assert [df['MRN'].tolist() for df in dfs] == [['00123'], ['00456']]
+
+def test_merge_dataframes(report_df):
+    parts = [report_df, report_df[['Unused', 'MRN', 'Patient City']].iloc[::-1]]
+    df = merge_dataframes(parts, [Path('a.csv'), Path('b.csv')])
+    assert list(df.columns) == list(report_df.columns)
+    assert df['MRN'].tolist() == ['00123', '00456', '00456', '00123']
+    assert df.index.tolist() == [0, 1, 2, 3]
+
+def test_merge_dataframes_drop_duplicate_rows(report_df):
+    first = pd.concat([report_df, report_df.iloc[:1]])
+    second = pd.concat([report_df.iloc[:1], report_df.iloc[:1],
+                        pd.DataFrame({'MRN': ['00789'], 'Patient City': ['Lynn'],
+                                      'Unused': ['z']})])
+    df = merge_dataframes([first, second], [Path('a.csv'), Path('b.csv')],
+                          drop_duplicate_rows=True)
+    assert df['MRN'].tolist() == ['00123', '00456', '00123', '00789']
+
+def test_merge_dataframes_columns_mismatch(report_df):
+    with pytest.raises(ValueError, match='Missing: "Unused".  Extra: "Other"'):
+        merge_dataframes([report_df, report_df.rename(columns={'Unused': 'Other'})],
+                         [Path('a.csv'), Path('b.csv')])
+
+@pytest.fixture
+def sites_xlsx(tmp_path, report_df):
+    input_file = tmp_path / Path('sites.xlsx')
+    with pd.ExcelWriter(input_file) as writer:
+        report_df.to_excel(writer, sheet_name='North', index=False)
+        report_df[['Unused', 'MRN', 'Patient City']].iloc[::-1] \
+            .to_excel(writer, sheet_name='South', index=False)
+        report_df.iloc[:1].to_excel(writer, sheet_name='East', index=False)
+    return input_file
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_get_dataframe_from_sheets(sites_xlsx, max_workers):
+    df = get_dataframe_from_sheets(sites_xlsx, usecols={'MRN'},
+                                   max_workers=max_workers)
+    assert list(df.columns) == ['MRN', SHEET_NAME_COLUMN]
+    assert df['MRN'].tolist() == ['00123', '00456', '00456', '00123', '00123']
+    assert df[SHEET_NAME_COLUMN].tolist() == ['North', 'North', 'South',
+                                              'South', 'East']
+
+def test_get_dataframe_from_sheets_subset(sites_xlsx):
+    df = get_dataframe(sites_xlsx, nrows=2, sheets=['East', 'South'])
+    assert df['MRN'].tolist() == ['00123', '00456']
+    assert df[SHEET_NAME_COLUMN].tolist() == ['East', 'South']
+    assert SHEET_NAME_COLUMN not in get_dataframe(sites_xlsx).columns
+
+def test_get_dataframe_from_sheets_missing_sheet(sites_xlsx):
+    with pytest.raises(UserInputException, match='no worksheet named "West"'):
+        get_dataframe(sites_xlsx, sheets=['North', 'West'])
+
+def test_get_dataframe_from_sheets_columns_mismatch(tmp_path, report_df):
+    input_file = tmp_path / Path('sites.xlsx')
+    with pd.ExcelWriter(input_file) as writer:
+        report_df.to_excel(writer, sheet_name='North', index=False)
+        report_df.rename(columns={'Unused': 'Other'}) \
+            .to_excel(writer, sheet_name='South', index=False)
+    with pytest.raises(UserInputException, match='"South" do not match'):
+        get_dataframe_from_sheets(input_file)
+
+@pytest.fixture
+def input_directory(tmp_path, report_df):
+    for age, name in enumerate(('newest.csv', 'older.csv', 'oldest.xlsx')):
+        input_file = tmp_path / Path(name)
+        if name.endswith('.xlsx'):
+            report_df.to_excel(input_file, index=False, engine='openpyxl')
+        else:
+            report_df.iloc[age:].to_csv(input_file, index=False)
+        os.utime(input_file, (1000000 - age, 1000000 - age))
+    (tmp_path / Path('~$oldest.xlsx')).write_text('lock')
+    return tmp_path
+
+def test_get_recent_input_files(input_directory):
+    assert [f.name for f in get_recent_input_files(input_directory)] == \
+        ['newest.csv', 'older.csv', 'oldest.xlsx']
+
+@pytest.mark.parametrize('file_name', ['newest.csv', 'oldest.xlsx'])
+def test_report_prefetch(input_directory, report_df, file_name):
+    input_file = input_directory / Path(file_name)
+    prefetch = ReportPrefetch(input_file, usecols={'MRN'})
+    assert prefetch.is_for(input_directory / Path('.') / Path(file_name))
+    assert not prefetch.is_for(input_directory / Path('missing.csv'))
+    assert prefetch.result().equals(get_dataframe(input_file, {'MRN'}))
+
+def test_report_prefetch_file_saved_over(tmp_path):
+    input_file = tmp_path / Path('daily.csv')
+    input_file.write_text('MRN\nyesterday\n')
+    os.utime(input_file, (1000000, 1000000))
+    prefetch = ReportPrefetch(input_file)
+    prefetch.thread.join()
+    assert not prefetch.is_modified()
+    input_file.write_text('MRN\ntoday\n')
+    assert prefetch.is_modified()
+    with (patch('builtins.input', return_value='daily.csv'),
+          patch.object(ReportPrefetch, 'result', autospec=True) as result):
+        chosen_file, df = get_input_file_and_dataframe(tmp_path, prefetch=prefetch)
+    assert chosen_file == input_file
+    assert df['MRN'].tolist() == ['today']
+    assert not result.called
+
+def test_report_prefetch_cancel_xlsx(tmp_path):
+    input_file = tmp_path / Path('report.xlsx')
+    pd.DataFrame({'MRN': [str(i) for i in range(20000)]}).to_excel(input_file,
+                                                                   index=False)
+    prefetch = ReportPrefetch(input_file)
+    prefetch.cancel()
+    prefetch.thread.join(timeout=5)
+    assert not prefetch.thread.is_alive()
+    assert prefetch.df is None
+
+def test_report_prefetch_failed_read_raises(tmp_path):
+    input_file = tmp_path / Path('report.csv')
+    input_file.write_text('a,b\n1,2\n1,2,3,4\n')
+    with pytest.raises(UserInputException):
+        ReportPrefetch(input_file).result()
+
+@pytest.mark.parametrize('file_name, rows', [('newest.csv', 2), ('older.csv', 1)])
+def test_get_dataframe_from_user_input_prefetch(input_directory, file_name, rows):
+    with (patch('builtins.input', return_value=file_name),
+          patch.object(ReportPrefetch, 'cancel', autospec=True,
+                       side_effect=ReportPrefetch.cancel) as cancel):
+        df = get_dataframe_from_user_input(input_directory)
+    assert len(df) == rows
+    assert cancel.called is (file_name != 'newest.csv')
+
+def test_get_input_file_and_dataframe_from_user_input(input_directory):
+    with patch('builtins.input', return_value='older.csv'):
+        input_file, df = get_input_file_and_dataframe_from_user_input(input_directory)
+    assert input_file == input_directory / Path('older.csv')
+    assert len(df) == 1
@@ -4,7 +4,7 @@ from unittest.mock import patch
 
 import pytest
 
-from pgsurvey import Column, EnvVar, TransmitOption, get_connection_options, read_config
+from pgsurvey import Column, EnvVar, NpiEnrichment, RowDedup, RowFilter, TransmitOption, ZipReference, get_connection_options, read_config, read_filters_config, read_npi_registry_config, read_row_dedup_config, read_zip_reference_config
 
 
 def return_none(*args, **kwargs):
@@ -118,4 +118,36 @@ def test_import_json_config2(config):
 
 def test_import_json_config3(config):
     _, columns, _ = read_config(config)
-    assert isinstance(columns[2].func, Callable)
\ No newline at end of file
+    assert isinstance(columns[2].func, Callable)
+
+def test_read_row_dedup_config():
+    config = {'deduplicate': {'key_columns': ['Medical Record Number'],
+                              'latest_column': 'Visit or Admit Date'}}
+    row_dedup = read_row_dedup_config(config)
+    assert row_dedup == RowDedup(['Medical Record Number'], 'Visit or Admit Date')
+    assert read_row_dedup_config({}) is None
+
+def test_read_filters_config():
+    config = {'filters': [{'column': 'Patient DOB', 'type': 'age',
+                           'min_age': 18}]}
+    assert read_filters_config(config) == [RowFilter('Patient DOB', 'age',
+                                                     min_age=18)]
+    assert read_filters_config({}) == []
+
+def test_read_filters_config_unknown_type():
+    with pytest.raises(ValueError):
+        read_filters_config({'filters': [{'column': 'MRN', 'type': 'between'}]})
+
+def test_read_zip_reference_config():
+    config = {'zip_reference': {'path': 'zip_codes.csv',
+                                'correct_mismatches': True}}
+    assert read_zip_reference_config(config) == ZipReference(
+        'zip_codes.csv', correct_mismatches=True)
+    assert read_zip_reference_config({}) is None
+
+def test_read_npi_registry_config():
+    config = {'npi_registry': {'path': 'npi_registry.csv',
+                               'specialty_column': None}}
+    assert read_npi_registry_config(config) == NpiEnrichment(
+        'npi_registry.csv', specialty_column=None)
+    assert read_npi_registry_config({}) is None
@@ -1,10 +1,13 @@
 import pytest
+import pandas as pd
 from email_validator import EmailSyntaxError, EmailUndeliverableError
 
 from pgsurvey import (
     address,
+    address_column,
     city,
     email,
+    email_column,
     flip_name,
     gender,
     get_first_name,
@@ -12,7 +15,11 @@ from pgsurvey import (
     get_validator_func_from_name,
     has_characters,
     language,
+    normalize_address,
+    npi,
+    npi_column,
     numbers_only,
+    optional_email,
     phone,
     sanitize_phone_with_truncation,
     state_initials,
@@ -217,6 +224,43 @@ def test_email_email_undeliverable_error(test_input):
     with pytest.raises(EmailUndeliverableError):
         assert email(test_input)
 
+@pytest.mark.parametrize('test_input, expected', [
+    ('', ''),
+    ('nan', ''),
+    ('elovelace@example.com', 'elovelace@example.com'),
+])
+def test_optional_email_valid(test_input, expected):
+    assert optional_email(test_input) == expected
+
+def test_email_column_valid():
+    s = pd.Series(['elovelace@example.com', '', None, 'nan',
+                   'elovelace@example.com'], index=[4, 3, 2, 1, 0])
+    result = email_column(s)
+    assert result.tolist() == ['elovelace@example.com', '', '', '',
+                               'elovelace@example.com']
+    assert result.index.tolist() == [4, 3, 2, 1, 0]
+
+@pytest.mark.parametrize('test_input', ['1234567890', 'a@b', 'a b@example.com',
+                                        'a@@example.com'])
+def test_email_column_email_syntax_error(test_input):
+    with pytest.raises(EmailSyntaxError):
+        assert email_column(pd.Series(['elovelace@example.com', test_input]))
+
+def test_email_column_validates_distinct_values(monkeypatch):
+    validated = []
+    def mock_validate_email(v):
+        validated.append(v)
+        raise EmailUndeliverableError
+    monkeypatch.setattr('pgsurvey.validation_sanitization.validate_email',
+                        mock_validate_email)
+    s = pd.Series(['a@example.com', 'a@example.com', '', 'b@example.com'])
+    assert email_column(s).tolist() == ['a@example.com', 'a@example.com', '',
+                                        'b@example.com']
+    assert validated == ['a@example.com', 'b@example.com']
+
+def test_email_column_element_func():
+    assert email_column.element_func is optional_email
+
 @pytest.mark.parametrize('test_input, expected', [
     ('9234567890', '923-456-7890'),
     ('19234567890', '923-456-7890'),
@@ -264,6 +308,43 @@ def test_address_attribute_error(test_input):
     with pytest.raises(AttributeError):
         assert address(test_input)
 
+@pytest.mark.parametrize('test_input, expected', [
+    ('-', ''),
+    (None, ''),
+    ('nan', ''),
+    ('PO BOX 12', 'PO Box 12'),
+    ('P.O. Box 12', 'PO Box 12'),
+    ('post office box 12', 'PO Box 12'),
+    ('123 NE 5TH ST', '123 NE 5th St'),
+    ('123 north main street apt 4b', '123 N Main St Apt 4B'),
+    ('7 E. 22ND ST., FL 3', '7 E 22nd St Fl 3'),
+    ('100 MAIN ST NORTH', '100 Main St N'),
+    ('45 WEST STREET', '45 West St'),
+    ('1 COURT ST', '1 Court St'),
+    ('500 AVENUE OF THE AMERICAS', '500 Avenue Of The Americas'),
+    ('99 Lake Shore Boulevard Suite 200', '99 Lake Shore Blvd Ste 200'),
+    ('12 Oak Dr #3a', '12 Oak Dr #3A'),
+])
+def test_normalize_address_valid(test_input, expected):
+    assert normalize_address(test_input) == expected
+
+def test_address_column_normalizes_distinct_values(monkeypatch):
+    normalized = []
+    def mock_normalize_address(v):
+        normalized.append(v)
+        return v.upper()
+    monkeypatch.setattr('pgsurvey.validation_sanitization.normalize_address',
+                        mock_normalize_address)
+    s = pd.Series(['1 Main St', None, '1 Main St', '2 Oak Ave'],
+                  index=[3, 2, 1, 0])
+    result = address_column(s)
+    assert result.tolist() == ['1 MAIN ST', '', '1 MAIN ST', '2 OAK AVE']
+    assert result.index.tolist() == [3, 2, 1, 0]
+    assert normalized == ['1 Main St', '2 Oak Ave']
+
+def test_address_column_element_func():
+    assert address_column.element_func is normalize_address
+
 @pytest.mark.parametrize('test_input, expected', [
     ('Albanian', '57'),
     ('arabic', '22'),
@@ -346,4 +427,31 @@ def test_sanitize_phone_with_truncation_valid(test_input, expected):
                         ])
 def test_sanitize_phone_with_truncation_type_error(test_input, exception):
     with exception:
-        assert sanitize_phone_with_truncation(test_input)
\ No newline at end of file
+        assert sanitize_phone_with_truncation(test_input)
+@pytest.mark.parametrize('test_input, expected', [
+    ('1234567893', '1234567893'),
+    (' 123-456-7893 ', '1234567893'),
+    ('', ''),
+    ('nan', ''),
+])
+def test_npi_valid(test_input, expected):
+    assert npi(test_input) == expected
+
+@pytest.mark.parametrize('test_input', ['1234567890', '123456789', '12345678930'])
+def test_npi_value_error(test_input):
+    with pytest.raises(ValueError):
+        assert npi(test_input)
+
+def test_npi_column_valid():
+    s = pd.Series(['1234567893', None, '1245319599', '1234567893'],
+                  index=[3, 2, 1, 0])
+    result = npi_column(s)
+    assert result.tolist() == ['1234567893', '', '1245319599', '1234567893']
+    assert result.index.tolist() == [3, 2, 1, 0]
+
+def test_npi_column_value_error():
+    with pytest.raises(ValueError):
+        assert npi_column(pd.Series(['1234567893', '1234567890']))
+
+def test_npi_column_element_func():
+    assert npi_column.element_func is npi
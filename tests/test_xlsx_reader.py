@@ -0,0 +1,79 @@
+import datetime
+from pathlib import Path
+import threading
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from benchmarks.generate_report import generate_report
+from pgsurvey import get_usecols, get_xlsx_sheet_names, read_xlsx
+
+@pytest.fixture
+def edge_case_xlsx(tmp_path):
+    input_file = tmp_path / Path('edge_cases.xlsx')
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Visits'
+    sheet.append(['MRN', 'Name', None, 'Name', 'Visit Date', 'Visit Time',
+                  'Charge', 'Active', 'Note'])
+    sheet.append([1001, 'Smith', 'x', 'Jones', datetime.datetime(2026, 1, 2),
+                  datetime.time(13, 45), 12.5, True, 'NA'])
+    sheet.append([])
+    sheet.append([1003, None, None, '', datetime.date(2026, 2, 3),
+                  datetime.time(8), 100.0, False, 'n/a'])
+    sheet.append([None, None, None, None, None, None, None, None, None,
+                  'past the header'])
+    sheet.append(['00123', 'Lee', None, None, '2026-03-04', None, -1e-05,
+                  None, '=1+1'])
+    sheet.append([None] * 9)
+    other = workbook.create_sheet('Other')
+    other.append(['Only'])
+    other.append(['value'])
+    workbook.save(input_file)
+    return input_file
+
+def test_read_xlsx_matches_read_excel(edge_case_xlsx):
+    expected = pd.read_excel(edge_case_xlsx, dtype=str)
+    pd.testing.assert_frame_equal(read_xlsx(edge_case_xlsx), expected)
+
+def test_read_xlsx_generated_report(tmp_path):
+    input_file = tmp_path / Path('report.xlsx')
+    generate_report(200, seed=3, invalid_rate=0.1).to_excel(input_file, index=False)
+    expected = pd.read_excel(input_file, dtype=str)
+    pd.testing.assert_frame_equal(read_xlsx(input_file), expected)
+
+@pytest.mark.parametrize('usecols', [['MRN', 'Visit Date', 'Note'],
+                                     ['Name.1', 'Unnamed: 2', 'Missing'],
+                                     []])
+def test_read_xlsx_usecols(edge_case_xlsx, usecols):
+    expected = pd.read_excel(edge_case_xlsx, dtype=str, usecols=get_usecols(usecols))
+    pd.testing.assert_frame_equal(read_xlsx(edge_case_xlsx, get_usecols(usecols)),
+                                  expected)
+
+@pytest.mark.parametrize('nrows', [0, 1, 2, 3, 10])
+def test_read_xlsx_nrows(edge_case_xlsx, nrows):
+    expected = pd.read_excel(edge_case_xlsx, dtype=str, nrows=nrows)
+    pd.testing.assert_frame_equal(read_xlsx(edge_case_xlsx, nrows=nrows), expected)
+
+def test_get_xlsx_sheet_names(edge_case_xlsx):
+    assert get_xlsx_sheet_names(edge_case_xlsx) == ['Visits', 'Other']
+
+def test_read_xlsx_sheet_name(edge_case_xlsx):
+    expected = pd.read_excel(edge_case_xlsx, dtype=str, sheet_name='Other')
+    pd.testing.assert_frame_equal(read_xlsx(edge_case_xlsx, sheet_name='Other'),
+                                  expected)
+    with pytest.raises(ValueError):
+        read_xlsx(edge_case_xlsx, sheet_name='Missing')
+
+def test_read_xlsx_cancelled(edge_case_xlsx):
+    cancelled = threading.Event()
+    cancelled.set()
+    with pytest.raises(InterruptedError):
+        read_xlsx(edge_case_xlsx, cancelled=cancelled)
+
+def test_read_xlsx_not_a_workbook(tmp_path):
+    input_file = tmp_path / Path('report.xlsx')
+    input_file.write_bytes(b'PK\x05\x06' + bytes(18))
+    with pytest.raises(ValueError):
+        read_xlsx(input_file)
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from pgsurvey import Column, Report, ZipIndex, ZipReference, get_zip5, normalize_city
+
+@pytest.fixture
+def zip_index(tmp_path):
+    source = tmp_path / Path('zip_codes.csv')
+    source.write_text('zip,city,state\n'
+                      '2134,BOSTON,MA\n'
+                      '02134,ALLSTON,MA\n'
+                      '10001,NEW YORK,NY\n')
+    return ZipIndex.load(source)
+
+def test_get_zip5():
+    zips = pd.Series(['02134', '02134-1234', '1234', '', 'nan'])
+    assert get_zip5(zips).tolist() == ['02134', '02134', '', '', '']
+
+def test_normalize_city():
+    cities = pd.Series(['St. Louis', ' new   york ', None])
+    assert normalize_city(cities).tolist() == ['ST LOUIS', 'NEW YORK', '']
+
+def test_zip_index_check(zip_index):
+    zips = pd.Series(['02134', '02134-1234', '10001', '10001', '99999', ''])
+    cities = pd.Series(['Allston', '', 'Boston', 'New York', 'Nowhere', 'Boston'])
+    states = pd.Series(['MA', 'nan', 'NY', 'NJ', 'ZZ', 'MA'])
+    check = zip_index.check(zips, cities, states)
+    assert check.city.tolist() == ['Allston', 'Boston', 'Boston', 'New York',
+                                   'Nowhere', 'Boston']
+    assert check.state.tolist() == ['MA', 'MA', 'NY', 'NJ', 'ZZ', 'MA']
+    assert check.city_mismatch.tolist() == [False, False, True, False, False, False]
+    assert check.state_mismatch.tolist() == [False, False, False, True, False, False]
+    assert check.unknown_zip.tolist() == [False, False, False, False, True, False]
+    assert check.filled == 2
+
+def test_zip_index_check_correct_mismatches(zip_index):
+    check = zip_index.check(pd.Series(['10001']), pd.Series(['Boston']),
+                            pd.Series(['NJ']), correct_mismatches=True)
+    assert check.city.tolist() == ['New York']
+    assert check.state.tolist() == ['NY']
+
+@pytest.fixture
+def zip_columns():
+    return [Column('ZIP Code', old_name='Patient Zip Code'),
+            Column('City', old_name='Patient City'),
+            Column('State', old_name='Patient State')]
+
+def test_report_cross_validate_zip_codes(zip_index, zip_columns):
+    df = pd.DataFrame({'Patient Zip Code': ['02134', '10001'],
+                       'Patient City': ['', 'Boston'],
+                       'Patient State': ['MA', 'NY']})
+    report = Report(df, zip_columns, ['cross_validate_zip_codes'],
+                    zip_reference=ZipReference('zip_codes.csv'),
+                    zip_index=zip_index, collect_rejects=True)
+    report.run_actions()
+    assert report.df['Patient City'].tolist() == ['Boston', 'Boston']
+    assert report.rejects == {'Patient City': 1}
+
+def test_report_cross_validate_zip_codes_requires_settings(zip_columns):
+    report = Report(pd.DataFrame(), zip_columns, ['cross_validate_zip_codes'])
+    with pytest.raises(ValueError):
+        report.run_actions()